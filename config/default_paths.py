@@ -10,45 +10,152 @@ PROJECT_ROOT = Path(r"C:\Users\zhang\Desktop\01-2China_soil")
 # 配置目录 - 存放映射文件等
 CONFIG_DIR = Path(__file__).resolve().parent
 
-# 各分析模块基础路径
-CARD_DIR = PROJECT_ROOT / "01 CARD"
-SARG_DIR = PROJECT_ROOT / "02 SARG"
-VICTORS_DIR = PROJECT_ROOT / "03 victors"  # 统一大小写
-BACMET_DIR = PROJECT_ROOT / "04 BacMet"
-MGE_DIR = PROJECT_ROOT / "05 MGE"
-
-# 公共文件路径
-OTHERS_DIR = PROJECT_ROOT / "Others"
-READS_FILE = OTHERS_DIR / "reads_number.txt"
-READS_16S_FILE = OTHERS_DIR / "16S_reads_number.txt"
-
-# 各模块特定文件
-CARD_FILES = {
-    "input": CARD_DIR / "CARD.xlsx",
-    "output": CARD_DIR / "CARD_processed.xlsx",
-    "mapping": CONFIG_DIR / "CARD_mapping.txt",  # 指向配置目录
-    "types_class": CONFIG_DIR / "Types_Class.txt",  # 指向配置目录
-}
+# 原始计数表摄取缓存 - 首次读取后在输入文件旁的 .ingest/ 目录保存内存映射数值块，重复运行时不再解析 Excel
+ENABLE_INGEST_CACHE = True
 
-SARG_FILES = {
-    "input": SARG_DIR / "SARG.xlsx",
-    "output": SARG_DIR / "SARG_processed.xlsx",
-    "risk": CONFIG_DIR / "ARGs_RankSearch.xlsx",  # 指向配置目录
-}
+# DataFrame 存储后端 - 'numpy'（默认）或 'pyarrow'：注释文本列使用 Arrow 字符串类型，降低内存占用并避免复制（需安装 pyarrow）
+DATAFRAME_BACKEND = 'numpy'
 
-VICTORS_FILES = {
-    "input": VICTORS_DIR / "victors.xlsx",
-    "output": VICTORS_DIR / "victors_processed.xlsx"
-}
+# 双端计数列合并方式 - 'sum'（两端相加，完整测序深度）、'first'（只取第一端）或 'max'（取较大值）
+MATE_MERGE_POLICY = 'sum'
+
+# 额外标准化 - RPKM 结果文件中另外写出的工作表，可选 'tpm'、'cpm'、'copies'（每 16S 拷贝的基因拷贝数）、'clr'（中心对数比）
+EXTRA_NORMALIZATIONS = []
+
+# 样本列并行线程数（RPKM/16S 比值与分组求和按样本列分块并行；1 表示不并行）
+SAMPLE_WORKERS = 1
+
+# Excel 工作簿读取 - 同一工作簿的多个工作表一次解析并在本次运行内共享；
+# 不小于 EXCEL_PARALLEL_MIN_MB 的工作簿可用多个进程并行解析各工作表（1 表示不并行）
+EXCEL_READ_PROCESSES = 1
+EXCEL_PARALLEL_MIN_MB = 20
+# 共享的解析结果总大小上限（MB），超出时释放最近最少使用的工作簿；0 表示不缓存
+WORKBOOK_CACHE_MB = 512
+
+# 进度事件 - 摄取/RPKM/汇总/写出等长任务的中间进度事件（含吞吐量与预计剩余时间）的最小间隔（秒）
+PROGRESS_INTERVAL = 5
+
+# 内存上限（可选）- 如 '16G'；设置后（或使用 --memory-limit）按原始计数表表头估算内存，为各数据库选择
+# 样本列并行线程数，同一节点上同时运行的多个队列按该上限准入（登记目录 ADMISSION_DIR，None 表示系统临时目录）
+MEMORY_LIMIT = None
+ADMISSION_DIR = None
+
+# 样本分片（python main.py shard）- 按样本轴把原始计数表拆分为 SHARD_COUNT 个分片分别计算后归并；
+# SHARD_DIR 为分片目录（None 表示各结果文件旁的 shards/，多台主机协作时指向共享目录），SHARD_WORKERS 为本机并行进程数
+SHARD_COUNT = 4
+SHARD_DIR = None
+SHARD_WORKERS = 1
+
+# 控制台日志级别（日志文件始终记录 INFO 及以上）
+LOG_CONSOLE_LEVEL = 'INFO'
 
-BACMET_FILES = {
-    "input": BACMET_DIR / "BacMet.xlsx",
-    "output": BACMET_DIR / "BacMet_processed.xlsx",
-    "mapping": CONFIG_DIR / "BacMet21_EXP.753.mapping.txt",  # 指向配置目录
+# 长格式结果库（可选）- 汇总所有数据库的结果，便于跨数据库查询
+ENABLE_LONG_STORE = False
+
+# 组间差异检验（可选）- 按样本分组表（Others/sample_groups.txt，两列：样本名、分组）对各层级特征做
+# Mann-Whitney U（两组）/ Kruskal-Wallis（多组）检验与 BH 校正，结果写入各结果文件旁的 <数据库>_stats.xlsx
+ENABLE_STATS = False
+STATS_VALUE = 'rpkm'  # 'rpkm'（RPKM 汇总表）或 'rpkm_16s'（16S 标准化汇总表）
+
+# 共现网络（可选）- 各数据库所选层级的特征在共同样本上分块计算相关性，导出边表/节点表至 项目根目录/Network/
+ENABLE_NETWORK = False
+NETWORK_LEVELS = {  # 参与网络的数据库层级（层级名见 modules/store.py 中的 LEVEL_SHEETS）
+    'CARD': ['ARGs'],
+    'SARG': ['ARGs'],
+    'MGE': ['Genes'],
+    'Victors': ['Pathogen'],
+    'BacMet': ['Compound'],
 }
+NETWORK_VALUE = 'rpkm'          # 'rpkm' 或 'rpkm_16s'
+NETWORK_METHOD = 'spearman'     # 'spearman' 或 'pearson'
+NETWORK_MIN_R = 0.6             # 导出边的 |r| 下限
+NETWORK_MAX_Q = 0.05            # 导出边的 FDR 上限
+NETWORK_MIN_PREVALENCE = 0.5    # 特征至少在该比例的样本中检出才参与计算
+NETWORK_CROSS_ONLY = False      # True 时只检验不同数据库之间的特征对（如 ARG-MGE、ARG-病原体）
+NETWORK_TILE = 2000             # 每次计算 NETWORK_TILE×NETWORK_TILE 的相关矩阵块
+
+# 结果仓库（可选）- 每次运行的结果按 run_id / cohort / 输入哈希追加保存，可指向多个项目共用的位置
+ENABLE_WAREHOUSE = False
+SHARED_WAREHOUSE_FILE = None  # 设置后所有项目共用该仓库文件；None 表示使用 项目根目录/results_warehouse.sqlite
+
+
+def get_paths(project_root=None):
+    """按项目根目录生成全部路径配置（默认使用 PROJECT_ROOT）
+
+    返回以配置名为键的字典（CARD_DIR、CARD_FILES、READS_FILE 等），
+    命令行 --root 通过它切换项目目录而无需修改本文件。
+    """
+    root = Path(project_root) if project_root is not None else PROJECT_ROOT
+
+    # 各分析模块基础路径
+    card_dir = root / "01 CARD"
+    sarg_dir = root / "02 SARG"
+    victors_dir = root / "03 victors"  # 统一大小写
+    bacmet_dir = root / "04 BacMet"
+    mge_dir = root / "05 MGE"
+
+    # 公共文件路径
+    others_dir = root / "Others"
+
+    return {
+        "PROJECT_ROOT": root,
+        "CARD_DIR": card_dir,
+        "SARG_DIR": sarg_dir,
+        "VICTORS_DIR": victors_dir,
+        "BACMET_DIR": bacmet_dir,
+        "MGE_DIR": mge_dir,
+        "OTHERS_DIR": others_dir,
+        "READS_FILE": others_dir / "reads_number.txt",
+        "READS_16S_FILE": others_dir / "16S_reads_number.txt",
+        "GROUPS_FILE": others_dir / "sample_groups.txt",
+        # 各模块特定文件
+        "CARD_FILES": {
+            "input": card_dir / "CARD.xlsx",
+            "output": card_dir / "CARD_processed.xlsx",
+            "mapping": CONFIG_DIR / "CARD_mapping.txt",  # 指向配置目录
+            "types_class": CONFIG_DIR / "Types_Class.txt",  # 指向配置目录
+        },
+        "SARG_FILES": {
+            "input": sarg_dir / "SARG.xlsx",
+            "output": sarg_dir / "SARG_processed.xlsx",
+            "risk": CONFIG_DIR / "ARGs_RankSearch.xlsx",  # 指向配置目录
+        },
+        "VICTORS_FILES": {
+            "input": victors_dir / "victors.xlsx",
+            "output": victors_dir / "victors_processed.xlsx"
+        },
+        "BACMET_FILES": {
+            "input": bacmet_dir / "BacMet.xlsx",
+            "output": bacmet_dir / "BacMet_processed.xlsx",
+            "mapping": CONFIG_DIR / "BacMet21_EXP.753.mapping.txt",  # 指向配置目录
+        },
+        "MGE_FILES": {
+            "input": mge_dir / "count.xlsx",
+            "output": mge_dir / "MGE_RPKM.xlsx",
+            "search": CONFIG_DIR / "Search.txt",  # 指向配置目录
+        },
+        "LONG_STORE_FILE": root / "results_long.sqlite",
+        "NETWORK_DIR": root / "Network",
+        "WAREHOUSE_FILE": Path(SHARED_WAREHOUSE_FILE) if SHARED_WAREHOUSE_FILE else root / "results_warehouse.sqlite",
+    }
+
 
-MGE_FILES = {
-    "input": MGE_DIR / "count.xlsx",
-    "output": MGE_DIR / "MGE_RPKM.xlsx",
-    "search": CONFIG_DIR / "Search.txt",  # 指向配置目录
-}
\ No newline at end of file
+# 默认项目根目录下的路径（供各流程模块直接导入）
+_DEFAULT_PATHS = get_paths(PROJECT_ROOT)
+CARD_DIR = _DEFAULT_PATHS["CARD_DIR"]
+SARG_DIR = _DEFAULT_PATHS["SARG_DIR"]
+VICTORS_DIR = _DEFAULT_PATHS["VICTORS_DIR"]
+BACMET_DIR = _DEFAULT_PATHS["BACMET_DIR"]
+MGE_DIR = _DEFAULT_PATHS["MGE_DIR"]
+OTHERS_DIR = _DEFAULT_PATHS["OTHERS_DIR"]
+READS_FILE = _DEFAULT_PATHS["READS_FILE"]
+READS_16S_FILE = _DEFAULT_PATHS["READS_16S_FILE"]
+GROUPS_FILE = _DEFAULT_PATHS["GROUPS_FILE"]
+CARD_FILES = _DEFAULT_PATHS["CARD_FILES"]
+SARG_FILES = _DEFAULT_PATHS["SARG_FILES"]
+VICTORS_FILES = _DEFAULT_PATHS["VICTORS_FILES"]
+BACMET_FILES = _DEFAULT_PATHS["BACMET_FILES"]
+MGE_FILES = _DEFAULT_PATHS["MGE_FILES"]
+LONG_STORE_FILE = _DEFAULT_PATHS["LONG_STORE_FILE"]
+NETWORK_DIR = _DEFAULT_PATHS["NETWORK_DIR"]
+WAREHOUSE_FILE = _DEFAULT_PATHS["WAREHOUSE_FILE"]
@@ -1,64 +1,546 @@
 """
 抗性基因分析总流程主入口
+
+用法：
+  python main.py                      执行文件归类与全部分析流程（同 run）
+  python main.py run                  执行文件归类与全部分析流程
+  python main.py status               查看各数据库输入/输出文件与阶段缓存状态
+  python main.py samples              列出 reads 统计文件中的样本
+  python main.py check                只读取表头预检各数据库输入（必需列、样本列、reads 覆盖、映射文件）
+  python main.py stats                按样本分组表对已有结果做组间差异检验
+  python main.py network              由已有结果构建 ARG-MGE-病原体共现网络
+  python main.py plan                 按内存上限估算各数据库的执行方式（只读取表头）
+  python main.py shard run            按样本分片执行（split 拆分 → work 各分片计算 → reduce 归并）
+  python main.py add-samples CARD 新批次.xlsx   只计算新批次样本并合并到已有结果
+  python main.py --import-times ...   命令结束后输出各模块导入耗时
+
+分析流程及 pandas/openpyxl 只在真正执行流程时才导入，status / samples 等查询命令不会加载它们。
+更细的导入耗时可使用 `python -X importtime main.py status`。
 """
 import sys
+import time
+import argparse
+import importlib
+from contextlib import nullcontext
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
 import logging
-from pipelines import card_pipeline, sarg_pipeline, victors_pipeline, bacmet_pipeline, mge_pipeline
-from pipelines.assign import organize_files, convert_to_xlsx
-from modules.utils import setup_logging
-from config.default_paths import PROJECT_ROOT
 
-def main():
+# 流程注册表：(数据库名, 流程模块, 入口函数, 路径配置名)
+PIPELINES = [
+    ('CARD', 'pipelines.card_pipeline', 'run_card_pipeline', 'CARD_FILES'),
+    ('SARG', 'pipelines.sarg_pipeline', 'run_sarg_pipeline', 'SARG_FILES'),
+    ('Victors', 'pipelines.victors_pipeline', 'run_victors_pipeline', 'VICTORS_FILES'),
+    ('BacMet', 'pipelines.bacmet_pipeline', 'run_bacmet_pipeline', 'BACMET_FILES'),
+    ('MGE', 'pipelines.mge_pipeline', 'run_mge_pipeline', 'MGE_FILES'),
+]
+
+# 延迟导入耗时记录：模块名 -> 秒
+IMPORT_TIMES = {}
+
+
+def lazy_import(name):
+    """按需导入模块并记录首次导入耗时"""
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES[name] = time.perf_counter() - start
+    return module
+
+
+def report_import_times():
+    """输出延迟导入耗时"""
+    print("\n模块导入耗时:")
+    if not IMPORT_TIMES:
+        print("  （无延迟导入）")
+    for name, seconds in sorted(IMPORT_TIMES.items(), key=lambda item: -item[1]):
+        print(f"  {seconds * 1000:8.1f} ms  {name}")
+    heavy = [name for name in ('pandas', 'openpyxl', 'numpy') if name in sys.modules]
+    print(f"  已加载的重量级依赖: {', '.join(heavy) or '无'}")
+
+
+def _describe(path):
+    path = Path(path)
+    if not path.exists():
+        return f"{path} （不存在）"
+    stat = path.stat()
+    modified = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(stat.st_mtime))
+    return f"{path} （{stat.st_size / 1024:.1f} KB，修改于 {modified}）"
+
+
+def resolve_paths(args):
+    """按 --root 生成路径配置（未指定时使用 config/default_paths.py 中的 PROJECT_ROOT）"""
+    from config.default_paths import get_paths
+    return get_paths(args.root)
+
+
+def show_status(args):
+    """查看各数据库输入/输出文件与阶段缓存状态"""
+    paths = resolve_paths(args)
+    runner = lazy_import('pipelines.runner')
+
+    print(f"项目根目录: {paths['PROJECT_ROOT']}")
+    print(f"  reads: {_describe(paths['READS_FILE'])}")
+    print(f"  16S reads: {_describe(paths['READS_16S_FILE'])}")
+    for name, _, _, files_name in PIPELINES:
+        files = paths[files_name]
+        manifest = runner.load_cache(Path(files["output"]).parent / runner.CACHE_FILE_NAME)
+        print(f"[{name}]")
+        print(f"  输入: {_describe(files['input'])}")
+        print(f"  输出: {_describe(files['output'])}")
+        print(f"  已缓存阶段: {', '.join(manifest) or '-'}")
+    return 0
+
+
+def check_inputs(args):
+    """只读取表头预检各数据库的输入文件"""
+    paths = resolve_paths(args)
+    lazy_import('modules.utils').setup_logging(paths['PROJECT_ROOT'])
+    preflight = lazy_import('modules.preflight')
+    selected = [p for p in PIPELINES if args.db is None or p[0] in args.db]
+    results = preflight.run_preflight(
+        [(name, paths[files_name]) for name, _, _, files_name in selected], paths, raise_on_error=False
+    )
+    failed = [result.name for result in results if not result.ok]
+    if failed:
+        logging.error(f"❌ 预检未通过: {', '.join(failed)}")
+        return 1
+    logging.info("✅ 预检通过")
+    return 0
+
+
+def run_stats(args):
+    """按样本分组表对已有结果文件做组间差异检验"""
+    paths = resolve_paths(args)
+    lazy_import('modules.utils').setup_logging(paths['PROJECT_ROOT'])
+    groups_file = args.groups or paths['GROUPS_FILE']
+    if not Path(groups_file).exists():
+        logging.error(f"❌ 分组文件不存在: {groups_file}")
+        return 1
+    selected = [p for p in PIPELINES if args.db is None or p[0] in args.db]
+    outputs = {name: paths[files_name]["output"] for name, _, _, files_name in selected}
+    written = lazy_import('modules.stats').run_stats(outputs, groups_file)
+    return 0 if written else 1
+
+
+def run_network(args):
+    """由已有结果文件构建跨数据库共现网络"""
+    paths = resolve_paths(args)
+    lazy_import('modules.utils').setup_logging(paths['PROJECT_ROOT'])
+    selected = [p for p in PIPELINES if args.db is None or p[0] in args.db]
+    outputs = {name: paths[files_name]["output"] for name, _, _, files_name in selected}
+    written = lazy_import('modules.network').build_network(outputs, paths['NETWORK_DIR'])
+    return 0 if written else 1
+
+
+def memory_limit(args):
+    """--memory-limit 或配置 MEMORY_LIMIT（均未设置时为 None）"""
+    from config.default_paths import MEMORY_LIMIT
+    if args.memory_limit is not None:
+        return args.memory_limit
+    return lazy_import('modules.planner').parse_size(MEMORY_LIMIT) if MEMORY_LIMIT else None
+
+
+def show_plan(args):
+    """按内存上限估算各数据库的执行方式（未设置上限时使用本机物理内存）"""
+    paths = resolve_paths(args)
+    planner = lazy_import('modules.planner')
+    limit = memory_limit(args) or planner.system_memory()
+    if limit is None:
+        print("无法获取本机内存，请使用 --memory-limit 指定")
+        return 1
+    selected = [p for p in PIPELINES if args.db is None or p[0] in args.db]
+    plan = planner.build_plan([(name, paths[files_name]) for name, _, _, files_name in selected],
+                              limit, args.threads)
+    print(f"内存上限 {planner.format_size(limit)}，预计峰值 {planner.format_size(plan.peak)}")
+    for database_plan in plan.databases.values():
+        print(f"  {database_plan.describe()}")
+    return 0 if all(p.fits for p in plan.databases.values()) else 1
+
+
+def add_samples(args):
+    """只对新批次样本运行流程，并合并到已有结果文件"""
+    paths = resolve_paths(args)
+    lazy_import('modules.utils').setup_logging(paths['PROJECT_ROOT'])
+    files_name = next(files_name for name, _, _, files_name in PIPELINES if name == args.database)
+    try:
+        lazy_import('pipelines.incremental').add_samples(
+            args.database, args.batch,
+            reads_path=paths['READS_FILE'],
+            reads_16s_path=paths['READS_16S_FILE'],
+            files=paths[files_name]
+        )
+    except Exception as e:
+        logging.error(f"❌ {args.database} 增量添加失败: {str(e)}")
+        return 1
+    return 0
+
+
+def run_shards(args):
+    """按样本分片执行：split / work / reduce 可分别在不同主机上运行，run 在本机依次执行三者"""
+    from config.default_paths import SHARD_WORKERS
+    paths = resolve_paths(args)
+    lazy_import('modules.utils').setup_logging(paths['PROJECT_ROOT'])
+    sharded = lazy_import('pipelines.sharded')
+    workers = args.workers or SHARD_WORKERS
+    failed = []
+    for name, _, _, files_name in PIPELINES:
+        if args.db is not None and name not in args.db:
+            continue
+        files = paths[files_name]
+        try:
+            if args.action in ('split', 'run'):
+                sharded.split_database(name, files, paths['READS_FILE'], paths['READS_16S_FILE'], args.shards)
+            if args.action in ('work', 'run'):
+                if args.index is not None:
+                    ok = sharded.run_shard(name, args.index, files)
+                    errors = [] if ok else [args.index]
+                else:
+                    done, errors = sharded.work(name, files, workers)
+                    logging.info(f"{name}: 本次完成 {len(done)} 个分片")
+                if errors:
+                    raise RuntimeError(f"以下分片执行失败: {', '.join(map(str, errors))}")
+            if args.action in ('reduce', 'run'):
+                sharded.reduce_shards(name, files)
+        except Exception as e:
+            logging.error(f"❌ {name} 分片{args.action}失败: {str(e)}")
+            failed.append(name)
+    return 1 if failed else 0
+
+
+def list_samples(args):
+    """列出 reads 统计文件中的样本及 reads 数"""
+    paths = resolve_paths(args)
+    reads_file, reads_16s_file = paths['READS_FILE'], paths['READS_16S_FILE']
+    utils = lazy_import('modules.utils')
+
+    reads = utils.read_reads_file(reads_file) if reads_file.exists() else {}
+    reads_16s = utils.read_16s_reads_file(reads_16s_file) if reads_16s_file.exists() else {}
+    if not reads and not reads_16s:
+        print(f"未找到样本（reads 统计文件: {reads_file}）")
+        return 1
+
+    print("Sample\treads\t16S_reads")
+    for sample in sorted(set(reads) | set(reads_16s)):
+        print(f"{sample}\t{reads.get(sample, '-')}\t{reads_16s.get(sample, '-')}")
+    return 0
+
+
+def run_all(args):
+  listener = admission = None
   try:
-    setup_logging(PROJECT_ROOT)
+    paths = resolve_paths(args)
+    project_root = paths['PROJECT_ROOT']
+    lazy_import('modules.utils').setup_logging(project_root)
+    runner = lazy_import('pipelines.runner')
+    if args.threads is not None:
+        lazy_import('modules.parallel').set_workers(args.threads)
+    if args.progress_log is not None:
+        # 进度事件逐行追加写入 JSON Lines 文件，供调度系统监控
+        progress = lazy_import('modules.progress')
+        listener = progress.add_listener(progress.JsonLinesListener(args.progress_log))
+
+    selected = [p for p in PIPELINES if args.db is None or p[0] in args.db]
+    steps = runner.step_range(args.start, args.end)
 
     # 0. 确保目录存在
-    from config.default_paths import CARD_DIR, SARG_DIR, VICTORS_DIR, BACMET_DIR, MGE_DIR
-    for dir_path in [CARD_DIR, SARG_DIR, VICTORS_DIR, BACMET_DIR, MGE_DIR]:
-        dir_path.mkdir(parents=True, exist_ok=True)
+    for _, _, _, files_name in selected:
+        Path(paths[files_name]["output"]).parent.mkdir(parents=True, exist_ok=True)
 
     # 1. 执行文件自动归类
-    logging.info("=" * 50)
-    logging.info("步骤1: 执行文件自动归类")
-    logging.info("=" * 50)
-    organize_files(PROJECT_ROOT)
+    step = 1
+    if not args.no_organize and not args.resume:
+        logging.info("=" * 50)
+        logging.info(f"步骤{step}: 执行文件自动归类")
+        logging.info("=" * 50)
+        lazy_import('pipelines.assign').organize_files(project_root)
+        step += 1
 
-    # 2. 执行各分析流程
-    logging.info("\n" + "=" * 50)
-    logging.info("步骤2: 执行CARD分析流程")
-    logging.info("=" * 50)
-    card_pipeline.run_card_pipeline()
+    # 2. 只读取表头预检所选数据库的输入，有误时在解析任何数据之前失败
+    if steps is None or steps & {'preprocess', 'rpkm'}:
+        preflight = lazy_import('modules.preflight')
+        try:
+            preflight.run_preflight(
+                [(name, paths[files_name]) for name, _, _, files_name in selected], paths
+            )
+        except preflight.PreflightError:
+            logging.error("❌ 输入预检未通过，未执行任何分析流程（详见上方预检错误）")
+            return 1
 
+    # 按内存上限为各数据库选择执行方式，并与同一节点上的其他运行一起准入
+    plan = None
+    limit = memory_limit(args)
+    if limit is not None:
+        planner = lazy_import('modules.planner')
+        plan = planner.build_plan([(name, paths[files_name]) for name, _, _, files_name in selected],
+                                  limit, args.threads)
+        plan.log()
+        if not args.dry_run:
+            admission = planner.Admission(plan.peak, limit, project_root.name).acquire()
 
-    logging.info("\n" + "=" * 50)
-    logging.info("步骤3: 执行SARG分析流程")
-    logging.info("=" * 50)
-    sarg_pipeline.run_sarg_pipeline()
+    # 3. 执行各分析流程（流程模块在执行前才导入）
+    # 各流程失败时返回 False，记录后继续执行其余流程
+    failed = []
+    for name, module_name, func_name, files_name in selected:
+        logging.info("\n" + "=" * 50)
+        logging.info(f"步骤{step}: 执行{name}分析流程")
+        logging.info("=" * 50)
+        step += 1
+        run_pipeline = getattr(lazy_import(module_name), func_name)
+        with plan.apply(name) if plan else nullcontext():
+            ok = run_pipeline(
+                files=paths[files_name],
+                reads_path=paths['READS_FILE'],
+                reads_16s_path=paths['READS_16S_FILE'],
+                use_cache=args.cache or args.resume,
+                dry_run=args.dry_run,
+                max_workers=args.jobs,
+                steps=steps,
+                preflight=False
+            )
+        if ok is False:
+            failed.append(name)
 
-    logging.info("\n" + "=" * 50)
-    logging.info("步骤4: 执行Victors分析流程")
-    logging.info("=" * 50)
-    victors_pipeline.run_victors_pipeline()
+    if failed:
+        logging.error(f"❌ 以下分析流程执行失败: {', '.join(failed)}")
+        return 1
+    if args.dry_run:
+        return 0
 
-    logging.info("\n" + "=" * 50)
-    logging.info("步骤5: 执行BacMet分析流程")
-    logging.info("=" * 50)
-    bacmet_pipeline.run_bacmet_pipeline()
+    outputs = {name: paths[files_name]["output"] for name, _, _, files_name in selected}
+
+    # 4. 可选：另存为其他格式
+    if args.format not in (None, 'xlsx'):
+        export_workbook = lazy_import('modules.utils').export_workbook
+        for output in outputs.values():
+            export_workbook(output, args.format)
+
+    # 5. 可选：写入长格式结果库 / 组间差异检验 / 共现网络 / 结果仓库
+    from config.default_paths import ENABLE_LONG_STORE, ENABLE_STATS, ENABLE_NETWORK, ENABLE_WAREHOUSE
+
+    if ENABLE_LONG_STORE:
+        from modules.store import export_long_store
+        logging.info("\n" + "=" * 50)
+        logging.info(f"步骤{step}: 写入长格式结果库")
+        logging.info("=" * 50)
+        step += 1
+        export_long_store(outputs, store_path=paths['LONG_STORE_FILE'], cohort=project_root.name)
+
+    if ENABLE_STATS:
+        logging.info("\n" + "=" * 50)
+        logging.info(f"步骤{step}: 组间差异检验")
+        logging.info("=" * 50)
+        step += 1
+        if paths['GROUPS_FILE'].exists():
+            lazy_import('modules.stats').run_stats(outputs, paths['GROUPS_FILE'])
+        else:
+            logging.warning(f"分组文件不存在，跳过组间差异检验: {paths['GROUPS_FILE']}")
+
+    if ENABLE_NETWORK:
+        logging.info("\n" + "=" * 50)
+        logging.info(f"步骤{step}: 构建共现网络")
+        logging.info("=" * 50)
+        step += 1
+        lazy_import('modules.network').build_network(outputs, paths['NETWORK_DIR'])
+
+    if ENABLE_WAREHOUSE:
+        from modules.warehouse import append_run
+        logging.info("\n" + "=" * 50)
+        logging.info(f"步骤{step}: 追加本次运行至结果仓库")
+        logging.info("=" * 50)
+        inputs = {
+            'reads': paths['READS_FILE'],
+            'reads_16s': paths['READS_16S_FILE'],
+        }
+        for name, _, _, files_name in selected:
+            for role, path in paths[files_name].items():
+                if role != 'output':
+                    inputs[f"{name}.{role}"] = path
+        append_run(paths['WAREHOUSE_FILE'], cohort=project_root.name, inputs=inputs, outputs=outputs)
 
-    logging.info("\n" + "=" * 50)
-    logging.info("步骤6: 执行MGE分析流程")
-    logging.info("=" * 50)
-    mge_pipeline.run_mge_pipeline()
-    
     logging.info("\n" + "=" * 50)
     logging.info("✅ 所有分析流程成功完成!")
     logging.info("=" * 50)
+    return 0
 
   except Exception as e:
        logging.exception("主流程执行失败")
-       sys.exit(1)
+       return 1
+  finally:
+       # 失败或异常退出时同样释放内存准入登记，不阻塞同一节点上等待的其他队列
+       if admission is not None:
+           admission.release()
+       if listener is not None:
+           progress.remove_listener(listener)
+           listener.close()
+
+
+def parse_databases(value):
+    """解析 --db 参数（逗号分隔，不区分大小写）"""
+    known = {name.lower(): name for name, _, _, _ in PIPELINES}
+    names = [item.strip().lower() for item in value.split(',') if item.strip()]
+    unknown = [item for item in names if item not in known]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(
+            f"未知数据库: {', '.join(unknown) or value}，可选: {', '.join(known)}"
+        )
+    return [known[item] for item in names]
+
+
+def parse_database(value):
+    """解析单个数据库名（不区分大小写）"""
+    names = parse_databases(value)
+    if len(names) != 1:
+        raise argparse.ArgumentTypeError(f"只能指定一个数据库: {value}")
+    return names[0]
+
+
+def parse_step(value):
+    """解析 --from / --to 步骤名（步骤定义在 pipelines.runner 中，解析到该参数时才导入）"""
+    steps = lazy_import('pipelines.runner').STAGE_STEPS
+    if value not in steps:
+        raise argparse.ArgumentTypeError(f"未知步骤: {value}，可选: {', '.join(steps)}")
+    return value
+
+
+def parse_export_format(value):
+    """解析 --format 参数（格式定义在 modules.utils 中，解析到该参数时才导入）"""
+    formats = lazy_import('modules.utils').EXPORT_FORMATS
+    if value not in formats:
+        raise argparse.ArgumentTypeError(f"未知格式: {value}，可选: {', '.join(formats)}")
+    return value
+
+
+def parse_memory_size(value):
+    """解析 --memory-limit 参数（如 16G、512M）"""
+    try:
+        return lazy_import('modules.planner').parse_size(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _add_common_options(parser, defaults=True):
+    # 子命令中重复声明的选项不设默认值，避免覆盖写在子命令之前的同名选项
+    default = (lambda value: value) if defaults else (lambda value: argparse.SUPPRESS)
+    parser.add_argument('--root', type=Path, default=default(None),
+                        help="项目根目录（默认使用 config/default_paths.py 中的 PROJECT_ROOT）")
+    parser.add_argument('--import-times', action='store_true', default=default(False),
+                        help="命令结束后输出各模块导入耗时")
+
+
+def _add_run_options(parser, defaults=True):
+    # 可选值由类型函数在解析时校验，构建解析器（含 --help）不导入流程模块
+    default = (lambda value: value) if defaults else (lambda value: argparse.SUPPRESS)
+    parser.add_argument('--db', type=parse_databases, default=default(None),
+                        help="只运行所选数据库，逗号分隔，如 card,sarg（默认全部）")
+    parser.add_argument('--from', dest='start', type=parse_step, metavar='STEP', default=default(None),
+                        help="起始步骤：preprocess / rpkm / aggregate（之前的步骤使用已有结果文件）")
+    parser.add_argument('--to', dest='end', type=parse_step, metavar='STEP', default=default(None),
+                        help="结束步骤：preprocess / rpkm / aggregate（aggregate 包含汇总结果写出）")
+    parser.add_argument('--format', type=parse_export_format, default=default(None),
+                        help="结果输出格式：xlsx（默认）或额外另存为 csv/tsv")
+    parser.add_argument('--cache', action='store_true', default=default(False),
+                        help="跳过输入未变化且已完成的阶段")
+    parser.add_argument('--resume', action='store_true', default=default(False),
+                        help="从上次失败处继续：跳过文件归类，各数据库从第一个未完成的阶段开始（同 --cache --no-organize）")
+    parser.add_argument('--dry-run', action='store_true', default=default(False),
+                        help="仅输出执行计划，不执行")
+    parser.add_argument('--jobs', type=int, default=default(None),
+                        help="并行阶段的线程数")
+    parser.add_argument('--threads', type=int, default=default(None),
+                        help="样本列分块并行的线程数（默认使用配置 SAMPLE_WORKERS）")
+    parser.add_argument('--memory-limit', type=parse_memory_size, default=default(None),
+                        help="内存上限（如 16G）：按原始计数表估算内存，选择各数据库的执行方式与线程数，并与同时运行的其他队列一起准入")
+    parser.add_argument('--progress-log', type=Path, default=default(None),
+                        help="将进度事件（已处理量、吞吐量、预计剩余时间）以 JSON Lines 追加写入该文件")
+    parser.add_argument('--no-organize', action='store_true', default=default(False),
+                        help="跳过文件自动归类")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="抗性基因 reads 水平分析")
+    _add_common_options(parser)
+    _add_run_options(parser)
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help="执行文件归类与分析流程（默认）")
+    _add_common_options(run_parser, defaults=False)
+    _add_run_options(run_parser, defaults=False)
+    status_parser = subparsers.add_parser('status', help="查看各数据库输入/输出文件与阶段缓存状态")
+    _add_common_options(status_parser, defaults=False)
+    samples_parser = subparsers.add_parser('samples', help="列出 reads 统计文件中的样本")
+    _add_common_options(samples_parser, defaults=False)
+    check_parser = subparsers.add_parser('check', help="只读取表头预检各数据库输入")
+    _add_common_options(check_parser, defaults=False)
+    check_parser.add_argument('--db', type=parse_databases, default=argparse.SUPPRESS,
+                              help="只预检所选数据库，逗号分隔（默认全部）")
+    stats_parser = subparsers.add_parser('stats', help="按样本分组表对已有结果做组间差异检验")
+    _add_common_options(stats_parser, defaults=False)
+    stats_parser.add_argument('--db', type=parse_databases, default=argparse.SUPPRESS,
+                              help="只检验所选数据库，逗号分隔（默认全部）")
+    stats_parser.add_argument('--groups', type=Path, default=None,
+                              help="样本分组表（默认 Others/sample_groups.txt）")
+    network_parser = subparsers.add_parser('network', help="由已有结果构建 ARG-MGE-病原体共现网络")
+    _add_common_options(network_parser, defaults=False)
+    network_parser.add_argument('--db', type=parse_databases, default=argparse.SUPPRESS,
+                                help="只使用所选数据库，逗号分隔（默认全部，层级见配置 NETWORK_LEVELS）")
+    plan_parser = subparsers.add_parser('plan', help="按内存上限估算各数据库的执行方式（只读取表头）")
+    _add_common_options(plan_parser, defaults=False)
+    plan_parser.add_argument('--db', type=parse_databases, default=argparse.SUPPRESS,
+                             help="只估算所选数据库，逗号分隔（默认全部）")
+    plan_parser.add_argument('--memory-limit', type=parse_memory_size, default=argparse.SUPPRESS,
+                             help="内存上限（如 16G，默认使用配置 MEMORY_LIMIT 或本机物理内存）")
+    plan_parser.add_argument('--threads', type=int, default=argparse.SUPPRESS,
+                             help="线程数上限（默认 CPU 数）")
+    shard_parser = subparsers.add_parser('shard', help="按样本分片执行（split / work / reduce，或 run 在本机依次执行）")
+    _add_common_options(shard_parser, defaults=False)
+    shard_parser.add_argument('action', choices=['split', 'work', 'reduce', 'run'],
+                              help="split: 拆分原始计数表与 reads 统计；work: 认领并计算未完成的分片（可在多台主机上同时运行）；"
+                                   "reduce: 归并分片结果；run: 在本机依次执行三者")
+    shard_parser.add_argument('--db', type=parse_databases, default=argparse.SUPPRESS,
+                              help="只处理所选数据库，逗号分隔（默认全部）")
+    shard_parser.add_argument('--shards', type=int, default=None,
+                              help="分片数（默认使用配置 SHARD_COUNT）")
+    shard_parser.add_argument('--workers', type=int, default=None,
+                              help="本机并行计算分片的进程数（默认使用配置 SHARD_WORKERS）")
+    shard_parser.add_argument('--index', type=int, default=None,
+                              help="work 时只（重新）计算指定序号的分片，不检查认领")
+    add_parser = subparsers.add_parser('add-samples', help="只计算新批次样本并合并到已有结果文件")
+    _add_common_options(add_parser, defaults=False)
+    add_parser.add_argument('database', type=parse_database,
+                            help="数据库名（card / sarg / victors / bacmet / mge）")
+    add_parser.add_argument('batch', type=Path,
+                            help="仅包含新样本的原始计数表（格式与常规输入相同）")
+    return parser
+
+
+COMMANDS = {
+    'run': run_all,
+    'status': show_status,
+    'samples': list_samples,
+    'check': check_inputs,
+    'stats': run_stats,
+    'network': run_network,
+    'plan': show_plan,
+    'shard': run_shards,
+    'add-samples': add_samples,
+}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.start or args.end:
+        try:
+            lazy_import('pipelines.runner').step_range(args.start, args.end)
+        except ValueError as e:
+            parser.error(str(e))
+    exit_code = COMMANDS[args.command or 'run'](args)
+    if args.import_times:
+        report_import_times()
+    if exit_code:
+        sys.exit(exit_code)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,36 @@
-
 """
 抗性基因分析功能模块
 包含：CARD, SARG, Victors, BacMet, MGE 等分析模块
+
+子模块与函数在首次访问时才导入（避免启动时加载 pandas/openpyxl）
 """
 
-from . import card, sarg, victors, bacmet, mge, utils
-from .utils import read_reads_file, read_16s_reads_file, calculate_rpkm, setup_logging
+import importlib
+
+_SUBMODULES = (
+    'card', 'sarg', 'victors', 'bacmet', 'mge', 'utils', 'store', 'warehouse', 'incremental', 'ingest', 'parallel', 'rollup', 'lengths', 'workbook', 'progress', 'frames', 'preflight', 'samples', 'normalize', 'stats', 'network', 'planner', 'shards'
+)
+
+# 函数名 -> 所在子模块
+_ATTRIBUTES = {
+    'read_reads_file': 'utils',
+    'read_16s_reads_file': 'utils',
+    'calculate_rpkm': 'utils',
+    'setup_logging': 'utils',
+}
+
+# 公共接口与延迟加载表保持一致（新增子模块或函数只需登记在上面两处）
+__all__ = [*_SUBMODULES, *_ATTRIBUTES]
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    if name in _ATTRIBUTES:
+        module = importlib.import_module(f".{_ATTRIBUTES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-__all__ = [
-    'card', 'sarg', 'victors', 'bacmet', 'mge', 'utils',
-    'read_reads_file', 'read_16s_reads_file', 'calculate_rpkm', 'setup_logging'
-]
\ No newline at end of file
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -4,6 +4,7 @@ BacMet 数据聚合模块
 
 import pandas as pd
 import logging
+from modules.parallel import group_sum
 
 
 def generate_compound_classification(df):
@@ -70,7 +71,7 @@ def _aggregate_by_column(df, group_column, output_name):
     sample_columns = [col for col in numeric_cols if col != group_column]
 
     # 按指定列分组
-    grouped = df.groupby(group_column)[sample_columns].sum()
+    grouped = group_sum(df, group_column, sample_columns)
 
     # 添加总计行
     grouped.loc['Total'] = grouped.sum()
@@ -4,13 +4,15 @@ BacMet 数据预处理模块
 
 import pandas as pd
 import logging
+from modules.ingest import load_table
+from modules.utils import atomic_output
 
 
 def preprocess_bacmet(input_path, bacmet_mapping_file, output_path):
     """处理BacMet原始数据并添加元数据信息"""
     try:
         # 读取原始数据
-        df = pd.read_excel(input_path)
+        df = load_table(input_path)
 
         # 处理ID列（保留|之前的内容）
         df['ID'] = df['ID'].str.split('|', n=1).str[0]
@@ -33,7 +35,8 @@ def preprocess_bacmet(input_path, bacmet_mapping_file, output_path):
         df = pd.concat([df, mapping_data[list(set(mapping_columns) & set(mapping_data.columns))]], axis=1)
         
         # 保存结果
-        df.to_excel(output_path, index=False)
+        with atomic_output(output_path) as tmp_path:
+            df.to_excel(tmp_path, index=False)
         logging.info(f"BacMet预处理完成! 结果保存至: {output_path}")
         return True
     except Exception as e:
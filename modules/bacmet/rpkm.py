@@ -3,79 +3,65 @@ BacMet RPKM计算模块
 """
 
 import pandas as pd
-import re
 import logging
-from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm
+from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm, ratio_to_16s, atomic_output
+from modules.normalize import write_normalizations
+from modules.lengths import bacmet_length_index
+from modules.samples import resolve_columns, merge_mates
+from modules.workbook import read_sheet
 
-def process_sarg_data(file_path, output_path, reads_path, reads_16s_path):
-    """处理BacMet数据并计算RPKM/16S RPKM"""
-    try:
-        # 读取数据
-        df = pd.read_excel(file_path)
-
-        # 列名处理逻辑
-        column_mapping = {}
-        pattern_legacy = re.compile(r'^[^-]*-(.+?)_\d\.fastq\.gz-BacMet2\.txt$')
-        pattern_new = re.compile(r'^([A-Za-z0-9]+)_\d\.fastq\.gz-BacMet2\.txt$')
-
-        for col in df.columns:
-            if col == 'ID':
-                column_mapping[col] = col
-                continue
-
-            # 处理遗留格式
-            match_legacy = pattern_legacy.match(col)
-            if match_legacy and "_1.fastq.gz-BacMet2.txt" in col:
-                column_mapping[col] = match_legacy.group(1)
-                continue
+def process_sarg_data(file_path, output_path, reads_path, reads_16s_path, mapping_file=None):
+    """处理BacMet数据并计算RPKM/16S RPKM
 
-            # 处理新格式
-            match_new = pattern_new.match(col)
-            if match_new and "_1.fastq.gz-BacMet2.txt" in col:
-                column_mapping[col] = match_new.group(1)
-            else:
-                column_mapping[col] = col
+    mapping_file: BacMet 映射文件，给定时基因长度按 ID 从长度索引查找，
+                  否则使用预处理时合并进来的 'gene lentgh' 列
+    """
+    try:
+        # 读取数据（经共享工作簿读取，启用 Arrow 后端时文本列为 Arrow 字符串）
+        df = read_sheet(file_path)
 
-        # 重命名列并过滤
-        renamed_df = df.rename(columns=column_mapping)
-        columns_to_keep = [col for col in renamed_df.columns
-                           if not col.endswith('_2.fastq.gz-BacMet2.txt')]
-        base_df = renamed_df[columns_to_keep].copy()
+        # 双端计数列按样本合并（合并方式见配置 MATE_MERGE_POLICY），列名为样本名（遗留格式与新格式见 modules.samples）
+        base_df = merge_mates(df, resolve_columns('BacMet', df.columns))
 
         # 读取reads数据
         reads_data = read_reads_file(reads_path)
         reads_16s_data = read_16s_reads_file(reads_16s_path)
 
-        # 使用统一函数计算常规RPKM
+        # 基因长度：按 ID 从长度索引查找（未找到的基因长度记为缺失，RPKM 为空）
+        lengths = None
+        if mapping_file is not None:
+            lengths = bacmet_length_index(mapping_file).lookup(base_df['ID'], default=float('nan')).lengths
+
+        # 使用统一函数计算常规RPKM（不修改输入，无需复制）
         final_df = calculate_rpkm(
             base_df,
             reads_data,
-            length_column='gene lentgh'  # 注意BacMet的特殊长度列名
+            length_column='gene lentgh',  # 注意BacMet的特殊长度列名
+            lengths=lengths
         )
 
-        # 计算16S RPKM
-        final_16s_df = base_df.copy()
-        numeric_cols = final_16s_df.select_dtypes(include=['number']).columns
-
-        for col in numeric_cols:
-            if col in reads_16s_data and col in reads_data:
-                # 计算公式：16s_reads_number / ((1492/1000) * (DWTP_reads/1e6))
-                numerator = reads_16s_data[col]
-                denominator = (1492 / 1000) * (reads_data[col] / 1e6)
-                final_16s_df[col] = numerator / denominator
+        # 16S RPKM 计算公式：16s_reads_number / ((1492/1000) * (DWTP_reads/1e6))，在计算比值时逐列得出
+        numeric_cols = base_df.select_dtypes(include=['number']).columns
 
         # 保存结果
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        with atomic_output(output_path) as tmp_path, pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
             final_df.to_excel(writer, index=False, sheet_name='RPKM')
 
-            # 计算比值
-            ratio_df = final_df.copy()
-            for col in numeric_cols:
-                if col in ratio_df.columns:
-                    ratio_df[col] = final_df[col] / final_16s_df[col]
+            # 计算比值（保持原列顺序）
+            ratios = ratio_to_16s(
+                final_df, base_df, [col for col in numeric_cols if col in final_df.columns],
+                reads_data, reads_16s_data
+            )
+            ratio_df = pd.concat(
+                [ratios[col] if col in ratios else final_df[col] for col in final_df.columns], axis=1
+            )
 
             ratio_df.to_excel(writer, index=False, sheet_name='16SRPKM')
 
+            # 额外标准化（TPM/CPM 等，见配置 EXTRA_NORMALIZATIONS）
+            write_normalizations(writer, base_df, reads_data, reads_16s_data,
+                                 length_column='gene lentgh', lengths=lengths)
+
         logging.info(f"RPKM & RPKM/16SRPKM计算完成! 保存至: {output_path}")
         return True
     except Exception as e:
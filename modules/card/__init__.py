@@ -6,6 +6,12 @@ CARD 分析模块入口
 from .preprocess import process_and_transpose_card_mapping, merge_amr_info
 from .rpkm import process_sarg_data
 from .aggregators import (
+    build_card_classifications,
+    build_gene_family_classification,
+    build_class_classification,
+    build_class_types_classification,
+    build_mechanism_classification,
+    build_arg_classification,
     generate_gene_family_classification,
     generate_class_classification,
     generate_class_types_classification,
@@ -17,6 +23,12 @@ __all__ = [
     'process_and_transpose_card_mapping',
     'merge_amr_info',
     'process_sarg_data',
+    'build_card_classifications',
+    'build_gene_family_classification',
+    'build_class_classification',
+    'build_class_types_classification',
+    'build_mechanism_classification',
+    'build_arg_classification',
     'generate_gene_family_classification',
     'generate_class_classification',
     'generate_class_types_classification',
@@ -6,50 +6,133 @@ CARD 数据聚合模块
 - 类型分类
 - 抗性机制分类
 - ARGs分类
+
+各分类按层级 ARGs → 基因家族 → 抗性类别 → 抗性机制 逐级汇总（Types 由 Class 展开），
+每个工作表只读取一次，更粗的层级由上一层的汇总结果再聚合得到。
 """
 
 import pandas as pd
 import math
 import logging
+from modules.utils import write_sheets
+from modules.rollup import rollup
+from modules.workbook import read_sheets
+
+# 分类层级（由细到粗）
+CARD_LEVELS = ['ARGs', 'AMR gene family', 'Class', 'resistance mechanisms']
+
+# 汇总层级 -> (输出工作表名, 结果表分类列名)
+CLASSIFICATIONS = {
+    'AMR gene family': ('AMR_GeneFamily', 'GeneFamily'),
+    'Class': ('ARGs_Class', 'Class'),
+    'Types': ('ARGs_Class_Types', 'Types'),
+    'resistance mechanisms': ('ARGs_Mechanisms', 'Mechanisms'),
+    'ARGs': ('ARGs_Classification', 'ARGs'),
+}
+
+INPUT_SHEETS = [
+    ('RPKM', ''),
+    ('16SRPKM', '_16S')
+]
+
+def load_class_types(mapping_file):
+    """读取类型映射文件，返回 Class 到 Types 列表的映射字典"""
+    type_mapping = pd.read_csv(mapping_file, sep='\t')
+    return type_mapping.groupby('Class')['Types'].apply(
+        lambda x: [item for sublist in x.str.split(';') for item in sublist]
+    ).to_dict()
+
+def format_classification(grouped, label):
+    """将分组汇总结果整理为输出格式（含 total 列，按 total 降序）"""
+    classification_df = grouped.T.reset_index()
+
+    # 添加总计行
+    classification_df.loc['Total'] = classification_df.sum(axis=0)
+    classification_df.rename(columns={'index':'Sample'}, inplace=True)
+
+    # 调整结果格式
+    result_df = classification_df.set_index('Sample').T.reset_index()
+    result_df.columns = [*result_df.columns[:-1], 'total']
+    result_df.rename(columns={'index':label}, inplace=True)
+    return result_df.sort_values(by='total', ascending=False)
+
+def build_card_classifications(input_path, mapping_file=None, levels=None):
+    """逐级汇总CARD各分类（仅计算，返回 {工作表名: DataFrame}）
+
+    参数：
+        input_path: RPKM 结果文件（含 RPKM / 16SRPKM 工作表）
+        mapping_file: Class-Types 映射文件，省略时不生成 Types 分类
+        levels: 只输出所选分类（CLASSIFICATIONS 的键），默认全部
+    """
+    levels = [level for level in CLASSIFICATIONS if levels is None or level in levels]
+    if 'Types' in levels and mapping_file is None:
+        levels.remove('Types')
+    derived = {'Types': ('Class', load_class_types(mapping_file))} if 'Types' in levels else None
+
+    # 一次解析 RPKM / 16SRPKM 两个工作表
+    workbook = read_sheets(input_path, [input_sheet for input_sheet, _ in INPUT_SHEETS])
+
+    per_sheet = []
+    for input_sheet, suffix in INPUT_SHEETS:
+        df = workbook[input_sheet]
+
+        # 检查必要列存在
+        for column in CARD_LEVELS:
+            if column not in df.columns:
+                raise ValueError(f"输入文件缺少'{column}'列")
+
+        # 删除非必要列
+        df.drop(columns=['Length', 'ARO'], inplace=True, errors='ignore')
+
+        # 获取样本列
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        sample_columns = [col for col in numeric_cols if col not in CARD_LEVELS]
+
+        per_sheet.append((suffix, rollup(df, CARD_LEVELS, sample_columns, derived)))
+
+    # 按分类依次输出 RPKM / 16S 结果
+    sheets = {}
+    for level in levels:
+        output_sheet, label = CLASSIFICATIONS[level]
+        for suffix, sums in per_sheet:
+            result_df = format_classification(sums[level], label)
+            sheets[output_sheet + suffix] = result_df
+
+            # ===== 高频ARGs筛选 =====
+            if level == 'ARGs':
+                top_args_df = select_top_args(result_df)
+                if top_args_df is not None:
+                    # 保存到新sheet（Top_前缀）
+                    sheets[f"Top_{output_sheet + suffix}"] = top_args_df
+
+    return sheets
+
+def build_gene_family_classification(input_path):
+    """AMR基因家族分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    return build_card_classifications(input_path, levels=['AMR gene family'])
+
+def build_class_classification(input_path):
+    """抗性类别分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    return build_card_classifications(input_path, levels=['Class'])
+
+def build_class_types_classification(input_path, mapping_file):
+    """Class-Types分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    return build_card_classifications(input_path, mapping_file, levels=['Types'])
+
+def build_mechanism_classification(input_path):
+    """抗性机制分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    return build_card_classifications(input_path, levels=['resistance mechanisms'])
+
+def build_arg_classification(input_path):
+    """ARGs分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    return build_card_classifications(input_path, levels=['ARGs'])
 
 def generate_gene_family_classification(input_path, output_path):
     """AMR基因家族分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'AMR_GeneFamily'),
-            ('16SRPKM', 'AMR_GeneFamily_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 检查必要列存在
-                if 'AMR gene family' not in df.columns:
-                    raise ValueError(f"输入文件缺少'AMR gene family'列")
-                
-                # 删除非必要列
-                df.drop(columns=['Length', 'ARO'], inplace=True, errors='ignore')
-                
-                # 获取样本列
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'AMR gene family']
-                
-                # 按基因家族分组
-                classification_df = df.groupby('AMR gene family')[sample_columns].sum().T.reset_index()
-                
-                # 添加总计行
-                classification_df.loc['Total'] = classification_df.sum(axis=0)
-                classification_df.rename(columns={'index':'Sample'}, inplace=True)
-                
-                # 调整结果格式
-                result_df = classification_df.set_index('Sample').T.reset_index()
-                result_df.columns = [*result_df.columns[:-1], 'total']
-                result_df.rename(columns={'index':'GeneFamily'}, inplace=True)
-                result_df = result_df.sort_values(by='total', ascending=False)
-                
-                result_df.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_gene_family_classification(input_path)
+        write_sheets(output_path, sheets)
+
         logging.info(f"AMR基因家族分类汇总完成! 结果已保存至: {output_path}")
         return True
     except Exception as e:
@@ -59,37 +142,9 @@ def generate_gene_family_classification(input_path, output_path):
 def generate_class_classification(input_path, output_path):
     """抗性类别分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'ARGs_Class'),
-            ('16SRPKM', 'ARGs_Class_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 检查必要列存在
-                if 'Class' not in df.columns:
-                    raise ValueError(f"输入文件缺少'Class'列")
-                
-                df.drop(columns=['Length', 'ARO'], inplace=True, errors='ignore')
-                
-                # 分组汇总
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'Class']
-                
-                classification_df = df.groupby('Class')[sample_columns].sum().T.reset_index()
-                classification_df.loc['Total'] = classification_df.sum(axis=0)
-                classification_df.rename(columns={'index':'Sample'}, inplace=True)
-                
-                # 生成结果表
-                result_df = classification_df.set_index('Sample').T.reset_index()
-                result_df.columns = [*result_df.columns[:-1], 'total']
-                result_df.rename(columns={'index':'Class'}, inplace=True)
-                result_df = result_df.sort_values(by='total', ascending=False)
-                
-                result_df.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_class_classification(input_path)
+        write_sheets(output_path, sheets)
+
         logging.info(f"抗性类别分类汇总完成! 结果已保存至: {output_path}")
         return True
     except Exception as e:
@@ -99,48 +154,9 @@ def generate_class_classification(input_path, output_path):
 def generate_class_types_classification(input_path, output_path, mapping_file):
     """Class-Types分类汇总"""
     try:
-        # 读取类型映射文件
-        type_mapping = pd.read_csv(mapping_file, sep='\t')
-        # 创建Class到Types的映射字典
-        class_to_types = type_mapping.groupby('Class')['Types'].apply(
-            lambda x: [item for sublist in x.str.split(';') for item in sublist]
-        ).to_dict()
-        
-        process_config = [
-            ('RPKM', 'ARGs_Class_Types'),
-            ('16SRPKM', 'ARGs_Class_Types_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                if 'Class' not in df.columns:
-                    raise ValueError(f"输入文件缺少'Class'列")
-                
-                # 添加Types列并展开多值
-                df['Types'] = df['Class'].map(class_to_types)
-                df = df.explode('Types')
-                
-                # 删除不需要的列
-                df.drop(columns=['Length', 'ARO', 'Class'], inplace=True, errors='ignore')
-                
-                # 分组汇总
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'Types']
-                
-                classification_df = df.groupby('Types')[sample_columns].sum().T.reset_index()
-                classification_df.loc['Total'] = classification_df.sum(axis=0)
-                classification_df.rename(columns={'index':'Sample'}, inplace=True)
-                
-                # 生成结果表
-                result_df = classification_df.set_index('Sample').T.reset_index()
-                result_df.columns = [*result_df.columns[:-1], 'total']
-                result_df.rename(columns={'index':'Types'}, inplace=True)
-                result_df = result_df.sort_values(by='total', ascending=False)
-                
-                result_df.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_class_types_classification(input_path, mapping_file)
+        write_sheets(output_path, sheets)
+
         logging.info(f"Class-Types分类汇总完成! 结果已保存至: {output_path}")
         return True
     except Exception as e:
@@ -150,41 +166,9 @@ def generate_class_types_classification(input_path, output_path, mapping_file):
 def generate_mechanism_classification(input_path, output_path):
     """抗性机制分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'ARGs_Mechanisms'),
-            ('16SRPKM', 'ARGs_Mechanisms_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 校验必要列存在
-                if 'resistance mechanisms' not in df.columns:
-                    raise ValueError(f"输入文件缺少'resistance mechanisms'列")
-                
-                # 删除非必要列
-                df.drop(columns=['Length', 'ARO'], inplace=True, errors='ignore')
-                
-                # 获取样本列
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'resistance mechanisms']
-                
-                # 按抗性机制分组
-                classification_df = df.groupby('resistance mechanisms')[sample_columns].sum().T.reset_index()
-                
-                # 添加总计行
-                classification_df.loc['Total'] = classification_df.sum(axis=0)
-                classification_df.rename(columns={'index':'Sample'}, inplace=True)
-                
-                # 调整结果格式
-                result_df = classification_df.set_index('Sample').T.reset_index()
-                result_df.columns = [*result_df.columns[:-1], 'total']
-                result_df.rename(columns={'index':'Mechanisms'}, inplace=True)
-                result_df = result_df.sort_values(by='total', ascending=False)
-                
-                result_df.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_mechanism_classification(input_path)
+        write_sheets(output_path, sheets)
+
         logging.info(f"抗性机制分类汇总完成! 结果已保存至: {output_path}")
         return True
     except Exception as e:
@@ -194,62 +178,33 @@ def generate_mechanism_classification(input_path, output_path):
 def generate_arg_classification(input_path, output_path):
     """ARGs分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'ARGs_Classification'),
-            ('16SRPKM', 'ARGs_Classification_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 校验必要列存在
-                if 'ARGs' not in df.columns:
-                    raise ValueError(f"输入文件缺少'ARGs'列")
-                
-                # 删除非必要列
-                df.drop(columns=['Length', 'ARO'], inplace=True, errors='ignore')
-                
-                # 分组汇总
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'ARGs']
-                
-                classification_df = df.groupby('ARGs')[sample_columns].sum().T.reset_index()
-                classification_df.loc['Total'] = classification_df.sum(axis=0)
-                classification_df.rename(columns={'index':'Sample'}, inplace=True)
-                
-                # 调整结果格式
-                result_df = classification_df.set_index('Sample').T.reset_index()
-                result_df.columns = [*result_df.columns[:-1], 'total']
-                result_df.rename(columns={'index':'ARGs'}, inplace=True)
-                result_df = result_df.sort_values(by='total', ascending=False)
-                
-                result_df.to_excel(writer, index=False, sheet_name=output_sheet)
-                
-                # ===== 高频ARGs筛选 =====
-                sample_cols = [col for col in result_df.columns if col not in ['ARGs', 'total']]
-                
-                if sample_cols:  # 确保存在样本列
-                    # 80%样本阈值且向上取整
-                    threshold = math.ceil(len(sample_cols) * 0.8)
-                    
-                    # 统计每个ARG在多少样本中存在（值>0）
-                    presence_count = result_df[sample_cols].apply(
-                        lambda x: (x > 0).sum(),
-                        axis=1
-                    )
-                    
-                    # 筛选高频ARGs并添加统计信息
-                    top_args_df = result_df[presence_count >= threshold].copy()
-                    top_args_df['Sample_Presence'] = presence_count[presence_count >= threshold]
-                    top_args_df['Presence_Percentage'] = top_args_df['Sample_Presence'] / len(sample_cols)
-                    
-                    # 保存到新sheet（Top_前缀）
-                    top_sheet = f"Top_{output_sheet}"
-                    top_args_df.to_excel(writer, index=False, sheet_name=top_sheet)
-        
+        sheets = build_arg_classification(input_path)
+        write_sheets(output_path, sheets)
+
         logging.info(f"ARGs分类汇总完成! 结果已保存至: {output_path}")
         return True
     except Exception as e:
         logging.error(f"ARGs分类失败: {str(e)}")
-        raise
\ No newline at end of file
+        raise
+
+def select_top_args(result_df, min_presence=0.8):
+    """筛选在至少 80% 样本中出现的高频ARGs（无样本列时返回 None）"""
+    sample_cols = [col for col in result_df.columns if col not in ['ARGs', 'total']]
+
+    if not sample_cols:  # 确保存在样本列
+        return None
+
+    # 80%样本阈值且向上取整
+    threshold = math.ceil(len(sample_cols) * min_presence)
+
+    # 统计每个ARG在多少样本中存在（值>0）
+    presence_count = result_df[sample_cols].apply(
+        lambda x: (x > 0).sum(),
+        axis=1
+    )
+
+    # 筛选高频ARGs并添加统计信息
+    top_args_df = result_df[presence_count >= threshold].copy()
+    top_args_df['Sample_Presence'] = presence_count[presence_count >= threshold]
+    top_args_df['Presence_Percentage'] = top_args_df['Sample_Presence'] / len(sample_cols)
+    return top_args_df
@@ -6,9 +6,12 @@ CARD 数据预处理模块
 """
 
 import pandas as pd
-import re
-from collections import defaultdict
 import logging
+from modules.ingest import load_table
+from modules.workbook import read_sheet
+from modules.frames import to_backend
+from modules.utils import atomic_output
+from modules.samples import resolve_columns, merge_mates
 
 
 def process_and_transpose_card_mapping(file_path, output_path, sheet_name='CARD_mapping'):
@@ -22,30 +25,11 @@ def process_and_transpose_card_mapping(file_path, output_path, sheet_name='CARD_
             sheet_name = available_sheets[0]
             logging.warning(f"使用第一个工作表: {sheet_name}")
 
-        df = pd.read_excel(file_path, sheet_name=sheet_name)
-        all_columns = df.columns.tolist()
-        pairs = defaultdict(dict)
-        pattern = re.compile(r'(.+)_([12])\.fastq\.gz-CARD\.txt$')
-        non_pair_columns = [col for col in all_columns if not pattern.search(col)]
-
-        for col in all_columns:
-            match = pattern.search(col)
-            if match:
-                base_name = match.group(1).replace('-', '').replace('_', '')
-                pair_type = match.group(2)
-                pairs[base_name][pair_type] = col
-
-        sample_columns = {}
-
-        for base_name, pair_dict in pairs.items():
-            col1 = pair_dict.get('1')
-            col2 = pair_dict.get('2')
-
-            if col1 and col2:
-                df[col1] = pd.to_numeric(df[col1], errors='coerce').fillna(0)
-                df[col2] = pd.to_numeric(df[col2], errors='coerce').fillna(0)
-
-                sample_columns[base_name] = df[col1] + df[col2]
+        df = load_table(file_path, sheet_name=sheet_name)
+        # 双端计数列按样本合并（合并方式见配置 MATE_MERGE_POLICY）
+        plan = resolve_columns('CARD', df.columns)
+        merged = merge_mates(df, plan)
+        sample_columns = {sample: merged[sample] for sample in plan.samples if sample in merged}
 
         new_df = pd.DataFrame({
             'ID': df['ID'],
@@ -73,7 +57,8 @@ def process_and_transpose_card_mapping(file_path, output_path, sheet_name='CARD_
         total_series = pd.Series(['Total', '', ''] + sum_row.tolist(), index=new_df.columns)
         new_df = pd.concat([new_df, total_series.to_frame().T], ignore_index=True)
 
-        new_df.to_excel(output_path, index=False)
+        with atomic_output(output_path) as tmp_path:
+            new_df.to_excel(tmp_path, index=False)
         logging.info(f"处理完成! 结果已保存至: {output_path}")
         logging.info(f"样本数量: {len(new_df.columns) - 3}, 基因数量: {len(new_df)}")
         return True
@@ -86,13 +71,13 @@ def merge_amr_info(card_path, amr_meta_path, sheet_name='Merged'):
     """合并AMR元数据信息"""
     try:
         # 读取已处理的主表（跳过汇总行）
-        main_df = pd.read_excel(card_path).iloc[:-1]
+        main_df = read_sheet(card_path).iloc[:-1]
 
         # 转换ARO列为字符串类型
         main_df['ARO'] = main_df['ARO'].astype(str).str.strip()
 
         # 读取AMR元数据表（文本文件）
-        amr_df = pd.read_csv(amr_meta_path, sep='\t')
+        amr_df = to_backend(pd.read_csv(amr_meta_path, sep='\t'))
         amr_df['ARO'] = amr_df['ARO'].str.replace('ARO:', '', regex=False).str.strip().astype(str)
 
         # 修正ARO格式
@@ -137,7 +122,8 @@ def merge_amr_info(card_path, amr_meta_path, sheet_name='Merged'):
         merged_df = pd.concat([merged_df, total_series.to_frame().T], ignore_index=True)
 
         # 保存到新工作表
-        with pd.ExcelWriter(card_path, engine='openpyxl', mode='a') as writer:
+        with atomic_output(card_path, keep_existing=True) as tmp_path, \
+                pd.ExcelWriter(tmp_path, engine='openpyxl', mode='a') as writer:
             merged_df.to_excel(writer, sheet_name=sheet_name, index=False)
 
         logging.info(f"合并完成! 结果已保存至 {card_path} 的 [{sheet_name}] 工作表")
@@ -8,13 +8,15 @@ import pandas as pd
 import re
 from collections import defaultdict
 import logging
-from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm
+from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm, ratio_to_16s, atomic_output
+from modules.normalize import write_normalizations
+from modules.workbook import read_sheet
 
 def process_sarg_data(file_path, output_path, reads_path, reads_16s_path):
     """处理CARD数据并计算RPKM/16S RPKM"""
     try:
-        # 直接读取数据
-        df = pd.read_excel(file_path, sheet_name='Merged')
+        # 读取数据（经共享工作簿读取，启用 Arrow 后端时文本列为 Arrow 字符串）
+        df = read_sheet(file_path, 'Merged')
 
         # 标准化列名
         pattern = re.compile(r'^(.+?)_[12]\.fastq\.gz-SARG\.txt$')
@@ -32,36 +34,29 @@ def process_sarg_data(file_path, output_path, reads_path, reads_16s_path):
         columns_to_keep = [col for col in renamed_df.columns
                            if not col.endswith('_2.fastq.gz-SARG.txt')]
 
-        # 计算常规RPKM
-        base_df = renamed_df[columns_to_keep].copy()
+        # 计算常规RPKM（calculate_rpkm 不修改输入，无需复制）
+        base_df = renamed_df[columns_to_keep]
         reads_data = read_reads_file(reads_path)
         final_df = calculate_rpkm(base_df, reads_data)
 
-        # 计算16S RPKM
+        # 16S RPKM 使用16s_reads_number.txt中的数值作为分子，在计算比值时逐列得出
         reads_16s_data = read_16s_reads_file(reads_16s_path)
-        final_16s_df = base_df.copy()
-        numeric_cols = final_16s_df.select_dtypes(include=['number']).columns
-
-        # 使用16s_reads_number.txt中的数值作为分子
-        for col in numeric_cols:
-            if col in reads_16s_data and col in reads_data:
-                # 计算公式：16s_reads_number / ((1492/1000) * (reads_data/1e6))
-                numerator = reads_16s_data[col]
-                denominator = (1492 / 1000) * (reads_data[col] / 1e6)
-                final_16s_df[col] = numerator / denominator
 
         # 保存到两个sheet
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        with atomic_output(output_path) as tmp_path, pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
             final_df.to_excel(writer, index=False, sheet_name='RPKM')
 
             # 计算比值
             numeric_cols = final_df.select_dtypes(include=['number']).columns
-            ratio_df = final_df[numeric_cols] / final_16s_df[numeric_cols]
+            ratios = ratio_to_16s(final_df, base_df, numeric_cols, reads_data, reads_16s_data)
             # 保留非数值列
-            ratio_df = pd.concat([final_df[final_df.columns.difference(numeric_cols)], ratio_df], axis=1)
+            ratio_df = pd.concat([final_df[final_df.columns.difference(numeric_cols)], *ratios.values()], axis=1)
 
             ratio_df.to_excel(writer, index=False, sheet_name='16SRPKM')
 
+            # 额外标准化（TPM/CPM 等，见配置 EXTRA_NORMALIZATIONS）
+            write_normalizations(writer, base_df, reads_data, reads_16s_data)
+
         logging.info(f"RPKM & 16S RPKM计算完成! 保存至: {output_path}")
         return True
     except Exception as e:
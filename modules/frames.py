@@ -0,0 +1,112 @@
+"""
+DataFrame 存储后端模块
+包含：
+- 可选的 Arrow 字符串列（config/default_paths.py 中 DATAFRAME_BACKEND = 'pyarrow'，需安装 pyarrow）：
+  注释列（基因ID、分类、描述等文本列）转换为 Arrow 存储的字符串类型，
+  内存占用低于逐个 Python 对象的 object 列，且复制 DataFrame 时底层 Arrow 数组共享、不再逐元素复制
+- 按列去除内容重复的列（替代 df.T.drop_duplicates().T，不转置、不改变各列数据类型）
+
+数值列仍为 NumPy 数组（摄取缓存中为内存映射块），两种后端的计算结果一致。
+"""
+
+import logging
+import hashlib
+import numpy as np
+import pandas as pd
+
+BACKENDS = ('numpy', 'pyarrow')
+
+_warned = False
+
+
+def get_backend():
+    from config.default_paths import DATAFRAME_BACKEND
+    if DATAFRAME_BACKEND not in BACKENDS:
+        raise ValueError(f"未知 DataFrame 后端: {DATAFRAME_BACKEND}，可选: {', '.join(BACKENDS)}")
+    return DATAFRAME_BACKEND
+
+
+def string_dtype():
+    """Arrow 字符串类型（缺失值为 NaN，与 object 列的比较/筛选语义一致）；未启用或不可用时返回 None"""
+    global _warned
+    if get_backend() != 'pyarrow':
+        return None
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        if not _warned:
+            logging.warning("未安装 pyarrow，DATAFRAME_BACKEND = 'pyarrow' 不生效，继续使用 object 字符串列")
+            _warned = True
+        return None
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)  # pandas >= 2.3
+    except TypeError:
+        pass
+    try:
+        return pd.StringDtype('pyarrow_numpy')  # pandas 2.1 / 2.2
+    except (TypeError, ValueError):
+        if not _warned:
+            logging.warning(f"当前 pandas {pd.__version__} 不支持缺失值为 NaN 的 Arrow 字符串类型，继续使用 object 字符串列")
+            _warned = True
+        return None
+
+
+def to_backend(df):
+    """将纯文本列（除缺失值外均为字符串）转换为当前后端的字符串类型
+
+    混合类型列（如带数值汇总行的列）保持不变；未启用 Arrow 时原样返回。
+    """
+    dtype = string_dtype()
+    if dtype is None:
+        return df
+    columns = [
+        col for col in df.columns
+        if not isinstance(df[col].dtype, np.dtype) or df[col].dtype == object
+    ]
+    columns = [
+        col for col in columns
+        if df[col].dtype != dtype and pd.api.types.infer_dtype(df[col], skipna=True) in ('string', 'empty')
+    ]
+    if not columns:
+        return df
+    df = df.copy(deep=False)
+    for col in columns:
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def _column_key(values):
+    """列内容的哈希（数值列统一按 float64 计算，使整数列与等值浮点列相同）"""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype('float64')
+    else:
+        values = values.astype(object)
+    hashed = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    return hashlib.sha1(hashed.tobytes()).hexdigest(), values.reset_index(drop=True)
+
+
+def drop_duplicate_columns(df, keep='first'):
+    """删除内容完全相同的重复列（与 df.T.drop_duplicates(keep=...).T 保留相同的列）
+
+    逐列计算哈希，哈希相同时再逐值比较；不转置整表，保留的列保持原有数据类型。
+    """
+    if keep not in ('first', 'last'):
+        raise ValueError(f"keep 只能为 'first' 或 'last': {keep}")
+    positions = range(df.shape[1])
+    if keep == 'last':
+        positions = reversed(positions)
+
+    seen = {}
+    kept = []
+    for i in positions:
+        key, values = _column_key(df.iloc[:, i])
+        candidates = seen.setdefault(key, [])
+        if any(values.equals(other) for other in candidates):
+            continue
+        candidates.append(values)
+        kept.append(i)
+
+    removed = df.shape[1] - len(kept)
+    if removed:
+        logging.info(f"删除 {removed} 个重复列")
+    return df.iloc[:, sorted(kept)]
@@ -0,0 +1,217 @@
+"""
+增量样本合并模块
+包含：
+- 新批次结果工作簿与已有结果工作簿的逐表合并
+- 标准化矩阵按基因对齐追加新样本列
+- 分类汇总表累加新样本列并重新计算总计、排序
+- CARD 高频ARGs(Top_)表基于合并结果重新筛选
+
+- 多个样本分片结果工作簿的归并（见 pipelines/sharded.py）
+
+RPKM 与 16S 计算均按样本列独立，分类汇总对样本可加，
+因此只需对新批次计算后合并，无需重算整个队列。
+"""
+
+import logging
+from pathlib import Path
+import pandas as pd
+from modules.store import MATRIX_SHEETS, SAMPLE_ROW_DATABASES, SUMMARY_COLUMNS, workbook_samples
+from modules.card.aggregators import select_top_args
+from modules.normalize import NORMALIZATIONS
+from modules.utils import atomic_output
+
+TOTAL_COLUMNS = ('total', 'Total')
+
+# 特征×样本 布局的标准化矩阵（含额外标准化工作表），合并时不排序
+_MATRIX_SHEETS = set(MATRIX_SHEETS) | set(NORMALIZATIONS.values())
+
+# 缺失值不记为 0 的额外标准化工作表（TPM、CPM 的缺失特征计数为 0，结果也为 0）
+_UNFILLED_SHEETS = {NORMALIZATIONS['copies'], NORMALIZATIONS['clr']}
+
+
+def _sample_columns(df, samples):
+    return [col for col in df.columns if str(col) in samples]
+
+
+def _insert_after_last(columns, anchors, new_columns):
+    """将 new_columns 插入到 columns 中最后一个 anchor 之后"""
+    positions = [i for i, col in enumerate(columns) if col in anchors]
+    pos = positions[-1] + 1 if positions else len(columns)
+    return columns[:pos] + list(new_columns) + columns[pos:]
+
+
+def merge_feature_sheet(old_df, new_df, old_samples, new_samples, sort_total=True, fill_missing=True):
+    """合并 特征×样本 布局的工作表（标准化矩阵或分类汇总）
+
+    fill_missing 为 False 时保留缺失值（CLR、16S 拷贝数等缺失值有意义、且缺失的特征不能记为 0 的工作表）
+    """
+    old_cols = _sample_columns(old_df, old_samples)
+    new_cols = _sample_columns(new_df, new_samples)
+    total_cols = [col for col in old_df.columns if col in TOTAL_COLUMNS]
+    keys = [
+        col for col in old_df.columns
+        if col not in old_cols and col not in SUMMARY_COLUMNS and col in new_df.columns
+    ]
+    if 'Risk Rank' in old_df.columns and 'Risk Rank' in new_df.columns:
+        keys.append('Risk Rank')
+
+    right = new_df[keys + new_cols]
+
+    if old_df.duplicated(keys).any() or right.duplicated(keys).any():
+        # 特征键不唯一时只能按行位置对齐
+        if len(old_df) != len(right) or not old_df[keys].reset_index(drop=True).equals(
+                right[keys].reset_index(drop=True)):
+            raise ValueError(f"特征列 {keys} 存在重复且新旧批次行不一致，无法合并")
+        merged = pd.concat(
+            [old_df.reset_index(drop=True), right[new_cols].reset_index(drop=True)], axis=1
+        )
+    else:
+        merged = old_df.merge(right, on=keys, how='left')
+        # 新批次中出现、已有结果中没有的特征
+        flags = right[keys].merge(old_df[keys], on=keys, how='left', indicator=True)['_merge']
+        extra = right[(flags == 'left_only').to_numpy()]
+        if len(extra):
+            merged = pd.concat([merged, extra], ignore_index=True)
+
+    if fill_missing:
+        merged[old_cols + new_cols] = merged[old_cols + new_cols].fillna(0)
+
+    columns = _insert_after_last(list(old_df.columns), old_cols, new_cols)
+    merged = merged[columns]
+
+    if total_cols:
+        for col in total_cols:
+            merged[col] = merged[old_cols + new_cols].sum(axis=1)
+        if sort_total:
+            by = [total_cols[0]]
+            ascending = [False]
+            if 'Risk Rank' in merged.columns:
+                by, ascending = ['Risk Rank'] + by, [True] + ascending
+            merged = merged.sort_values(by=by, ascending=ascending)
+    return merged
+
+
+def merge_sample_rows(old_df, new_df):
+    """合并 样本×特征 布局的汇总表（BacMet），新样本作为新行追加"""
+    total_cols = [col for col in old_df.columns if col in TOTAL_COLUMNS]
+    columns = [col for col in old_df.columns if col not in total_cols]
+    columns += [col for col in new_df.columns if col not in columns and col not in total_cols]
+    columns += total_cols
+
+    merged = pd.concat([old_df, new_df], ignore_index=True)
+    merged = merged[columns]
+    value_cols = columns[1:]
+    merged[value_cols] = merged[value_cols].fillna(0)
+    return merged
+
+
+def merge_workbook_sheets(database, old_sheets, new_sheets, old_samples, new_samples):
+    """逐表合并两个结果工作簿的 {工作表名: DataFrame}，返回合并结果（保持 old_sheets 的工作表顺序）"""
+    merged_sheets = {}
+    for sheet, old_df in old_sheets.items():
+        if sheet.startswith('Top_'):
+            continue
+        if sheet not in new_sheets:
+            logging.warning(f"新批次缺少工作表 {sheet}，保持原样")
+            merged_sheets[sheet] = old_df
+            continue
+
+        new_df = new_sheets[sheet]
+        if database in SAMPLE_ROW_DATABASES and sheet not in _MATRIX_SHEETS:
+            merged_sheets[sheet] = merge_sample_rows(old_df, new_df)
+        else:
+            merged_sheets[sheet] = merge_feature_sheet(
+                old_df, new_df, old_samples, new_samples,
+                sort_total=sheet not in _MATRIX_SHEETS,
+                fill_missing=sheet not in _UNFILLED_SHEETS
+            )
+
+    # 高频ARGs依赖样本总数，基于合并后的汇总表重新筛选
+    for sheet in old_sheets:
+        if sheet.startswith('Top_') and sheet[4:] in merged_sheets:
+            top_df = select_top_args(merged_sheets[sheet[4:]])
+            if top_df is not None:
+                merged_sheets[sheet] = top_df
+
+    return {sheet: merged_sheets[sheet] for sheet in old_sheets if sheet in merged_sheets}
+
+
+def _write_workbook(output_path, sheets):
+    # 先写临时文件再替换
+    with atomic_output(output_path) as tmp_path:
+        with pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
+            for sheet, df in sheets.items():
+                df.to_excel(writer, index=False, sheet_name=sheet)
+
+
+def merge_sample_batch(database, existing_path, batch_path, output_path=None):
+    """将新批次结果合并至已有结果工作簿
+
+    参数：
+        database: 数据库名（CARD / SARG / Victors / BacMet / MGE）
+        existing_path: 已有结果工作簿
+        batch_path: 仅包含新样本的结果工作簿（由同一流程生成）
+        output_path: 输出路径（默认覆盖 existing_path）
+    """
+    try:
+        output_path = Path(output_path or existing_path)
+        old_sheets = pd.read_excel(existing_path, sheet_name=None)
+        new_sheets = pd.read_excel(batch_path, sheet_name=None)
+
+        old_samples = set(workbook_samples(old_sheets, database))
+        new_samples = set(workbook_samples(new_sheets, database))
+        overlap = old_samples & new_samples
+        if overlap:
+            raise ValueError(f"新批次中的样本已存在于结果中: {sorted(overlap)}")
+        if not new_samples:
+            raise ValueError(f"新批次结果中没有样本: {batch_path}")
+
+        _write_workbook(output_path, merge_workbook_sheets(database, old_sheets, new_sheets, old_samples, new_samples))
+
+        logging.info(
+            f"增量合并完成! 新增样本 {len(new_samples)} 个，"
+            f"合计 {len(old_samples) + len(new_samples)} 个，结果保存至: {output_path}"
+        )
+        return True
+    except Exception as e:
+        logging.error(f"增量合并失败: {str(e)}")
+        raise
+
+
+def reduce_workbooks(database, workbook_paths, output_path):
+    """归并多个样本分片的结果工作簿（各分片样本互不重叠，按给定顺序拼接样本）
+
+    标准化矩阵按特征对齐拼接各分片的样本列，分类汇总表的样本列同样拼接后重新计算总计与排序，
+    高频ARGs(Top_)表基于归并后的汇总表重新筛选。
+    参数：
+        database: 数据库名（CARD / SARG / Victors / BacMet / MGE）
+        workbook_paths: 各分片结果工作簿（由同一流程生成）
+        output_path: 归并结果工作簿
+    """
+    from modules.progress import track
+
+    try:
+        workbook_paths = [Path(path) for path in workbook_paths]
+        if not workbook_paths:
+            raise ValueError("没有可归并的分片结果")
+        sheets = pd.read_excel(workbook_paths[0], sheet_name=None)
+        samples = set(workbook_samples(sheets, database))
+        with track('aggregate', f"{database} 分片归并", total=len(workbook_paths), unit='分片') as progress:
+            progress.advance()
+            for path in workbook_paths[1:]:
+                new_sheets = pd.read_excel(path, sheet_name=None)
+                new_samples = set(workbook_samples(new_sheets, database))
+                overlap = samples & new_samples
+                if overlap:
+                    raise ValueError(f"分片 {path} 中的样本已存在于其他分片: {sorted(overlap)}")
+                sheets = merge_workbook_sheets(database, sheets, new_sheets, samples, new_samples)
+                samples |= new_samples
+                progress.advance()
+
+        _write_workbook(output_path, sheets)
+        logging.info(f"分片归并完成! {len(workbook_paths)} 个分片，合计 {len(samples)} 个样本，结果保存至: {output_path}")
+        return Path(output_path)
+    except Exception as e:
+        logging.error(f"分片归并失败: {str(e)}")
+        raise
+
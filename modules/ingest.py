@@ -0,0 +1,209 @@
+"""
+原始计数表摄取模块
+包含：
+- 原始计数表（xlsx/csv/tsv）一次性拆分为注释表与数值块
+- 数值块按数据类型保存为列优先(Fortran 顺序)的 .npy 文件，后续以内存映射方式打开
+- 按源文件大小与修改时间判断缓存是否失效
+
+每个样本列在数值块中是连续存储的只读视图；load_table 组装的 DataFrame 中数值列即为这些视图
+（按数据类型整块包装，不复制），RPKM、16S 等标准化计算直接按列读取内存映射的数值块，
+重复运行（如 --from rpkm）时不再解析原始 Excel。双端合并等运算产生的结果列是新数组。
+"""
+
+import os
+import pickle
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from modules.progress import track
+from modules.frames import to_backend
+
+# 缓存格式变化时递增
+INGEST_VERSION = 1
+CACHE_DIR_NAME = ".ingest"
+
+
+class IngestedTable:
+    """摄取后的计数表
+
+    属性：
+        columns: 原始列顺序
+        annotations: 非数值列（基因ID、注释等）
+        blocks: {数据类型: 二维数值块}，行与原表一致，每列一个样本/数值字段
+        layout: {数值列名: (数据类型, 块内列号)}
+    """
+
+    def __init__(self, columns, annotations, blocks, layout):
+        self.columns = list(columns)
+        # 启用 Arrow 后端时注释文本列转换为 Arrow 字符串类型
+        self.annotations = to_backend(annotations)
+        self.blocks = blocks
+        self.layout = layout
+
+    @property
+    def numeric_columns(self):
+        return [col for col in self.columns if col in self.layout]
+
+    def __len__(self):
+        return len(self.annotations)
+
+    def column(self, name):
+        """返回数值列的只读视图（不复制）"""
+        dtype, j = self.layout[name]
+        return self.blocks[dtype][:, j]
+
+    def to_frame(self):
+        """按原始列顺序组装 DataFrame
+
+        每个数值块整体包装为一个单一数据类型的 DataFrame（copy=False，不复制），
+        与注释表拼接后按原始列顺序排列；数值列是数值块（内存映射）的只读视图。
+        """
+        parts = [self.annotations]
+        for dtype, block in self.blocks.items():
+            names = [None] * block.shape[1]
+            for col, (col_dtype, j) in self.layout.items():
+                if col_dtype == dtype:
+                    names[j] = col
+            parts.append(pd.DataFrame(block, index=self.annotations.index, columns=names, copy=False))
+        return pd.concat(parts, axis=1)[self.columns]
+
+
+def _read_source(source, sheet_name):
+    suffix = source.suffix.lower()
+    if suffix == '.csv':
+        return pd.read_csv(source)
+    if suffix in ('.tsv', '.txt'):
+        return pd.read_csv(source, sep='\t')
+    return pd.read_excel(source, sheet_name=sheet_name)
+
+
+def _split_table(df):
+    """拆分为注释表与按数据类型分组的数值块"""
+    # 仅 numpy 数值类型进入数值块（可空整数等扩展类型保留在注释表中）
+    numeric_cols = {
+        col for col in df.select_dtypes(include=['number']).columns
+        if isinstance(df[col].dtype, np.dtype)
+    }
+    layout = {}
+    grouped = {}
+    for col in df.columns:
+        if col in numeric_cols:
+            dtype = df[col].dtype.str
+            grouped.setdefault(dtype, []).append(col)
+            layout[col] = (dtype, len(grouped[dtype]) - 1)
+
+    blocks = {
+        dtype: np.asfortranarray(df[cols].to_numpy(dtype=np.dtype(dtype)))
+        for dtype, cols in grouped.items()
+    }
+    annotations = df[[col for col in df.columns if col not in numeric_cols]]
+    return annotations, blocks, layout
+
+
+def _cache_paths(source, sheet_name):
+    cache_dir = source.parent / CACHE_DIR_NAME
+    tag = f"{source.stem}.{sheet_name}" if sheet_name not in (0, None) else source.stem
+    return cache_dir, cache_dir / f"{tag}.meta.pkl", str(cache_dir / f"{tag}.{{}}.npy")
+
+
+def _fingerprint(source):
+    stat = source.stat()
+    return [INGEST_VERSION, stat.st_size, stat.st_mtime_ns]
+
+
+def _load_cached(source, meta_path, block_pattern):
+    if not meta_path.exists():
+        return None
+    try:
+        meta = pd.read_pickle(meta_path)
+        if meta['fingerprint'] != _fingerprint(source):
+            return None
+        blocks = {
+            dtype: np.load(block_pattern.format(i), mmap_mode='r')
+            for i, dtype in enumerate(meta['dtypes'])
+        }
+    except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError):
+        logging.warning(f"摄取缓存无法读取，重新解析: {source}")
+        return None
+    return IngestedTable(meta['columns'], meta['annotations'], blocks, meta['layout'])
+
+
+def _write_cache(table, source, cache_dir, meta_path, block_pattern):
+    """写入 .npy 数值块与元数据（元数据最后写入，中断时不会留下可用的半成品缓存）"""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    dtypes = list(table.blocks)
+    for i, dtype in enumerate(dtypes):
+        np.save(block_pattern.format(i), table.blocks[dtype])
+
+    meta = {
+        'fingerprint': _fingerprint(source),
+        'columns': table.columns,
+        'annotations': table.annotations,
+        'layout': table.layout,
+        'dtypes': dtypes,
+    }
+    tmp_path = meta_path.with_name(meta_path.name + '.tmp')
+    pd.to_pickle(meta, tmp_path)
+    os.replace(tmp_path, meta_path)
+
+
+def ingest_table(source, sheet_name=0, cache=True):
+    """摄取原始计数表
+
+    参数：
+        source: 原始表路径（xlsx/csv/tsv）
+        sheet_name: Excel 工作表
+        cache: 是否使用/写入 <源文件目录>/.ingest/ 下的内存映射缓存
+    返回：
+        IngestedTable
+    """
+    source = Path(source)
+    cache_dir, meta_path, block_pattern = _cache_paths(source, sheet_name)
+
+    with track('ingest', f"摄取 {source.name}", unit='行') as progress:
+        if cache:
+            table = _load_cached(source, meta_path, block_pattern)
+            if table is not None:
+                logging.info(f"使用摄取缓存: {source.name} ({len(table)} 行, {len(table.numeric_columns)} 数值列)")
+                progress.total = len(table)
+                return table
+
+        df = _read_source(source, sheet_name)
+        progress.total = len(df)
+        annotations, blocks, layout = _split_table(df)
+        table = IngestedTable(df.columns, annotations, blocks, layout)
+        del df
+
+        if cache:
+            try:
+                _write_cache(table, source, cache_dir, meta_path, block_pattern)
+                # 改用内存映射打开，释放解析时的内存
+                table = _load_cached(source, meta_path, block_pattern) or table
+            except OSError as e:
+                logging.warning(f"摄取缓存写入失败，本次直接使用内存数据: {str(e)}")
+    return table
+
+
+def has_cache(source, sheet_name=0):
+    """源文件是否有有效的摄取缓存（只读取元数据，不打开数值块）"""
+    source = Path(source)
+    _, meta_path, _ = _cache_paths(source, sheet_name)
+    if not meta_path.exists() or not source.exists():
+        return False
+    try:
+        return pd.read_pickle(meta_path)['fingerprint'] == _fingerprint(source)
+    except (OSError, ValueError, KeyError, EOFError, pickle.UnpicklingError):
+        return False
+
+
+def load_table(source, sheet_name=0, cache=None):
+    """读取原始计数表为 DataFrame（经摄取缓存，等价于 pd.read_excel 的结果）
+
+    数值列是摄取数值块的只读视图（见 IngestedTable.to_frame），不会整表复制。
+    cache 为 None 时使用 config/default_paths.py 中的 ENABLE_INGEST_CACHE。
+    """
+    if cache is None:
+        from config.default_paths import ENABLE_INGEST_CACHE
+        cache = ENABLE_INGEST_CACHE
+    return ingest_table(source, sheet_name=sheet_name, cache=cache).to_frame()
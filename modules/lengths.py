@@ -0,0 +1,150 @@
+"""
+参考基因长度索引模块
+包含：
+- 按参考数据库构建 基因ID → 长度 的索引（同一文件在进程内只构建一次，文件变化后自动重建）
+- 按ID数组批量查找，返回与输入对齐的 NumPy 长度向量
+- 统计未找到长度（或长度无效）而使用默认值的行数，并写入日志
+
+长度查找基于 pandas.Index 的哈希查找一次完成，不再逐行 map 字典。
+"""
+
+import logging
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# 16S rRNA 基因长度，MGE 未找到参考长度时的默认值
+DEFAULT_LENGTH = 1492
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class LengthLookup:
+    """一次长度查找的结果
+
+    属性：
+        lengths: 与输入ID对齐的长度（float64）
+        total: 查找的行数
+        missing: 索引中不存在的行数
+        invalid: 索引中存在但长度无效的行数
+    """
+
+    def __init__(self, lengths, total, missing, invalid):
+        self.lengths = lengths
+        self.total = total
+        self.missing = missing
+        self.invalid = invalid
+
+    @property
+    def fallback(self):
+        """使用默认长度的行数"""
+        return self.missing + self.invalid
+
+
+class GeneLengthIndex:
+    """参考基因长度索引
+
+    属性：
+        name: 参考数据库名（用于日志）
+        ids: 基因ID索引（pandas.Index，去重）
+        lengths: 与 ids 对齐的长度（float64，无效长度为 NaN）
+    """
+
+    def __init__(self, name, ids, lengths):
+        self.name = name
+        self.ids = pd.Index(ids)
+        self.lengths = np.asarray(lengths, dtype='float64')
+        if len(self.ids) != len(self.lengths):
+            raise ValueError(f"{name} 长度索引的ID数与长度数不一致")
+        if not self.ids.is_unique:
+            raise ValueError(f"{name} 长度索引中存在重复ID")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, gene_id):
+        return gene_id in self.ids
+
+    def lookup(self, ids, default=DEFAULT_LENGTH):
+        """批量查找长度
+
+        参数：
+            ids: 基因ID数组（与数据行对齐）
+            default: 未找到或长度无效时使用的长度（可为 NaN）
+        返回：
+            LengthLookup，lengths 为与 ids 对齐的 float64 数组
+        """
+        positions = self.ids.get_indexer(pd.Index(ids))
+        found = positions >= 0
+        lengths = np.full(len(positions), np.nan)
+        lengths[found] = self.lengths[positions[found]]
+        invalid = found & np.isnan(lengths)
+        lengths[~found | invalid] = default
+        result = LengthLookup(
+            lengths=lengths,
+            total=len(positions),
+            missing=int((~found).sum()),
+            invalid=int(invalid.sum()),
+        )
+        if result.fallback:
+            fill = "缺失值" if pd.isna(default) else f"默认长度 {default}"
+            logging.warning(
+                f"{self.name} 长度索引: {result.total} 行中 {result.missing} 行未找到长度、"
+                f"{result.invalid} 行长度无效，使用{fill}"
+            )
+        else:
+            logging.info(f"{self.name} 长度索引: {result.total} 行均已匹配到长度")
+        return result
+
+
+def build_length_index(name, table, id_column, length_column, keep='first'):
+    """由注释表构建长度索引（重复ID按 keep 保留其一，长度无法解析为数值时记为无效）"""
+    table = table.drop_duplicates(id_column, keep=keep)
+    lengths = pd.to_numeric(table[length_column], errors='coerce')
+    return GeneLengthIndex(name, table[id_column].to_numpy(), lengths.to_numpy(dtype='float64'))
+
+
+def _cached(name, path, build):
+    """按文件路径、大小与修改时间缓存索引"""
+    path = Path(path)
+    stat = path.stat()
+    key = (name, str(path.resolve()))
+    fingerprint = (stat.st_size, stat.st_mtime_ns)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            return entry[1]
+    index = build(path)
+    with _cache_lock:
+        _cache[key] = (fingerprint, index)
+    logging.info(f"已构建 {name} 长度索引: {path.name} ({len(index)} 个基因)")
+    return index
+
+
+def mge_length_index(search_file):
+    """MGE 参考长度索引（Search.txt：Accession 与长度两列，重复 Accession 以最后一条为准）"""
+    def build(path):
+        table = pd.read_csv(path, sep='\t', names=['Accession', 'Length'])
+        return build_length_index('MGE', table, 'Accession', 'Length', keep='last')
+    return _cached('MGE', search_file, build)
+
+
+def bacmet_length_index(mapping_file):
+    """BacMet 参考长度索引（映射文件的 BacMet_ID 与长度列，兼容 'gene lentgh' 拼写）"""
+    def build(path):
+        table = pd.read_csv(path, sep='\t', header=0)
+        length_column = next(
+            (col for col in ('gene length', 'gene lentgh') if col in table.columns), None
+        )
+        if length_column is None:
+            raise KeyError(f"BacMet映射文件缺少长度列（gene length / gene lentgh）: {path}")
+        return build_length_index('BacMet', table, 'BacMet_ID', length_column, keep='first')
+    return _cached('BacMet', mapping_file, build)
+
+
+def clear_cache():
+    """清空进程内的长度索引缓存"""
+    with _cache_lock:
+        _cache.clear()
@@ -1,45 +1,62 @@
 """
 MGE 数据聚合模块
 包含基因分类汇总功能
+
+先按完整基因名（每个 Accession 一行）汇总，再由基因名汇总结果按第一个下划线前的名称再聚合，
+基因名的拆分只对去重后的基因名执行。
 """
 
 import pandas as pd
 import logging
+from modules.utils import write_sheets
+from modules.rollup import rollup
+from modules.workbook import read_sheets
+
+
+def gene_prefix(gene):
+    """分割第一个下划线，取基因名前缀（非字符串视为缺失）"""
+    return gene.split('_', 1)[0] if isinstance(gene, str) else None
+
+
+def build_gene_classification(input_path):
+    """按基因(Genes)分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    process_config = [
+        ('RPKM', 'Gene_RPKM'),
+        ('16SRPKM', 'Gene_16SRPKM')
+    ]
+
+    sheets = {}
+    workbook = read_sheets(input_path, [input_sheet for input_sheet, _ in process_config])
+    for input_sheet, output_sheet in process_config:
+        df = workbook[input_sheet]
+        df.drop(columns=['Length', 'Number'], inplace=True, errors='ignore')
+
+        # 预处理Genes列
+        if 'Genes' not in df.columns:
+            raise ValueError(f"输入表 {input_sheet} 中缺少Genes列")
+
+        # 按完整基因名汇总，再按基因名前缀（第一个下划线之前）聚合
+        numeric_cols = df.select_dtypes(include=['number']).columns.difference(['Genes'])
+        sums = rollup(df, ['Genes'], numeric_cols, derived={'Prefix': ('Genes', gene_prefix)})
+        grouped = sums['Prefix'].rename_axis('Genes').T
+        grouped.loc['Total'] = grouped.sum()
+
+        # 格式化结果
+        result = grouped.T.reset_index()
+        result = result.rename(columns={'index': 'Genes'})
+        result = result.sort_values('Total', ascending=False)
+
+        # 收集结果
+        sheets[output_sheet] = result
+        logging.info(f"✅ {output_sheet} 汇总已生成")
 
+    return sheets
 
 def generate_gene_classification(input_path, output_path):
     """按基因(Genes)分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'Gene_RPKM'),
-            ('16SRPKM', 'Gene_16SRPKM')
-        ]
-
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                df.drop(columns=['Length', 'Number'], inplace=True, errors='ignore')
-
-                # 预处理Genes列
-                if 'Genes' not in df.columns:
-                    raise ValueError(f"输入表 {input_sheet} 中缺少Genes列")
-
-                # 分割第一个下划线
-                df['Genes'] = df['Genes'].str.split('_', n=1).str[0]
-
-                # 按Genes聚合
-                numeric_cols = df.select_dtypes(include=['number']).columns.difference(['Genes'])
-                grouped = df.groupby('Genes')[numeric_cols].sum().T
-                grouped.loc['Total'] = grouped.sum()
-
-                # 格式化结果
-                result = grouped.T.reset_index()
-                result = result.rename(columns={'index': 'Genes'})
-                result = result.sort_values('Total', ascending=False)
-
-                # 保存结果
-                result.to_excel(writer, index=False, sheet_name=output_sheet)
-                logging.info(f"✅ {output_sheet} 工作表已创建")
+        sheets = build_gene_classification(input_path)
+        write_sheets(output_path, sheets)
 
         logging.info(f"基因分类汇总完成! 结果已保存至: {output_path}")
         return True
@@ -6,26 +6,29 @@ MGE RPKM计算模块
 import pandas as pd
 import re
 import logging
-from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm, setup_logging
-from config.default_paths import PROJECT_ROOT
+from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm, atomic_output
+from modules.ingest import load_table
+from modules.parallel import map_column_blocks
+from modules.lengths import mge_length_index
+from modules.frames import drop_duplicate_columns
+from modules.samples import resolve_columns
+from modules.normalize import LENGTH_16S, write_normalizations
 
 def process_mge_data(input_file, output_file, search_file, reads_path, reads_16s_path):
     """处理MGE原始数据并计算RPKM/16S RPKM"""
-    setup_logging(PROJECT_ROOT)  # 添加项目根目录参数
     try:
-        search_df = pd.read_csv(search_file, sep='\t', names=['Accession', 'Length'])
-        length_mapping = search_df.set_index('Accession')['Length'].to_dict()
+        # 参考长度索引（同一 Search.txt 只构建一次）
+        length_index = mge_length_index(search_file)
 
         # 读取原始MGE计数数据
-        df = pd.read_excel(input_file)
+        df = load_table(input_file)
 
         # 调整执行顺序：先处理数据再计算
-        # 删除重复列
-        df = df.T.drop_duplicates(keep='first').T
+        # 删除重复列（按列比较，不转置整表，样本列保持数值类型）
+        df = drop_duplicate_columns(df, keep='first')
 
-        # 列名处理（简化正则）
-        df.columns = df.columns.str.replace(r'\s+Read Count$', '', regex=True)
-        df.columns = df.columns.str.replace(r'^.*?-', '', regex=True)  # 仅删除前缀
+        # 列名处理：'<前缀>-<样本> Read Count' 重命名为样本名
+        df = df.rename(columns=resolve_columns('MGE', df.columns).rename_map())
 
         # 拆分基因信息
         split_cols = df.iloc[:, 0].str.extract(r'^([^_]*)_(.*)_([^_]*)$')
@@ -35,7 +38,8 @@ def process_mge_data(input_file, output_file, search_file, reads_path, reads_16s
         # 处理Length列
         if 'Length' in df.columns:
             df = df.drop(columns=['Length'])
-        df['Length'] = pd.to_numeric(df['Accession'].map(length_mapping), errors='coerce').fillna(1492)
+        # 未找到长度的 Accession 使用默认长度 1492，并在日志中报告行数
+        df['Length'] = length_index.lookup(df['Accession']).lengths
 
         # 修复样本验证逻辑（排除元数据列）
         metadata_columns = ['Number', 'Genes', 'Accession', 'Length']
@@ -46,31 +50,43 @@ def process_mge_data(input_file, output_file, search_file, reads_path, reads_16s
         rpkm_values = calculate_rpkm(
             df[sample_columns],  # 仅数值列
             reads_data,
-            df['Length']
+            lengths=df['Length'].to_numpy()
         )
         # 合并元数据与计算结果
         rpkm_df = pd.concat([df[['Number', 'Genes', 'Accession']], rpkm_values], axis=1)
 
-        # 计算16S RPKM（修复分母计算）
+        # 计算16S RPKM（修复分母计算），逐列计算比值，无需复制整表
         reads_16s_data = read_16s_reads_file(reads_16s_path)
-        rpkm_16s_df = df.copy()
 
-        for col in sample_columns:  # 使用已定义的样本列
-            base_col = re.sub(r'[-_]\d+$', '', col)
-            actual_col = base_col if base_col in reads_16s_data else col
-            if actual_col in reads_16s_data:
-                denominator = (1492 / 1000) * (reads_16s_data[actual_col] / 1e6)
-                rpkm_16s_df[col] = reads_16s_data[actual_col] / denominator
+        def ratio_block(block):
+            ratio_values = []
+            for col in block:
+                base_col = re.sub(r'[-_]\d+$', '', col)
+                actual_col = base_col if base_col in reads_16s_data else col
+                if actual_col in reads_16s_data:
+                    denominator = (LENGTH_16S / 1000) * (reads_16s_data[actual_col] / 1e6)
+                    value_16s = reads_16s_data[actual_col] / denominator
+                else:
+                    value_16s = df[col]
+                ratio_values.append(rpkm_df[col] / value_16s)
+            return ratio_values
+
+        ratio_values = map_column_blocks(ratio_block, sample_columns)  # 使用已定义的样本列
 
         # 保存结果时保持元数据列
-        with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        with atomic_output(output_file) as tmp_path, pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
             rpkm_df.to_excel(writer, index=False, sheet_name='RPKM')
 
             # 计算比值时保留元数据
-            ratio_values = rpkm_df[sample_columns] / rpkm_16s_df[sample_columns]
-            ratio_df = pd.concat([rpkm_df[['Number', 'Genes', 'Accession']], ratio_values], axis=1)
+            ratio_df = pd.concat([rpkm_df[['Number', 'Genes', 'Accession']], *ratio_values], axis=1)
             ratio_df.to_excel(writer, index=False, sheet_name='16SRPKM')
 
+            # 额外标准化（TPM/CPM 等，见配置 EXTRA_NORMALIZATIONS）
+            write_normalizations(
+                writer, df[['Number', 'Genes', 'Accession', *sample_columns]], reads_data, reads_16s_data,
+                lengths=df['Length'].to_numpy()
+            )
+
         logging.info(f"✅ RPKM计算完成! 结果保存至: {output_file}")
         return True
     except Exception as e:
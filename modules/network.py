@@ -0,0 +1,236 @@
+"""
+ARG-MGE-病原体共现网络模块
+包含：
+- 由各数据库结果文件的汇总层级（CARD/SARG ARGs、MGE Genes、Victors Pathogen、BacMet Compound 等，
+  见 NETWORK_LEVELS）构建共同样本上的 特征×样本 矩阵
+- 分块（tile）计算 Spearman / Pearson 相关系数：每次只计算两个特征块之间的相关矩阵，
+  全部特征对的相关矩阵不会同时存在于内存中
+- t 分布近似的 p 值（闭式公式，不需要 scipy）与 Benjamini-Hochberg FDR：
+  只保留 p 值不超过 FDR 阈值的特征对（FDR 不超过阈值的特征对必然在其中，其 q 值与全量校正相同）
+- 按 |r| 与 q 值阈值导出边表（network_edges.csv，source/target 列可直接导入 Gephi、Cytoscape）与节点表
+"""
+
+import math
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+CORRELATION_METHODS = ('spearman', 'pearson')
+
+EDGE_COLUMNS = ['source', 'target', 'r', 'p_value', 'q_value', 'sign']
+
+
+def t_test_p(r, n):
+    """相关系数的双侧 p 值（t 分布，自由度 n-2，闭式公式）
+
+    令 θ = arcsin|r|，P(|T| < t) 按自由度奇偶分别为有限级数（Abramowitz & Stegun 26.7.3 / 26.7.4）。
+    """
+    r = np.clip(np.abs(np.asarray(r, dtype='float64')), 0, 1)
+    df = n - 2
+    if df < 1:
+        return np.full(r.shape, np.nan)
+    cos2 = 1 - r * r
+    if df % 2 == 0:
+        term = np.ones_like(r)
+        total = term.copy()
+        for k in range(1, df // 2):
+            term = term * cos2 * (2 * k - 1) / (2 * k)
+            total += term
+        inside = r * total
+    else:
+        theta = np.arcsin(r)
+        inside = theta
+        if df > 1:
+            term = np.ones_like(r)
+            total = term.copy()
+            for k in range(1, (df - 1) // 2):
+                term = term * cos2 * (2 * k) / (2 * k + 1)
+                total += term
+            inside = theta + r * np.sqrt(cos2) * total
+        inside = inside * 2 / math.pi
+    return np.clip(1 - inside, 0, 1)
+
+
+def _standardize(values, method):
+    """按行中心化并归一化，使两行的点积即为相关系数"""
+    if method == 'spearman':
+        from modules.stats import rank_rows
+        values, _ = rank_rows(values)
+    centered = values - values.mean(axis=1, keepdims=True)
+    norms = np.sqrt((centered ** 2).sum(axis=1, keepdims=True))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return centered / norms
+
+
+def correlation_edges(values, labels=None, method='spearman', min_r=0.0, max_q=0.05,
+                      tile=2000, cross_only=False):
+    """分块计算全部特征对的相关性，返回通过阈值的边
+
+    参数：
+        values: 特征×样本 数值矩阵（方差为 0 的特征应事先去除）
+        labels: 各特征所属数据库（cross_only 时只检验不同数据库之间的特征对）
+        method: spearman / pearson
+        min_r / max_q: 导出边的 |r| 下限与 FDR 上限
+        tile: 每块特征数（每次计算 tile×tile 的相关矩阵）
+    返回：
+        (DataFrame[i, j, r, p_value, q_value]，检验的特征对总数)
+    """
+    from modules.progress import track
+
+    if method not in CORRELATION_METHODS:
+        raise ValueError(f"未知相关方法: {method}，可选: {', '.join(CORRELATION_METHODS)}")
+    values = np.asarray(values, dtype='float64')
+    n_features, n_samples = values.shape
+    if cross_only and labels is None:
+        raise ValueError("cross_only 需要给出各特征所属数据库 labels")
+    codes = pd.factorize(np.asarray(labels))[0] if labels is not None else None
+    standardized = _standardize(values, method)
+
+    starts = list(range(0, n_features, tile))
+    n_tests = 0
+    candidates = []  # p 值不超过 max_q 的全部特征对的 p 值（用于计算 BH 秩次）
+    kept = []
+    with track('analysis', f"相关性分块计算（{n_features} 个特征）",
+               total=len(starts) * (len(starts) + 1) // 2, unit='块') as progress:
+        for a, i0 in enumerate(starts):
+            block_i = standardized[i0:i0 + tile]
+            for j0 in starts[a:]:
+                block_j = standardized[j0:j0 + tile]
+                r = np.clip(block_i @ block_j.T, -1, 1)
+
+                mask = np.ones(r.shape, dtype=bool)
+                if i0 == j0:
+                    mask = np.triu(mask, k=1)
+                if cross_only:
+                    mask &= codes[i0:i0 + tile, None] != codes[None, j0:j0 + tile]
+                rows, cols = np.nonzero(mask)
+                r = r[rows, cols]
+                p = t_test_p(r, n_samples)
+                n_tests += len(p)
+
+                significant = p <= max_q
+                candidates.append(p[significant])
+                strong = significant & (np.abs(r) >= min_r)
+                kept.append((rows[strong] + i0, cols[strong] + j0, r[strong], p[strong]))
+                progress.advance()
+
+    edges = pd.DataFrame({
+        'i': np.concatenate([item[0] for item in kept]) if kept else np.array([], dtype=int),
+        'j': np.concatenate([item[1] for item in kept]) if kept else np.array([], dtype=int),
+        'r': np.concatenate([item[2] for item in kept]) if kept else np.array([]),
+        'p_value': np.concatenate([item[3] for item in kept]) if kept else np.array([]),
+    })
+
+    # BH：被丢弃的特征对 p 值均大于 max_q，其校正值也大于 max_q，不影响保留特征对的 q 值
+    pool = np.sort(np.concatenate(candidates)) if candidates else np.array([])
+    if len(pool):
+        scaled = pool * n_tests / np.arange(1, len(pool) + 1)
+        q_sorted = np.minimum(np.minimum.accumulate(scaled[::-1])[::-1], 1.0)
+        positions = np.searchsorted(pool, edges['p_value'].to_numpy(), side='right') - 1
+        edges['q_value'] = q_sorted[positions]
+    else:
+        edges['q_value'] = np.array([])
+    edges = edges[edges['q_value'] <= max_q].reset_index(drop=True)
+    return edges, n_tests
+
+
+def collect_features(outputs, levels=None, value=None, min_prevalence=None):
+    """读取各数据库结果文件中参与网络的层级，合并为共同样本上的特征矩阵
+
+    返回：
+        (特征×样本 DataFrame（行名为 数据库:层级:特征），节点表 DataFrame)
+    """
+    from modules.store import workbook_matrices
+    from config import default_paths
+
+    levels = levels if levels is not None else default_paths.NETWORK_LEVELS
+    value = value or default_paths.NETWORK_VALUE
+    min_prevalence = default_paths.NETWORK_MIN_PREVALENCE if min_prevalence is None else min_prevalence
+
+    matrices = []
+    for database, workbook_path in outputs.items():
+        if database not in levels:
+            continue
+        if not Path(workbook_path).exists():
+            logging.warning(f"跳过 {database}: 结果文件不存在 {workbook_path}")
+            continue
+        for level, matrix in workbook_matrices(workbook_path, database, value, levels[database]).items():
+            nodes = pd.DataFrame({'database': database, 'level': level, 'feature': matrix.index})
+            nodes.index = [f"{database}:{level}:{feature}" for feature in matrix.index]
+            matrix = matrix.set_axis(nodes.index, axis=0)
+            matrices.append((matrix, nodes))
+    if not matrices:
+        return None, None
+
+    samples = [sample for sample in matrices[0][0].columns if all(sample in m.columns for m, _ in matrices)]
+    matrix = pd.concat([m[samples] for m, _ in matrices])
+    nodes = pd.concat([n for _, n in matrices])
+
+    # 检出率不足或各样本取值相同的特征不参与相关性计算
+    prevalence = (matrix > 0).mean(axis=1)
+    keep = (prevalence >= min_prevalence) & (matrix.std(axis=1) > 0)
+    dropped = int((~keep).sum())
+    if dropped:
+        logging.info(f"共现网络: {dropped} 个特征检出率低于 {min_prevalence:.0%} 或无变化，不参与计算")
+    matrix = matrix[keep]
+    nodes = nodes[keep].rename_axis('id').reset_index()
+    nodes['prevalence'] = prevalence[keep].to_numpy()
+    nodes['mean_abundance'] = matrix.mean(axis=1).to_numpy()
+    return matrix, nodes
+
+
+def build_network(outputs, output_dir, method=None, min_r=None, max_q=None):
+    """构建跨数据库共现网络并导出边表与节点表
+
+    参数：
+        outputs: {数据库名: 结果工作簿路径}
+        output_dir: 网络文件输出目录
+        method / min_r / max_q: 相关方法与阈值（默认使用配置 NETWORK_METHOD / NETWORK_MIN_R / NETWORK_MAX_Q）
+    返回：
+        (边表路径, 节点表路径)；可用特征或样本不足时返回 None
+    """
+    from modules.utils import atomic_output
+    from config import default_paths
+
+    method = method or default_paths.NETWORK_METHOD
+    min_r = default_paths.NETWORK_MIN_R if min_r is None else min_r
+    max_q = default_paths.NETWORK_MAX_Q if max_q is None else max_q
+    try:
+        matrix, nodes = collect_features(outputs)
+        if matrix is None or len(matrix) < 2 or matrix.shape[1] < 3:
+            logging.warning("共现网络: 可用特征少于 2 个或共同样本少于 3 个，跳过")
+            return None
+        logging.info(f"共现网络: {len(matrix)} 个特征，{matrix.shape[1]} 个共同样本，{method} 相关")
+
+        edges, n_tests = correlation_edges(
+            matrix.to_numpy(), nodes['database'].to_numpy(), method, min_r, max_q,
+            tile=default_paths.NETWORK_TILE, cross_only=default_paths.NETWORK_CROSS_ONLY
+        )
+        ids = nodes['id'].to_numpy()
+        edges = pd.DataFrame({
+            'source': ids[edges['i'].to_numpy()],
+            'target': ids[edges['j'].to_numpy()],
+            'r': edges['r'].to_numpy(),
+            'p_value': edges['p_value'].to_numpy(),
+            'q_value': edges['q_value'].to_numpy(),
+        })
+        edges['sign'] = np.where(edges['r'] >= 0, 'positive', 'negative')
+        edges = edges[EDGE_COLUMNS]
+        degree = pd.concat([edges['source'], edges['target']]).value_counts()
+        nodes['degree'] = nodes['id'].map(degree).fillna(0).astype(int)
+
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        edges_path = output_dir / "network_edges.csv"
+        nodes_path = output_dir / "network_nodes.csv"
+        with atomic_output(edges_path) as tmp_path:
+            edges.to_csv(tmp_path, index=False)
+        with atomic_output(nodes_path) as tmp_path:
+            nodes.to_csv(tmp_path, index=False)
+        logging.info(f"✅ 共现网络: 检验 {n_tests} 对特征，导出 {len(edges)} 条边（|r| ≥ {min_r}，FDR ≤ {max_q}），"
+                     f"保存至: {output_dir}")
+        return edges_path, nodes_path
+    except Exception as e:
+        logging.error(f"共现网络构建失败: {str(e)}")
+        raise
@@ -0,0 +1,159 @@
+"""
+丰度标准化模块
+包含：
+- RPKM：counts / (基因长度kb × reads/1e6)
+- TPM：先按基因长度(kb)标准化，再按样本缩放到总和 1e6
+- CPM：counts / reads × 1e6（不考虑基因长度）
+- 每 16S 拷贝的基因拷贝数：(counts / 基因长度) / (16S reads / 16S 长度)，
+  与 CARD / SARG / BacMet 的 16SRPKM 工作表（RPKM / 16S RPKM）的计算公式相同
+- CLR（中心对数比）：log((counts + 伪计数) / 基因长度kb) 减去该样本所有基因的均值，用于成分数据统计
+
+计数矩阵、基因长度向量与 reads / 16S reads 深度向量只整理一次，
+所需的各种标准化均为整块矩阵运算；结果作为额外工作表写入 RPKM 结果文件
+（config/default_paths.py 中的 EXTRA_NORMALIZATIONS），也可直接取得 DataFrame。
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+
+# 16S rRNA 基因长度（bp）
+LENGTH_16S = 1492
+
+# 标准化方法 -> 工作表名
+NORMALIZATIONS = {
+    'rpkm': 'RPKM',
+    'tpm': 'TPM',
+    'cpm': 'CPM',
+    'copies': 'Copies_16S',
+    'clr': 'CLR',
+}
+
+# 可作为额外工作表写出的标准化（RPKM 工作表由各计算模块写出）
+EXTRA_KINDS = ('tpm', 'cpm', 'copies', 'clr')
+
+# CLR 的伪计数（避免 log(0)）
+CLR_PSEUDOCOUNT = 0.5
+
+
+class Normalizer:
+    """一张计数表的标准化输入（样本计数矩阵、基因长度与测序深度，各只整理一次）
+
+    属性：
+        samples: 样本列名（在 reads 统计中存在的数值列，按原顺序）
+        annotations: 注释列（非数值列）
+        counts: 计数矩阵（行数 × 样本数，float64，缺失记为 0）
+        length_kb: 基因长度（kb，与行对齐）
+        reads / reads_16s: 各样本 reads 与 16S reads 数（缺失为 NaN）
+    """
+
+    def __init__(self, df, reads, reads_16s=None, length_column=None, lengths=None):
+        from modules.utils import find_length_column
+
+        if lengths is None:
+            length_column = length_column or find_length_column(df)
+            lengths = pd.to_numeric(df[length_column], errors='coerce')
+        self.length_kb = np.asarray(lengths, dtype='float64') / 1000
+
+        # 样本列：在 reads 统计中存在的数值列（与 calculate_rpkm 换算的列相同）
+        numeric = df.select_dtypes(include=['number']).columns
+        self.samples = [col for col in numeric if col in reads and col != length_column]
+        self.annotations = df[[col for col in df.columns if col not in numeric]]
+        self.counts = df[self.samples].apply(pd.to_numeric, errors='coerce').fillna(0).to_numpy(dtype='float64')
+
+        reads_16s = reads_16s or {}
+        self.reads = np.array([reads.get(col, np.nan) for col in self.samples], dtype='float64')
+        self.reads_16s = np.array([reads_16s.get(col, np.nan) for col in self.samples], dtype='float64')
+        self._rate = None
+
+    @property
+    def rate(self):
+        """按基因长度标准化的计数（counts / 长度kb），TPM 与拷贝数共用"""
+        if self._rate is None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self._rate = self.counts / self.length_kb[:, None]
+        return self._rate
+
+    def rpkm(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.rate / (self.reads / 1e6)
+
+    def tpm(self):
+        rate = np.where(np.isfinite(self.rate), self.rate, 0)
+        totals = rate.sum(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(totals > 0, rate / totals * 1e6, 0.0)
+
+    def cpm(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.counts / self.reads * 1e6
+
+    def copies(self):
+        # (counts / 基因长度) / (16S reads / 16S 长度)，长度单位统一为 kb
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.rate / (self.reads_16s / (LENGTH_16S / 1000))
+
+    def clr(self, pseudocount=CLR_PSEUDOCOUNT):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            logs = np.log((self.counts + pseudocount) / self.length_kb[:, None])
+        # 长度缺失的基因不参与中心化
+        valid = np.isfinite(logs)
+        centers = np.where(valid, logs, 0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+        return np.where(valid, logs - centers, np.nan)
+
+    def matrix(self, kind):
+        if kind not in NORMALIZATIONS:
+            raise ValueError(f"未知标准化方法: {kind}，可选: {', '.join(NORMALIZATIONS)}")
+        return getattr(self, kind)()
+
+    def frame(self, kind, with_annotations=True):
+        """标准化结果表（注释列在前，样本列在后）"""
+        values = pd.DataFrame(self.matrix(kind), index=self.annotations.index, columns=self.samples)
+        if not with_annotations:
+            return values
+        return pd.concat([self.annotations, values], axis=1)
+
+    def frames(self, kinds, with_annotations=True):
+        """{工作表名: 标准化结果表}"""
+        return {NORMALIZATIONS[kind]: self.frame(kind, with_annotations) for kind in kinds}
+
+
+def extra_kinds(kinds=None):
+    """需额外写出的标准化方法（默认使用配置 EXTRA_NORMALIZATIONS）"""
+    if kinds is None:
+        from config.default_paths import EXTRA_NORMALIZATIONS
+        kinds = EXTRA_NORMALIZATIONS
+    kinds = list(dict.fromkeys(kinds))
+    unknown = [kind for kind in kinds if kind not in EXTRA_KINDS]
+    if unknown:
+        raise ValueError(f"未知的额外标准化方法: {', '.join(unknown)}，可选: {', '.join(EXTRA_KINDS)}")
+    return kinds
+
+
+def write_normalizations(writer, df, reads, reads_16s, length_column=None, lengths=None, kinds=None):
+    """将额外的标准化结果作为工作表写入已打开的 ExcelWriter
+
+    参数：
+        writer: pd.ExcelWriter（RPKM 结果文件）
+        df: 样本列已合并为样本名的计数表（与传给 calculate_rpkm 的表相同）
+        reads / reads_16s: reads 与 16S reads 统计
+        length_column / lengths: 长度列名或与行对齐的长度向量（均未给定时自动检测长度列）
+        kinds: 标准化方法（默认使用配置 EXTRA_NORMALIZATIONS）
+    返回：
+        写出的工作表名列表
+    """
+    from modules.progress import track
+
+    kinds = extra_kinds(kinds)
+    if not kinds:
+        return []
+    try:
+        normalizer = Normalizer(df, reads, reads_16s, length_column, lengths)
+        with track('rpkm', f"额外标准化（{', '.join(kinds)}）", total=len(kinds), unit='项') as progress:
+            for kind in kinds:
+                normalizer.frame(kind).to_excel(writer, index=False, sheet_name=NORMALIZATIONS[kind])
+                progress.advance()
+        return [NORMALIZATIONS[kind] for kind in kinds]
+    except Exception as e:
+        logging.error(f"额外标准化计算失败: {str(e)}")
+        raise
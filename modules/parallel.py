@@ -0,0 +1,90 @@
+"""
+样本列分块并行模块
+包含：
+- 将样本列划分为若干块，用线程池并行处理后按原顺序拼接
+- 基于分组编码的分组求和（各块共享同一次分组编码与排序）
+
+RPKM、16S 比值与分组求和在各样本列之间相互独立；NumPy 的数值内核
+（除法、np.add.reduceat 等）执行时会释放 GIL，因此线程即可利用多核。
+线程数为 1（默认）时不启用并行，直接使用原有的 pandas 实现。
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+
+# 每块最少样本列数，避免列数较少时线程调度开销超过计算本身
+MIN_BLOCK_COLUMNS = 16
+
+_workers = None
+
+
+def set_workers(workers):
+    """设置样本列并行线程数（None 表示使用配置 SAMPLE_WORKERS）"""
+    global _workers
+    _workers = None if workers is None else max(1, int(workers))
+
+
+def get_workers():
+    if _workers is not None:
+        return _workers
+    from config.default_paths import SAMPLE_WORKERS
+    return max(1, int(SAMPLE_WORKERS or 1))
+
+
+def column_blocks(columns, workers=None):
+    """将列划分为连续的若干块"""
+    columns = list(columns)
+    workers = workers or get_workers()
+    n_blocks = min(workers, math.ceil(len(columns) / MIN_BLOCK_COLUMNS)) if columns else 0
+    if n_blocks <= 1:
+        return [columns] if columns else []
+    size = math.ceil(len(columns) / n_blocks)
+    return [columns[i:i + size] for i in range(0, len(columns), size)]
+
+
+def map_column_blocks(func, columns, workers=None):
+    """按列块并行执行 func(块内列名列表) -> 列表，按原列顺序拼接结果"""
+    blocks = column_blocks(columns, workers)
+    if len(blocks) <= 1:
+        return [item for block in blocks for item in func(block)]
+    with ThreadPoolExecutor(max_workers=len(blocks)) as executor:
+        results = list(executor.map(func, blocks))
+    return [item for result in results for item in result]
+
+
+def group_sum(df, key, value_columns, workers=None):
+    """按 key 列分组对 value_columns 求和，结果等同于 df.groupby(key)[value_columns].sum()
+
+    单线程时直接调用 pandas；多线程时先对 key 编码并排序一次，
+    再按样本列块并行执行 np.add.reduceat。
+    """
+    workers = workers or get_workers()
+    value_columns = list(value_columns)
+    if workers <= 1 or len(value_columns) < 2 * MIN_BLOCK_COLUMNS:
+        return df.groupby(key)[value_columns].sum()
+
+    # 与 groupby 一致：组名排序，缺失的组名不参与分组
+    codes, uniques = pd.factorize(df[key], sort=True)
+    valid = np.flatnonzero(codes >= 0)
+    order = valid[np.argsort(codes[valid], kind='stable')]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]) if len(order) else order
+    present = sorted_codes[starts] if len(order) else sorted_codes
+
+    index = pd.Index(uniques[present], name=key)
+
+    def sum_block(block):
+        sums = []
+        for col in block:
+            values = df[col].to_numpy()[order]
+            if values.dtype.kind == 'f':
+                # 与 pandas 一致：缺失值按 0 计
+                values = np.nan_to_num(values, nan=0.0)
+            summed = np.add.reduceat(values, starts) if len(order) else values[:0]
+            sums.append(pd.Series(summed, index=index))
+        return sums
+
+    sums = map_column_blocks(sum_block, value_columns, workers)
+    return pd.concat(sums, axis=1, keys=value_columns)
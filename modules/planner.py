@@ -0,0 +1,409 @@
+"""
+执行计划模块（按内存上限选择执行方式）
+包含：
+- 只读取表头与少量数据行探测各数据库的原始计数表：基因数 × 样本列数、样本列非零比例（密度）
+- 按探测结果估算内存占用，在内存上限（--memory-limit）内为每个数据库选择样本列并行线程数
+  （并行时每个线程另有本块的临时结果；单线程仍超出上限时可改用 shard 按样本分片执行）
+- 多个队列同时运行时按内存上限准入：各运行在准入目录中登记预计峰值内存，
+  已登记的峰值之和加上本次不超过上限时才开始执行，否则等待其他运行结束
+
+估算为保守的经验值（见下方常量），用于避免节点内存不足时使用交换分区，而非精确预测。
+"""
+
+import os
+import json
+import atexit
+import time
+import socket
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# 探测密度时读取的数据行数
+DENSITY_PROBE_ROWS = 200
+
+# 内存估算常量（字节）
+BYTES_PER_VALUE = 8              # 数值列按 float64 计
+PARSE_BYTES_PER_CELL = 120       # 解析 Excel/文本时每个单元格的临时 Python 对象
+ANNOTATION_BYTES_PER_CELL = 64   # 注释列（基因ID、分类等字符串）每个单元格
+MATRIX_COPIES = 4                # 原始计数、双端合并、RPKM、16S 比值同时存在
+CACHED_MATRICES = 2              # 工作簿缓存（modules.workbook）中的 RPKM 与 16S 比值工作表，不超过 WORKBOOK_CACHE_MB
+BASE_BYTES = 300 * 1024 ** 2     # 解释器、pandas/openpyxl 等的固定开销
+
+# 准入登记文件的心跳间隔（秒）；超过 3 个间隔未更新的登记视为已失效
+HEARTBEAT_SECONDS = 30
+ADMISSION_POLL_SECONDS = 10
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+
+
+def parse_size(value):
+    """解析内存大小（如 16G、512M、1.5T，无单位为字节）"""
+    text = str(value).strip().upper().rstrip('B').rstrip('I')
+    unit = text[-1] if text and text[-1] in _UNITS else ''
+    number = text[:-1] if unit else text
+    try:
+        size = float(number) * _UNITS[unit]
+    except ValueError:
+        raise ValueError(f"无法解析内存大小: {value}（示例: 16G、512M）")
+    if size <= 0:
+        raise ValueError(f"内存大小应大于 0: {value}")
+    return int(size)
+
+
+def format_size(size):
+    for unit in ('T', 'G', 'M', 'K'):
+        if size >= _UNITS[unit]:
+            return f"{size / _UNITS[unit]:.1f}{unit}"
+    return f"{int(size)}B"
+
+
+def system_memory():
+    """本机物理内存（字节），无法获取时返回 None"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return int(status.ullTotalPhys)
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+class InputProbe:
+    """原始计数表探测结果
+
+    属性：
+        name: 数据库名
+        rows: 数据行数（基因数）
+        sample_columns: 样本计数列数（双端计数列分别计入）
+        samples: 样本数
+        other_columns: 其余列数
+        density: 探测行中样本列的非零比例（无法探测时为 None）
+        cached: 是否存在有效的摄取缓存（存在时不再解析原始表）
+    """
+
+    def __init__(self, name, rows, sample_columns, samples, other_columns, density, cached):
+        self.name = name
+        self.rows = rows
+        self.sample_columns = sample_columns
+        self.samples = samples
+        self.other_columns = other_columns
+        self.density = density
+        self.cached = cached
+
+    @property
+    def cells(self):
+        return self.rows * (self.sample_columns + self.other_columns)
+
+    @property
+    def matrix_bytes(self):
+        return self.rows * self.sample_columns * BYTES_PER_VALUE
+
+
+def _probe_rows(path, sheet_name, indices):
+    """读取前 DENSITY_PROBE_ROWS 个数据行中指定列的值"""
+    path = Path(path)
+    if path.suffix.lower() in ('.csv', '.tsv', '.txt'):
+        sep = ',' if path.suffix.lower() == '.csv' else '\t'
+        rows = []
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            f.readline()
+            for _, line in zip(range(DENSITY_PROBE_ROWS), f):
+                fields = line.rstrip('\r\n').split(sep)
+                rows.append([fields[i] if i < len(fields) else None for i in indices])
+        return rows
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, str) and sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+        else:
+            sheet = workbook.worksheets[0]
+        return [
+            [row[i] if i < len(row) else None for i in indices]
+            for row in sheet.iter_rows(min_row=2, max_row=DENSITY_PROBE_ROWS + 1, values_only=True)
+        ]
+    finally:
+        workbook.close()
+
+
+def _nonzero(value):
+    try:
+        return float(value) != 0
+    except (TypeError, ValueError):
+        return False
+
+
+def probe_input(name, files):
+    """只读取表头与前若干数据行探测一个数据库的原始计数表"""
+    from modules.preflight import DATABASE_SPECS, read_header
+    from modules.samples import resolve_columns
+    from modules.ingest import has_cache
+
+    sheet = DATABASE_SPECS[name]['sheet']
+    path = Path(files['input'])
+    columns, rows = read_header(path, sheet)
+    plan = resolve_columns(name, columns)
+    indices = [i for i, column in enumerate(columns) if column in plan]
+    density = None
+    if rows is None or indices:
+        probe = _probe_rows(path, sheet, indices)
+        values = [value for row in probe for value in row]
+        if values:
+            density = sum(_nonzero(value) for value in values) / len(values)
+        if rows is None:
+            # 文本文件没有记录行数，按文件大小与探测行的平均长度估算
+            rows = _estimate_text_rows(path, len(probe))
+    return InputProbe(
+        name, rows or 0, len(indices), len(plan.samples), len(columns) - len(indices), density,
+        has_cache(path, sheet if isinstance(sheet, str) else 0)
+    )
+
+
+def _estimate_text_rows(path, probed):
+    if not probed:
+        return 0
+    with open(path, 'rb') as f:
+        head = b''.join(line for _, line in zip(range(probed + 1), f))
+    return int(path.stat().st_size / max(len(head), 1) * (probed + 1)) - 1
+
+
+class DatabasePlan:
+    """一个数据库的执行计划
+
+    属性：
+        probe: InputProbe
+        workers: 样本列并行线程数
+        peak: 预计峰值内存（字节）
+        fits: 预计峰值是否在内存上限内
+    """
+
+    def __init__(self, probe, workers, peak, fits):
+        self.probe = probe
+        self.workers = workers
+        self.peak = peak
+        self.fits = fits
+
+    @property
+    def name(self):
+        return self.probe.name
+
+    def describe(self):
+        probe = self.probe
+        density = "?" if probe.density is None else f"{probe.density:.0%}"
+        cached = "，已有摄取缓存" if probe.cached else ""
+        return (f"{probe.name}: {probe.rows} 行 × {probe.sample_columns} 样本列（{probe.samples} 个样本，"
+                f"非零 {density}{cached}）→ {self.workers} 线程，预计峰值 {format_size(self.peak)}"
+                + ("" if self.fits else "（超出内存上限，可改用 shard 按样本分片执行）"))
+
+
+def estimate_peak(probe, workers=1):
+    """估算一个数据库流程的峰值内存（字节）"""
+    from config.default_paths import WORKBOOK_CACHE_MB
+
+    parse = 0 if probe.cached else probe.cells * PARSE_BYTES_PER_CELL
+    annotations = probe.rows * probe.other_columns * ANNOTATION_BYTES_PER_CELL
+    # 多线程时每个线程另有一份本块的临时结果，合计约一份样本矩阵
+    temporary = probe.matrix_bytes if workers > 1 else 0
+    working = annotations + probe.matrix_bytes * MATRIX_COPIES + temporary
+    cached = min(max(0, WORKBOOK_CACHE_MB) * 1024 ** 2, annotations + probe.matrix_bytes * CACHED_MATRICES)
+    return BASE_BYTES + max(parse, working) + cached
+
+
+def plan_database(probe, memory_limit, max_workers=None):
+    """在内存上限内为一个数据库选择样本列并行线程数（优先多线程，线程数不超过 CPU 数）"""
+    from modules.parallel import MIN_BLOCK_COLUMNS
+
+    cpus = max_workers or os.cpu_count() or 1
+    workers = max(1, min(cpus, -(-probe.sample_columns // MIN_BLOCK_COLUMNS)))
+    for candidate in dict.fromkeys((workers, 1)):
+        peak = estimate_peak(probe, candidate)
+        if peak <= memory_limit:
+            return DatabasePlan(probe, candidate, peak, True)
+    return DatabasePlan(probe, 1, estimate_peak(probe), False)
+
+
+class ExecutionPlan:
+    """一次运行的执行计划（各数据库流程依次执行，峰值取各数据库的最大值）"""
+
+    def __init__(self, databases, memory_limit):
+        self.databases = {plan.name: plan for plan in databases}
+        self.memory_limit = memory_limit
+
+    @property
+    def peak(self):
+        return max((plan.peak for plan in self.databases.values()), default=BASE_BYTES)
+
+    def log(self, logger=None):
+        logger = logger or logging.getLogger("Planner")
+        logger.info(f"执行计划（内存上限 {format_size(self.memory_limit)}，预计峰值 {format_size(self.peak)}）")
+        for plan in self.databases.values():
+            (logger.info if plan.fits else logger.warning)(f"  {plan.describe()}")
+
+    def apply(self, name):
+        """按计划设置一个数据库流程的线程数（上下文管理器，退出时恢复）"""
+        return apply_plan(self.databases.get(name))
+
+
+@contextmanager
+def apply_plan(plan):
+    """设置样本列并行线程数"""
+    from modules import parallel
+
+    if plan is None:
+        yield None
+        return
+    saved = parallel._workers
+    parallel.set_workers(plan.workers)
+    try:
+        yield plan
+    finally:
+        parallel._workers = saved
+
+
+def build_plan(databases, memory_limit, max_workers=None):
+    """探测各数据库的原始计数表并生成执行计划
+
+    参数：
+        databases: [(数据库名, 路径字典)]
+        memory_limit: 内存上限（字节）
+        max_workers: 线程数上限（默认 CPU 数）
+    """
+    plans = []
+    for name, files in databases:
+        if not Path(files['input']).exists():
+            continue
+        try:
+            probe = probe_input(name, files)
+        except Exception as e:
+            logging.warning(f"无法探测 {name} 原始计数表，不纳入执行计划: {str(e)}")
+            continue
+        plans.append(plan_database(probe, memory_limit, max_workers))
+    return ExecutionPlan(plans, memory_limit)
+
+
+# ========== 多队列准入 ==========
+
+def admission_dir():
+    from config.default_paths import ADMISSION_DIR
+    return Path(ADMISSION_DIR) if ADMISSION_DIR else Path(tempfile.gettempdir()) / "ara_admission"
+
+
+class Admission:
+    """按内存上限准入（同一节点上同时运行的多个队列共享准入目录）
+
+    用法：
+        with Admission(plan.peak, memory_limit, cohort):
+            ...  # 执行流程
+    """
+
+    def __init__(self, peak, memory_limit, cohort, directory=None):
+        self.peak = peak
+        self.memory_limit = memory_limit
+        self.cohort = str(cohort)
+        self.directory = Path(directory) if directory else admission_dir()
+        self.ticket = self.directory / f"{socket.gethostname()}-{os.getpid()}.json"
+        self._stop = threading.Event()
+        self._heartbeat = None
+
+    def _active(self):
+        """其他运行的有效登记：[(队列, 峰值)]"""
+        active = []
+        now = time.time()
+        for path in self.directory.glob("*.json"):
+            if path == self.ticket:
+                continue
+            try:
+                if now - path.stat().st_mtime > 3 * HEARTBEAT_SECONDS:
+                    path.unlink()
+                    continue
+                entry = json.loads(path.read_text(encoding='utf-8'))
+                active.append((entry['cohort'], int(entry['peak'])))
+            except (OSError, ValueError, KeyError):
+                continue
+        return active
+
+    def _lock(self):
+        lock = self.directory / ".lock"
+        while True:
+            try:
+                return os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY), lock
+            except FileExistsError:
+                try:
+                    if time.time() - lock.stat().st_mtime > 60:
+                        lock.unlink()  # 持锁进程已异常退出
+                except OSError:
+                    pass
+                time.sleep(0.2)
+
+    def acquire(self):
+        logger = logging.getLogger("Planner")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        waiting = False
+        while True:
+            fd, lock = self._lock()
+            try:
+                active = self._active()
+                reserved = sum(peak for _, peak in active)
+                if not active or reserved + self.peak <= self.memory_limit:
+                    if not active and self.peak > self.memory_limit:
+                        logger.warning(f"预计峰值 {format_size(self.peak)} 超出内存上限 {format_size(self.memory_limit)}，"
+                                       f"没有其他运行，直接执行")
+                    tmp = self.ticket.with_suffix('.tmp')
+                    tmp.write_text(json.dumps({'cohort': self.cohort, 'peak': self.peak}), encoding='utf-8')
+                    os.replace(tmp, self.ticket)
+                    break
+            finally:
+                os.close(fd)
+                lock.unlink()
+            if not waiting:
+                running = ", ".join(f"{cohort} ({format_size(peak)})" for cohort, peak in active)
+                logger.info(f"等待内存准入：已运行 {running}，本次预计 {format_size(self.peak)}，"
+                            f"上限 {format_size(self.memory_limit)}")
+                waiting = True
+            time.sleep(ADMISSION_POLL_SECONDS)
+
+        logger.info(f"已准入（预计峰值 {format_size(self.peak)}）")
+        # 异常退出时也删除登记（进程被强制结束时由心跳超时失效）
+        atexit.register(self.release)
+        self._heartbeat = threading.Thread(target=self._beat, daemon=True)
+        self._heartbeat.start()
+        return self
+
+    def _beat(self):
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            try:
+                os.utime(self.ticket)
+            except OSError:
+                pass
+
+    def release(self):
+        self._stop.set()
+        try:
+            self.ticket.unlink()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
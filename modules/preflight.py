@@ -0,0 +1,291 @@
+"""
+输入预检模块
+包含：
+- 只读取表头（Excel 以 openpyxl 只读模式读取首行与工作表尺寸，文本文件只读首行）检查各数据库的原始计数表
+- 必需列、样本列命名格式（如 *_1.fastq.gz-SARG.txt，与计算模块共用 modules.samples 的规则）与双端配对检查
+- reads / 16S reads 统计文件解析及样本覆盖检查
+- 映射/参考文件（CARD_mapping.txt、Search.txt、风险等级表等）存在性与表头检查
+
+在任何阶段解析完整数据之前运行，输入有误时数秒内失败；不导入 pandas。
+"""
+
+import logging
+from pathlib import Path
+from modules.samples import SAMPLE_RULES, resolve_columns, ignored_mates
+
+# 各数据库的原始计数表与参考文件要求（样本列命名规则见 modules.samples）
+#   sheet: 读取的工作表（不存在时使用第一个工作表）
+#   required: 必需列，每项为可互相替代的列名
+#   references: {文件键: 必需列}，None 表示无表头的两列文本文件
+DATABASE_SPECS = {
+    'CARD': {
+        'sheet': 'CARD_mapping',
+        'required': [('ID',)],
+        'references': {
+            'mapping': [('ARO',), ('AMR gene family',), ('Class',), ('resistance mechanisms',)],
+            'types_class': [('Types',), ('Class',)],
+        },
+    },
+    'SARG': {
+        'sheet': 0,
+        'required': [('ID',), ('A2',), ('Length (AA)', 'Length', 'gene length')],
+        'references': {
+            'risk': [('ID',), ('risk_level',)],
+        },
+    },
+    'Victors': {
+        'sheet': 0,
+        'required': [('ID',), ('Length (AA)', 'Length'), ('Pathogen', None)],
+        'references': {},
+    },
+    'BacMet': {
+        'sheet': 0,
+        'required': [('ID',)],
+        'references': {
+            'mapping': [('BacMet_ID',), ('gene length', 'gene lentgh'), ('Organism',), ('Location',),
+                        ('Compound',), ('Gene_name',)],
+        },
+    },
+    'MGE': {
+        'sheet': 0,
+        'required': [],
+        'references': {
+            'search': None,
+        },
+    },
+}
+
+
+class PreflightResult:
+    """一个数据库的预检结果
+
+    属性：
+        name: 数据库名
+        errors: 错误（存在时流程不应执行）
+        warnings: 警告（流程可执行，但部分结果可能缺失）
+        samples: 原始计数表中识别出的样本名
+        rows: 原始计数表的数据行数（由工作表尺寸得到，未知时为 None）
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.errors = []
+        self.warnings = []
+        self.samples = []
+        self.rows = None
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def log(self, logger=None):
+        logger = logger or logging.getLogger(f"{self.name.upper()}_Pipeline")
+        rows = "?" if self.rows is None else self.rows
+        logger.info(f"预检 {self.name}: {len(self.samples)} 个样本, {rows} 行")
+        for message in self.warnings:
+            logger.warning(f"预检 {self.name}: {message}")
+        for message in self.errors:
+            logger.error(f"预检 {self.name}: {message}")
+
+
+class PreflightError(ValueError):
+    """预检未通过"""
+
+    def __init__(self, results):
+        self.results = results
+        messages = [f"{r.name}: {message}" for r in results for message in r.errors]
+        super().__init__("输入预检未通过: " + "; ".join(messages))
+
+
+def read_header(path, sheet_name=0):
+    """只读取表头
+
+    返回：
+        (列名列表, 数据行数)；Excel 的行数取自工作表尺寸（未记录时为 None），文本文件的行数为 None
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in ('.csv', '.tsv', '.txt'):
+        sep = ',' if suffix == '.csv' else '\t'
+        with open(path, 'r', encoding='utf-8-sig', errors='replace') as f:
+            first = f.readline().rstrip('\r\n')
+        return [name.strip('"') for name in first.split(sep)], None
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, str) and sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+        elif isinstance(sheet_name, int) and sheet_name < len(workbook.sheetnames):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook.worksheets[0]
+        header = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+        rows = sheet.max_row - 1 if sheet.max_row else None
+    finally:
+        workbook.close()
+    columns = list(header)
+    # 去掉表头末尾的空单元格（只读模式下可能带出格式化过的空列）
+    while columns and columns[-1] is None:
+        columns.pop()
+    return columns, rows
+
+
+def _has_column(columns, alternatives):
+    for name in alternatives:
+        if name is None:
+            # 空表头列（pandas 读取后为 Unnamed: n）
+            if any(col is None or str(col).startswith('Unnamed:') for col in columns):
+                return True
+        elif name in columns:
+            return True
+    return False
+
+
+def _reads_samples(path, parser, label, result):
+    if not Path(path).exists():
+        result.errors.append(f"{label}文件不存在: {path}")
+        return None
+    samples = parser(path)
+    if not samples:
+        result.errors.append(f"{label}文件中没有可解析的样本行: {path}")
+        return None
+    return samples
+
+
+def check_database(name, files, reads_path, reads_16s_path, reads=None, reads_16s=None):
+    """预检一个数据库的输入（只读取表头）
+
+    参数：
+        name: 数据库名（DATABASE_SPECS 的键）
+        files: 该数据库的路径字典（与 config 中的 *_FILES 结构相同）
+        reads_path / reads_16s_path: reads 与 16S reads 统计文件
+        reads / reads_16s: 已解析的 reads 统计（多个数据库共用时传入，避免重复解析）
+    返回：
+        PreflightResult
+    """
+    from modules.utils import read_reads_file, read_16s_reads_file
+
+    spec = DATABASE_SPECS[name]
+    result = PreflightResult(name)
+
+    plan = None
+    input_path = Path(files["input"])
+    if not input_path.exists():
+        result.errors.append(f"原始计数表不存在: {input_path}")
+    else:
+        try:
+            columns, result.rows = read_header(input_path, spec['sheet'])
+        except Exception as e:
+            result.errors.append(f"无法读取原始计数表表头: {input_path}: {str(e)}")
+            columns = None
+        if columns is not None:
+            for alternatives in spec['required']:
+                if not _has_column(columns, alternatives):
+                    wanted = " / ".join(a if a is not None else "空表头列" for a in alternatives)
+                    result.errors.append(f"原始计数表缺少必需列: {wanted}")
+            plan = _check_samples(name, columns, result)
+            if result.rows == 0:
+                result.errors.append(f"原始计数表没有数据行: {input_path}")
+
+    for key, required in spec['references'].items():
+        _check_reference(files.get(key), key, required, result)
+
+    if reads is None:
+        reads = _reads_samples(reads_path, read_reads_file, "reads 统计", result)
+    if reads_16s is None:
+        reads_16s = _reads_samples(reads_16s_path, read_16s_reads_file, "16S reads 统计", result)
+    if plan is not None:
+        if reads:
+            missing = plan.missing(reads)
+            if missing:
+                result.warnings.append(f"{len(missing)} 个样本在 reads 统计中不存在，不计算 RPKM: {', '.join(missing[:10])}")
+        if reads_16s:
+            missing = plan.missing(reads_16s)
+            if missing:
+                result.warnings.append(f"{len(missing)} 个样本在 16S reads 统计中不存在: {', '.join(missing[:10])}")
+    return result
+
+
+def _check_samples(name, columns, result):
+    plan = resolve_columns(name, columns)
+    if not plan.samples:
+        patterns = " / ".join(pattern.pattern for pattern, _ in SAMPLE_RULES[name])
+        result.errors.append(f"原始计数表中没有符合命名格式的样本列（{patterns}）")
+        return None
+    result.samples = list(plan.samples)
+    if plan.paired:
+        from config.default_paths import MATE_MERGE_POLICY
+        # sum / max 忽略双端不齐全的样本，first 忽略缺少 _1 端的样本（与 merge_mates 一致）
+        ignored = ignored_mates(plan, MATE_MERGE_POLICY)
+        if ignored:
+            required = "缺少 _1 端计数列" if MATE_MERGE_POLICY == 'first' else "双端计数列不完整"
+            result.warnings.append(f"{len(ignored)} 个样本{required}，将被忽略（MATE_MERGE_POLICY='{MATE_MERGE_POLICY}'）: "
+                                   f"{', '.join(ignored[:10])}")
+    return plan
+
+
+def _check_reference(path, key, required, result):
+    if path is None:
+        result.errors.append(f"路径配置缺少参考文件: {key}")
+        return
+    path = Path(path)
+    if not path.exists():
+        result.errors.append(f"参考文件不存在: {path}")
+        return
+    try:
+        columns, _ = read_header(path)
+    except Exception as e:
+        result.errors.append(f"无法读取参考文件表头: {path}: {str(e)}")
+        return
+    if required is None:
+        # 无表头的 基因ID/长度 两列文件
+        if len(columns) < 2:
+            result.errors.append(f"参考文件应为制表符分隔的两列: {path}")
+        return
+    for alternatives in required:
+        if not _has_column(columns, alternatives):
+            result.errors.append(f"参考文件 {path.name} 缺少列: {' / '.join(alternatives)}")
+
+
+def check_inputs(name, files, reads_path, reads_16s_path, steps=None):
+    """流程执行前预检一个数据库，存在错误时抛出 PreflightError
+
+    只执行汇总步骤（steps 不含 preprocess / rpkm）时不再需要原始输入，跳过预检。
+    """
+    if steps is not None and not set(steps) & {'preprocess', 'rpkm'}:
+        return None
+    result = check_database(name, files, reads_path, reads_16s_path)
+    result.log()
+    if not result.ok:
+        raise PreflightError([result])
+    return result
+
+
+def run_preflight(databases, paths, raise_on_error=True):
+    """预检多个数据库（reads 统计文件只解析一次）
+
+    参数：
+        databases: [(数据库名, 路径字典)]
+        paths: 含 READS_FILE / READS_16S_FILE 的路径配置
+        raise_on_error: 存在错误时抛出 PreflightError
+    返回：
+        [PreflightResult]
+    """
+    from modules.utils import read_reads_file, read_16s_reads_file
+
+    reads_path, reads_16s_path = Path(paths['READS_FILE']), Path(paths['READS_16S_FILE'])
+    # 文件不存在或为空时由 check_database 报告错误
+    reads = (read_reads_file(reads_path) if reads_path.exists() else None) or None
+    reads_16s = (read_16s_reads_file(reads_16s_path) if reads_16s_path.exists() else None) or None
+
+    results = []
+    for name, files in databases:
+        result = check_database(name, files, reads_path, reads_16s_path, reads, reads_16s)
+        result.log()
+        results.append(result)
+
+    failed = [result for result in results if not result.ok]
+    if failed and raise_on_error:
+        raise PreflightError(failed)
+    return results
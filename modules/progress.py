@@ -0,0 +1,241 @@
+"""
+进度事件模块
+包含：
+- 进度跟踪器：记录已处理的行数/样本数/工作表数，计算吞吐量与预计剩余时间(ETA)
+- 进度事件通过日志系统（Progress 日志器，事件对象附在日志记录的 progress 属性上）输出，
+  并分发给注册的回调函数，便于调度系统监控运行、决定何时启动下游任务
+- JSON Lines 事件文件（--progress-log），每行一个事件
+
+用法：
+    from modules.progress import track
+    with track('rpkm', "RPKM 计算", total=len(samples), unit='样本') as progress:
+        for sample in samples:
+            ...
+            progress.advance()
+
+    from modules.progress import add_listener
+    add_listener(lambda event: print(event.as_dict()))
+"""
+
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger("Progress")
+
+# 事件类别
+PROGRESS_KINDS = ('organize', 'ingest', 'rpkm', 'aggregate', 'export', 'analysis', 'stage')
+
+_listeners = []
+_listeners_lock = threading.Lock()
+_context = threading.local()
+
+
+class ProgressEvent:
+    """进度事件
+
+    属性：
+        kind: 类别（PROGRESS_KINDS）
+        label: 任务说明
+        status: start / progress / done / failed
+        done / total: 已完成量 / 总量（总量未知时为 None）
+        unit: 计量单位（行、样本、工作表、阶段等）
+        elapsed: 已用时间（秒）
+        rate: 吞吐量（单位/秒）
+        eta: 预计剩余时间（秒，未知时为 None）
+        pipeline / stage: 所属流程与阶段（在流程阶段内触发时）
+    """
+
+    def __init__(self, kind, label, status, done, total, unit, elapsed, pipeline=None, stage=None):
+        self.kind = kind
+        self.label = label
+        self.status = status
+        self.done = done
+        self.total = total
+        self.unit = unit
+        self.elapsed = elapsed
+        self.rate = done / elapsed if elapsed > 0 and done else None
+        remaining = None if total is None else max(total - done, 0)
+        self.eta = remaining / self.rate if remaining is not None and self.rate else None
+        if status == 'done':
+            self.eta = 0.0
+        self.pipeline = pipeline
+        self.stage = stage
+        self.timestamp = time.time()
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else None
+
+    def as_dict(self):
+        return {
+            'timestamp': self.timestamp,
+            'pipeline': self.pipeline,
+            'stage': self.stage,
+            'kind': self.kind,
+            'label': self.label,
+            'status': self.status,
+            'done': self.done,
+            'total': self.total,
+            'unit': self.unit,
+            'elapsed': round(self.elapsed, 3),
+            'rate': None if self.rate is None else round(self.rate, 3),
+            'eta': None if self.eta is None else round(self.eta, 1),
+        }
+
+    def format(self):
+        scope = "/".join(part for part in (self.pipeline, self.stage) if part)
+        prefix = f"[{scope}] " if scope else ""
+        amount = f"{self.done}/{self.total}" if self.total is not None else f"{self.done}"
+        text = f"{prefix}{self.label}: {amount} {self.unit}"
+        if self.fraction is not None:
+            text += f" ({self.fraction:.0%})"
+        if self.status == 'start':
+            return f"{prefix}{self.label}: 开始（共 {self.total if self.total is not None else '?'} {self.unit}）"
+        if self.rate is not None:
+            text += f"，{self.rate:.1f} {self.unit}/s"
+        if self.status == 'done':
+            return f"{text}，完成，用时 {_format_seconds(self.elapsed)}"
+        if self.status == 'failed':
+            return f"{text}，失败，用时 {_format_seconds(self.elapsed)}"
+        if self.eta is not None:
+            text += f"，预计剩余 {_format_seconds(self.eta)}"
+        return text
+
+
+def _format_seconds(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+def add_listener(callback):
+    """注册进度回调（callback(event) 在触发事件的线程中调用，应尽快返回）"""
+    with _listeners_lock:
+        _listeners.append(callback)
+    return callback
+
+
+def remove_listener(callback):
+    with _listeners_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def emit(event):
+    """输出进度事件：写入日志并分发给回调（回调异常只记录警告，不影响流程）"""
+    level = logging.WARNING if event.status == 'failed' else logging.INFO
+    logger.log(level, event.format(), extra={'progress': event})
+    with _listeners_lock:
+        listeners = list(_listeners)
+    for callback in listeners:
+        try:
+            callback(event)
+        except Exception as e:
+            logger.warning(f"进度回调执行失败: {str(e)}")
+
+
+@contextmanager
+def stage_context(pipeline, stage):
+    """标记当前线程所属的流程与阶段（由流程调度器设置，事件中自动带上）"""
+    previous = getattr(_context, 'scope', None)
+    _context.scope = (pipeline, stage)
+    try:
+        yield
+    finally:
+        _context.scope = previous
+
+
+def current_scope():
+    return getattr(_context, 'scope', None) or (None, None)
+
+
+class Progress:
+    """进度跟踪器（线程安全，可在工作线程中调用 advance）
+
+    两次中间进度事件之间至少间隔 PROGRESS_INTERVAL 秒（config/default_paths.py）。
+    """
+
+    def __init__(self, kind, label, total=None, unit='行', interval=None):
+        if kind not in PROGRESS_KINDS:
+            raise ValueError(f"未知进度类别: {kind}")
+        if interval is None:
+            from config.default_paths import PROGRESS_INTERVAL
+            interval = PROGRESS_INTERVAL
+        self.kind = kind
+        self.label = label
+        self.total = total
+        self.unit = unit
+        self.interval = interval
+        self.done = 0
+        # 创建时所在线程的流程/阶段，供工作线程中的事件使用
+        self.pipeline, self.stage = current_scope()
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._last_emit = self._start
+
+    def _event(self, status):
+        return ProgressEvent(
+            self.kind, self.label, status, self.done, self.total, self.unit,
+            time.perf_counter() - self._start, self.pipeline, self.stage
+        )
+
+    def start(self):
+        self._start = self._last_emit = time.perf_counter()
+        emit(self._event('start'))
+        return self
+
+    def advance(self, amount=1):
+        with self._lock:
+            self.done += amount
+            now = time.perf_counter()
+            if now - self._last_emit < self.interval:
+                return
+            self._last_emit = now
+            event = self._event('progress')
+        emit(event)
+
+    def finish(self, status='done'):
+        with self._lock:
+            if status == 'done' and self.total is not None:
+                self.done = max(self.done, self.total)
+            event = self._event(status)
+        emit(event)
+
+
+@contextmanager
+def track(kind, label, total=None, unit='行', interval=None):
+    """跟踪一个任务的进度：进入时发出 start 事件，正常结束发出 done，异常时发出 failed"""
+    progress = Progress(kind, label, total, unit, interval).start()
+    try:
+        yield progress
+    except BaseException:
+        progress.finish('failed')
+        raise
+    progress.finish()
+
+
+class JsonLinesListener:
+    """将进度事件逐行写入 JSON Lines 文件（供外部调度系统读取）"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, event):
+        line = json.dumps(event.as_dict(), ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
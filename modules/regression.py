@@ -0,0 +1,460 @@
+"""
+结果一致性回归检查模块
+包含：
+- 生成模拟队列（各数据库原始计数表与 reads 统计文件，样本数与随机种子可调）
+- 以参考配置（单线程、无摄取缓存、串行解析）与各加速配置分别运行全部流程，
+  逐工作簿、逐工作表比较结果（数值在浮点误差范围内一致，Total/total 行列单独检查，排序一致）
+- 对分组求和、逐级汇总、RPKM 等计算内核直接与 pandas 的朴素实现对比
+- 可保存参考结果，或与其他版本保存的结果比较
+
+与改动前版本的结果比较见 tests/test_regression.py（参考结果由 tests/make_golden.py 用改动前的代码生成）。
+
+用法（在项目根目录执行）：
+  python -m modules.regression                         生成队列并比较全部加速配置
+  python -m modules.regression --samples 40 --seed 3   更大的队列
+  python -m modules.regression --save-golden golden/   保存参考结果
+  python -m modules.regression --golden golden/        参考结果与已保存的结果比较（如改动前的版本）
+"""
+
+import sys
+import shutil
+import logging
+import argparse
+import tempfile
+import importlib
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# 加速配置：变体名 -> (配置覆盖, 运行次数)
+# 配置项默认位于 config/default_paths.py，SETTING_MODULES 中列出的除外
+VARIANTS = {
+    'parallel': ({'SAMPLE_WORKERS': 4, 'MIN_BLOCK_COLUMNS': 1}, 1),
+    'ingest_cache': ({'ENABLE_INGEST_CACHE': True}, 2),
+    'excel_processes': ({'EXCEL_READ_PROCESSES': 2, 'EXCEL_PARALLEL_MIN_MB': 0}, 1),
+    'arrow': ({'DATAFRAME_BACKEND': 'pyarrow'}, 1),
+}
+
+# 参考配置：原有的单线程实现
+REFERENCE = {
+    'SAMPLE_WORKERS': 1,
+    'ENABLE_INGEST_CACHE': False,
+    'EXCEL_READ_PROCESSES': 1,
+    'DATAFRAME_BACKEND': 'numpy',
+}
+
+SETTING_MODULES = {
+    'MIN_BLOCK_COLUMNS': 'modules.parallel',
+}
+
+# 排序依据列
+TOTAL_COLUMNS = ('Total', 'total')
+
+
+@contextmanager
+def patched_settings(overrides, modules=None):
+    """临时覆盖配置项（modules 可为个别配置项指定所在模块）"""
+    modules = {**SETTING_MODULES, **(modules or {})}
+    saved = []
+    try:
+        for name, value in overrides.items():
+            module = importlib.import_module(modules.get(name, 'config.default_paths'))
+            saved.append((module, name, getattr(module, name)))
+            setattr(module, name, value)
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
+
+
+# ========== 模拟队列 ==========
+
+def generate_cohort(root, n_samples=6, seed=0):
+    """在 root 下生成模拟原始数据（文件名与实际下机文件一致，由文件归类步骤整理）"""
+    from config.default_paths import CONFIG_DIR
+
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    samples = [f"Sample{i + 1}" for i in range(n_samples)]
+
+    def counts(n_genes):
+        # 负二项式样的计数，约 30% 为 0
+        means = rng.gamma(0.5, 20, size=(n_genes, 1))
+        values = rng.poisson(means, size=(n_genes, n_samples * 2))
+        return values * (rng.random((n_genes, n_samples * 2)) > 0.3)
+
+    def paired_columns(matrix, suffix):
+        columns = {}
+        for j, sample in enumerate(samples):
+            columns[f"{sample}_1.fastq.gz-{suffix}"] = matrix[:, 2 * j]
+            columns[f"{sample}_2.fastq.gz-{suffix}"] = matrix[:, 2 * j + 1]
+        return columns
+
+    # CARD
+    card_map = pd.read_csv(CONFIG_DIR / 'CARD_mapping.txt', sep='\t').sample(60, random_state=seed)
+    ids = [f"gb|ACC{i}|{aro}|{arg}" for i, (aro, arg) in enumerate(zip(card_map['ARO'], card_map['ARGs']))]
+    table = {'ID': ids, **paired_columns(counts(len(ids)), 'CARD.txt')}
+    pd.DataFrame(table).to_csv(root / 'x_CARD.csv', index=False)
+
+    # SARG（保证包含 I / II 风险等级）
+    risk_all = pd.read_excel(CONFIG_DIR / 'ARGs_RankSearch.xlsx').drop_duplicates('ID')
+    risk = pd.concat([
+        risk_all[risk_all['risk_level'] == 'I'].sample(8, random_state=seed),
+        risk_all[risk_all['risk_level'] == 'II'].sample(5, random_state=seed),
+        risk_all.sample(40, random_state=seed),
+    ]).drop_duplicates('ID')
+    table = {
+        'ID': risk['ID'].values, 'A2': risk['A2'].values, 'Length (AA)': risk['Length (AA)'].values,
+        **paired_columns(counts(len(risk)), 'SARG.txt')
+    }
+    pd.DataFrame(table).to_csv(root / 'x_SARG.csv', index=False)
+
+    # Victors（含缺失病原体）
+    pathogens = ['Escherichia coli', 'Escherichia albertii', 'Salmonella enterica', 'Klebsiella pneumoniae', None]
+    n_genes = 40
+    table = {
+        '': [pathogens[i % len(pathogens)] for i in range(n_genes)],
+        'ID': [f"V{i}" for i in range(n_genes)],
+        'Length (AA)': rng.integers(100, 900, n_genes),
+        **paired_columns(counts(n_genes), 'victors.txt')
+    }
+    pd.DataFrame(table).to_csv(root / 'x_victors.csv', index=False)
+
+    # BacMet
+    bacmet = pd.read_csv(CONFIG_DIR / 'BacMet21_EXP.753.mapping.txt', sep='\t').sample(45, random_state=seed)
+    ids = [f"{bac_id}|{gene}|x" for bac_id, gene in zip(bacmet['BacMet_ID'], bacmet['Gene_name'])]
+    table = {'ID': ids, **paired_columns(counts(len(ids)), 'BacMet2.txt')}
+    pd.DataFrame(table).to_csv(root / 'x_BacMet.csv', index=False)
+
+    # MGE
+    search = pd.read_csv(CONFIG_DIR / 'Search.txt', sep='\t').sample(30, random_state=seed)
+    genes = ['intI1', 'tnpA_2', 'IS26', 'ISCR1']
+    matrix = counts(len(search))
+    table = {'Contig': [f"{i}_{genes[i % len(genes)]}_{acc}" for i, acc in enumerate(search.iloc[:, 0])]}
+    for j, sample in enumerate(samples):
+        table[f"run-{sample} Read Count"] = matrix[:, 2 * j] + matrix[:, 2 * j + 1]
+    pd.DataFrame(table).to_csv(root / 'x_MGEs.count.csv', index=False)
+
+    # reads 统计
+    with open(root / 'x_reads_number.txt', 'w') as f:
+        for sample in samples:
+            for mate in (1, 2):
+                f.write(f"{sample}_{mate}.fastq.gz: {rng.integers(10**6, 10**7)} reads\n")
+    with open(root / 'x_16S_reads_number.txt', 'w') as f:
+        for sample in samples:
+            for mate in (1, 2):
+                f.write(f"{sample}_{mate}.fastq.gz.16s: {rng.integers(10**3, 10**4)} reads\n")
+    return root
+
+
+# ========== 运行流程 ==========
+
+def output_files(root):
+    """各数据库结果文件（相对项目根目录）"""
+    from config.default_paths import get_paths
+    from main import PIPELINES
+
+    paths = get_paths(root)
+    return {name: Path(paths[files_name]['output']).relative_to(paths['PROJECT_ROOT'])
+            for name, _, _, files_name in PIPELINES}
+
+
+def run_cohort(root, overrides, runs=1):
+    """按给定配置运行全部流程（第二次起跳过文件归类，用于检查缓存路径）"""
+    import main
+    from modules import parallel, workbook
+
+    for i in range(runs):
+        argv = ['--root', str(root)] + (['--no-organize'] if i else [])
+        args = main.build_parser().parse_args(argv)
+        parallel.set_workers(None)
+        workbook.invalidate()
+        # 只在控制台显示警告及以上的流程日志
+        with patched_settings({**REFERENCE, **overrides, 'LOG_CONSOLE_LEVEL': 'WARNING'}):
+            if main.run_all(args):
+                raise RuntimeError(f"流程执行失败: {root}")
+
+
+# ========== 结果比较 ==========
+
+def _is_numeric(series):
+    return pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+
+
+def _values_equal(expected, actual, rtol, atol):
+    """逐元素比较，返回布尔数组（数值列按浮点误差，其余按字符串，缺失值视为相等）"""
+    if _is_numeric(expected) and _is_numeric(actual):
+        return np.isclose(expected.to_numpy(dtype='float64'), actual.to_numpy(dtype='float64'),
+                          rtol=rtol, atol=atol, equal_nan=True)
+    both_missing = expected.isna().to_numpy() & actual.isna().to_numpy()
+    return both_missing | (expected.astype(str).to_numpy() == actual.astype(str).to_numpy())
+
+
+def _scalar(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _labels(series):
+    """分类列转为可比较的字符串（缺失值统一表示）"""
+    return series.map(lambda value: '<NA>' if pd.isna(value) else str(value))
+
+
+def compare_frames(expected, actual, rtol=1e-9, atol=1e-12):
+    """比较两个工作表，返回 [(类别, 说明)]
+
+    类别：columns（列不一致）、rows（行数不一致）、order（排序不一致）、
+          values（数值不一致）、totals（Total/total 行或列不一致）
+    """
+    problems = []
+    missing = [col for col in expected.columns if col not in actual.columns]
+    extra = [col for col in actual.columns if col not in expected.columns]
+    if missing or extra:
+        problems.append(('columns', f"缺少列 {missing[:5]}，多出列 {extra[:5]}"))
+    if len(expected) != len(actual):
+        problems.append(('rows', f"行数 {len(expected)} != {len(actual)}"))
+        return problems
+
+    columns = [col for col in expected.columns if col in actual.columns]
+    key = expected.columns[0] if len(expected.columns) else None
+    expected = expected.reset_index(drop=True)
+    actual = actual.reset_index(drop=True)
+
+    # 排序：分类列顺序不同，且不同位置的排序依据值也不同时才视为排序不一致（并列值的先后顺序不计）
+    if key is not None and key in actual.columns:
+        expected_keys = _labels(expected[key])
+        actual_keys = _labels(actual[key])
+        differs = (expected_keys != actual_keys).to_numpy()
+        if differs.any():
+            sort_column = next((col for col in TOTAL_COLUMNS if col in columns), None)
+            tied = sort_column is not None and _values_equal(
+                expected[sort_column][differs], actual[sort_column][differs], rtol, atol
+            ).all()
+            if not tied:
+                first = int(np.flatnonzero(differs)[0])
+                problems.append(('order', f"第 {first} 行: {expected_keys[first]!r} != {actual_keys[first]!r}"))
+            # 按分类列对齐后再比较数值
+            if expected_keys.is_unique and set(expected_keys) == set(actual_keys):
+                actual = actual.set_index(actual_keys).loc[expected_keys.to_numpy()].reset_index(drop=True)
+
+    total_rows = (_labels(expected[key]) == 'Total').to_numpy() if key is not None else np.zeros(len(expected), bool)
+    for col in columns:
+        equal = _values_equal(expected[col], actual[col], rtol, atol)
+        if equal.all():
+            continue
+        category = 'totals' if col in TOTAL_COLUMNS else 'values'
+        rows = np.flatnonzero(~equal & ~total_rows)
+        if col in TOTAL_COLUMNS or len(rows) == 0:
+            category, rows = 'totals', np.flatnonzero(~equal)
+        first = int(rows[0])
+        problems.append((category, f"列 {col!r} 有 {len(rows)} 处不一致，如第 {first} 行: "
+                                   f"{_scalar(expected[col].iloc[first])!r} != {_scalar(actual[col].iloc[first])!r}"))
+    return problems
+
+
+def compare_workbooks(expected_path, actual_path, rtol=1e-9, atol=1e-12):
+    """比较两个结果工作簿的全部工作表，返回 [(工作表, 类别, 说明)]"""
+    expected_path, actual_path = Path(expected_path), Path(actual_path)
+    if not expected_path.exists() or not actual_path.exists():
+        missing = expected_path if not expected_path.exists() else actual_path
+        return [('-', 'sheets', f"结果文件不存在: {missing}")]
+    differences = []
+    expected_sheets = pd.read_excel(expected_path, sheet_name=None)
+    actual_sheets = pd.read_excel(actual_path, sheet_name=None)
+    if set(expected_sheets) != set(actual_sheets):
+        differences.append(('-', 'sheets',
+                            f"缺少 {sorted(set(expected_sheets) - set(actual_sheets))}，"
+                            f"多出 {sorted(set(actual_sheets) - set(expected_sheets))}"))
+    for sheet, expected in expected_sheets.items():
+        if sheet in actual_sheets:
+            for category, detail in compare_frames(expected, actual_sheets[sheet], rtol, atol):
+                differences.append((sheet, category, detail))
+    return differences
+
+
+def compare_outputs(expected_root, actual_root, rtol=1e-9, atol=1e-12, databases=None):
+    """比较两个项目目录下的结果工作簿（databases 为 None 时比较全部数据库），返回 [(工作簿, 工作表, 类别, 说明)]"""
+    expected_root, actual_root = Path(expected_root), Path(actual_root)
+    differences = []
+    for name, relative in output_files(expected_root).items():
+        if databases is not None and name not in databases:
+            continue
+        for sheet, category, detail in compare_workbooks(expected_root / relative, actual_root / relative, rtol, atol):
+            differences.append((name, sheet, category, detail))
+    return differences
+
+
+# ========== 计算内核 ==========
+
+def check_kernels(seed=0, n_rows=500, n_samples=40):
+    """分组求和、逐级汇总与 RPKM 的加速实现与 pandas 朴素实现对比，返回不一致说明列表"""
+    from modules import parallel
+    from modules.parallel import group_sum
+    from modules.rollup import rollup
+    from modules.utils import calculate_rpkm
+    from modules.normalize import Normalizer
+    from modules.stats import rank_rows, bh_fdr
+    from modules.network import correlation_edges, t_test_p
+
+    rng = np.random.default_rng(seed)
+    pick = lambda values: rng.choice(np.array(values, dtype=object), n_rows)
+    df = pd.DataFrame({
+        'ARGs': pick([f"arg{i}" for i in range(30)] + [None]),
+        'Family': pick(['F1', 'F2', 'F3', None]),
+        'Class': pick(['C1', 'C2', None]),
+        'Length': rng.integers(100, 3000, n_rows),
+    })
+    samples = [f"S{i}" for i in range(n_samples)]
+    for i, sample in enumerate(samples):
+        values = rng.poisson(5, n_rows).astype('float64' if i % 2 else 'int64')
+        df[sample] = values
+    df.loc[rng.random(n_rows) < 0.05, samples[1]] = np.nan
+    reads = {sample: int(rng.integers(10**6, 10**7)) for sample in samples}
+    mapping = {'C1': ['T1', 'T2'], 'C2': ['T2']}
+
+    failures = []
+
+    def check(label, expected, actual):
+        try:
+            pd.testing.assert_frame_equal(expected, actual, check_exact=False, rtol=1e-9)
+        except AssertionError as e:
+            failures.append(f"{label}: {str(e).splitlines()[0]}")
+
+    saved = parallel.MIN_BLOCK_COLUMNS
+    parallel.MIN_BLOCK_COLUMNS = 1
+    try:
+        for key in ('ARGs', 'Family', 'Class'):
+            check(f"group_sum[{key}]", df.groupby(key)[samples].sum(), group_sum(df, key, samples, workers=4))
+
+        sums = rollup(df, ['ARGs', 'Family', 'Class'], samples, {'Types': ('Class', mapping)})
+        for key in ('ARGs', 'Family', 'Class'):
+            check(f"rollup[{key}]", df.groupby(key)[samples].sum(), sums[key])
+        exploded = df.assign(Types=df['Class'].map(mapping)).explode('Types')
+        check("rollup[Types]", exploded.groupby('Types')[samples].sum(), sums['Types'])
+
+        parallel.set_workers(1)
+        serial = calculate_rpkm(df, reads, length_column='Length')
+        parallel.set_workers(4)
+        check("calculate_rpkm[并行]", serial, calculate_rpkm(df, reads, length_column='Length'))
+        naive = df.copy()
+        for sample in samples:
+            values = pd.to_numeric(naive[sample], errors='coerce').fillna(0)
+            naive[sample] = values / (naive['Length'] / 1000 * (reads[sample] / 1e6))
+        check("calculate_rpkm[朴素实现]", naive, serial)
+        normalizer = Normalizer(df, reads, length_column='Length')
+        check("normalize[rpkm]", serial[samples], normalizer.frame('rpkm', with_annotations=False))
+        counts = df[samples].fillna(0)
+        rate = counts.div(df['Length'] / 1000, axis=0)
+        check("normalize[tpm]", rate / rate.sum() * 1e6, normalizer.frame('tpm', with_annotations=False))
+        check("normalize[cpm]", counts / pd.Series(reads) * 1e6, normalizer.frame('cpm', with_annotations=False))
+
+        ranks, _ = rank_rows(counts.to_numpy())
+        check("stats[rank]", counts.rank(axis=1), pd.DataFrame(ranks, index=counts.index, columns=samples))
+        p_values = pd.Series(rng.random(200))
+        # q_i = min(1, min_{p_j >= p_i} p_j * m / rank_j)
+        adjusted = p_values * len(p_values) / p_values.rank()
+        naive_q = [min(1.0, adjusted[p_values >= p].min()) for p in p_values]
+        check("stats[bh_fdr]", pd.DataFrame({'q': naive_q}), pd.DataFrame({'q': bh_fdr(p_values)}))
+
+        # 分块相关与只保留候选的 BH 校正，与整块相关矩阵、全量 BH 校正对比
+        features = df[samples].fillna(0).to_numpy()[:60]
+        edges, _ = correlation_edges(features, method='spearman', min_r=0.0, max_q=0.5, tile=7)
+        r = pd.DataFrame(features.T).corr(method='spearman').to_numpy()
+        i, j = np.triu_indices(len(features), 1)
+        p = t_test_p(r[i, j], features.shape[1])
+        q = bh_fdr(p)
+        naive = pd.DataFrame({'i': i, 'j': j, 'r': r[i, j], 'p_value': p, 'q_value': q})
+        naive = naive[naive['q_value'] <= 0.5].reset_index(drop=True)
+        edges = edges.sort_values(['i', 'j']).reset_index(drop=True).astype(naive.dtypes.to_dict())
+        check("network[spearman]", naive, edges)
+    finally:
+        parallel.MIN_BLOCK_COLUMNS = saved
+        parallel.set_workers(None)
+    return failures
+
+
+# ========== 入口 ==========
+
+def _report(label, differences):
+    logger = logging.getLogger("Regression")
+    if not differences:
+        logger.info(f"[一致] {label}")
+        return 0
+    logger.warning(f"[不一致] {label}: {len(differences)} 处")
+    for name, sheet, category, detail in differences:
+        logger.warning(f"  {name} / {sheet} [{category}] {detail}")
+    return len(differences)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="比较加速实现与原有实现的结果是否一致")
+    parser.add_argument('--samples', type=int, default=6, help="模拟队列样本数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--variants', default=','.join(VARIANTS),
+                        help=f"参与比较的加速配置，逗号分隔（可选: {', '.join(VARIANTS)}）")
+    parser.add_argument('--workdir', type=Path, help="工作目录（默认使用临时目录，结束后删除）")
+    parser.add_argument('--golden', type=Path, help="与该目录下保存的结果比较")
+    parser.add_argument('--save-golden', type=Path, help="将参考结果保存到该目录")
+    parser.add_argument('--rtol', type=float, default=1e-9, help="数值比较的相对误差")
+    parser.add_argument('--atol', type=float, default=1e-12, help="数值比较的绝对误差")
+    args = parser.parse_args(argv)
+
+    variants = [name.strip() for name in args.variants.split(',') if name.strip()]
+    unknown = [name for name in variants if name not in VARIANTS]
+    if unknown:
+        parser.error(f"未知配置: {', '.join(unknown)}")
+
+    # 只在控制台显示警告及以上的流程日志；比较结果由单独的处理器输出
+    # （各次运行的 setup_logging 会替换根日志器的处理器）
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(name)s: %(message)s")
+    logger = logging.getLogger("Regression")
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix='ara_regression_'))
+    failures = 0
+    try:
+        kernel_failures = check_kernels(seed=args.seed)
+        failures += _report("计算内核", [('-', '-', 'values', detail) for detail in kernel_failures])
+
+        reference_root = workdir / 'reference'
+        shutil.rmtree(reference_root, ignore_errors=True)
+        generate_cohort(reference_root, args.samples, args.seed)
+        run_cohort(reference_root, {})
+
+        if args.save_golden:
+            for relative in output_files(reference_root).values():
+                target = args.save_golden / relative
+                target.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(reference_root / relative, target)
+            logger.info(f"参考结果已保存至: {args.save_golden}")
+
+        if args.golden:
+            failures += _report(f"参考结果 vs {args.golden}",
+                                compare_outputs(args.golden, reference_root, args.rtol, args.atol))
+
+        for name in variants:
+            overrides, runs = VARIANTS[name]
+            root = workdir / name
+            shutil.rmtree(root, ignore_errors=True)
+            generate_cohort(root, args.samples, args.seed)
+            run_cohort(root, overrides, runs)
+            failures += _report(f"参考配置 vs {name}",
+                                compare_outputs(reference_root, root, args.rtol, args.atol))
+    finally:
+        if args.workdir is None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        logger.warning(f"共 {failures} 处不一致")
+    else:
+        logger.info("全部一致")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
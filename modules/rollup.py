@@ -0,0 +1,60 @@
+"""
+分类层级逐级汇总模块
+包含：
+- 按层级定义（由细到粗）逐级汇总：每一层由上一层（更细一层）的汇总结果再聚合得到
+- 派生层级：由某一层的组名经映射（dict 或函数，可映射为多个组）得到，如 CARD 的 Class → Types
+
+只有最细一层需要扫描整个 基因 × 样本 表；更粗的层级只处理上一层的组，
+计算量随组数而不是基因数增长。
+
+层级不要求严格嵌套（如同一 ARGs 对应多个基因家族）：每一层按
+“本层及所有更粗层级”的组合分组，再向上聚合，结果与直接对原表分组求和一致。
+"""
+
+import pandas as pd
+from modules.parallel import group_sum
+from modules.progress import track
+
+
+def rollup(df, levels, value_columns, derived=None):
+    """按层级逐级汇总
+
+    参数：
+        df: 含层级列与数值列的表
+        levels: 由细到粗的层级列名，如 ['ARGs', 'AMR gene family', 'Class']
+        value_columns: 需要求和的数值列（样本列）
+        derived: {派生层级名: (来源层级, 映射)}，映射为 dict 或作用于单个组名的函数，
+                 结果为列表时该组计入多个派生组，为缺失值时不计入
+    返回：
+        {层级名: 以该层级为索引(已排序)、value_columns 为列的汇总表}
+        与 df.groupby(层级列)[value_columns].sum() 一致，组名缺失的行不计入该层
+    """
+    levels = list(levels)
+    value_columns = list(value_columns)
+    derived = derived or {}
+    results = {}
+
+    total = len(levels) + len(derived)
+    with track('aggregate', f"逐级汇总（{len(df)} 行）", total=total, unit='层级') as progress:
+        current = df[levels + value_columns]
+        for i, level in enumerate(levels):
+            # 按本层及所有更粗层级的组合汇总（保留缺失组名，留给更粗的层级使用）
+            current = (
+                current.groupby(levels[i:], dropna=False, sort=False)[value_columns]
+                .sum()
+                .reset_index()
+            )
+            results[level] = group_sum(current, level, value_columns)
+            progress.advance()
+
+        for name, (source, mapping) in derived.items():
+            if source not in results:
+                raise ValueError(f"派生层级 {name} 的来源层级不存在: {source}")
+            source_sums = results[source]
+            # 只需对来源层级的组名做映射
+            expanded = source_sums.reset_index(drop=True)
+            expanded[name] = pd.Series(source_sums.index).map(mapping)
+            results[name] = group_sum(expanded.explode(name), name, value_columns)
+            progress.advance()
+
+    return results
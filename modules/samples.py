@@ -0,0 +1,238 @@
+"""
+样本名解析模块
+包含：
+- 各数据库原始计数表样本列的命名规则（正则只编译一次）
+- 由表头得到样本列计划：表头 → (样本名, 双端序号)，同一表头组合只解析一次
+- reads / 16S reads 统计文件的行格式
+- 按解析后的样本名关联 reads 与 16S reads 数
+- 双端计数列合并（sum 两端相加 / first 只取第一端 / max 取两端较大值），按样本列块一次完成
+
+各计算模块、输入预检共用同一份规则，样本名在所有数据库中保持一致。
+"""
+
+import re
+import logging
+from functools import lru_cache
+
+# reads 统计文件行格式：<样本>_<序号>[.<后缀>]: <数量> reads（同一样本的各序号累加）
+READS_PATTERN = re.compile(r'^([A-Za-z0-9-]+)_\d+(?:\.\S+)?:\s+(\d+)\s+reads$')
+READS_16S_PATTERN = re.compile(r'^([A-Za-z0-9-]+)_\d+(?:\.\S+)?\.16s:\s+(\d+)\s+reads$')
+
+# 双端计数列的合并方式（默认使用 config/default_paths.py 中的 MATE_MERGE_POLICY）
+MATE_POLICIES = ('sum', 'first', 'max')
+
+# 各数据库的样本列规则：[(正则, 样本名整理函数)]，按顺序匹配，第一个匹配的规则生效
+# 正则中 sample 组为样本名，mate 组为双端序号（无 mate 组表示单列计数）
+SAMPLE_RULES = {
+    'CARD': [
+        (re.compile(r'^(?P<sample>.+)_(?P<mate>[12])\.fastq\.gz-CARD\.txt$'),
+         lambda name: name.replace('-', '').replace('_', '')),
+    ],
+    'SARG': [
+        (re.compile(r'^(?P<sample>.+?)_(?P<mate>[12])\.fastq\.gz-SARG\.txt$'),
+         lambda name: name.split('_')[0]),
+    ],
+    'Victors': [
+        (re.compile(r'^(?P<sample>.+?)_(?P<mate>[12])\.fastq\.gz-victors\.txt$'),
+         lambda name: name.split('_')[0]),
+    ],
+    'BacMet': [
+        # 遗留格式：<前缀>-<样本>_<序号>.fastq.gz-BacMet2.txt
+        (re.compile(r'^[^-]*-(?P<sample>.+?)_(?P<mate>[12])\.fastq\.gz-BacMet2\.txt$'), None),
+        # 新格式：<样本>_<序号>.fastq.gz-BacMet2.txt
+        (re.compile(r'^(?P<sample>[A-Za-z0-9]+)_(?P<mate>[12])\.fastq\.gz-BacMet2\.txt$'), None),
+    ],
+    'MGE': [
+        # <前缀>-<样本> Read Count
+        (re.compile(r'^(?:[^-]*-)?(?P<sample>.+?)\s+Read Count$'), None),
+    ],
+}
+
+
+class SampleColumn:
+    """一个样本计数列
+
+    属性：
+        header: 原始表头
+        sample: 解析出的样本名（与 reads 统计文件中的样本名对应）
+        mate: 双端序号 '1' / '2'，单列计数时为 None
+    """
+
+    __slots__ = ('header', 'sample', 'mate')
+
+    def __init__(self, header, sample, mate):
+        self.header = header
+        self.sample = sample
+        self.mate = mate
+
+    def __repr__(self):
+        return f"SampleColumn({self.header!r}, {self.sample!r}, {self.mate!r})"
+
+
+class SamplePlan:
+    """一张原始计数表的样本列计划
+
+    属性：
+        database: 数据库名
+        columns: 识别出的样本列（SampleColumn，按表头顺序）
+        samples: 样本名（按首次出现顺序，去重）
+        mates: {样本名: {双端序号: 表头}}
+    """
+
+    def __init__(self, database, columns):
+        self.database = database
+        self.columns = tuple(columns)
+        self.mates = {}
+        for column in self.columns:
+            self.mates.setdefault(column.sample, {})[column.mate] = column.header
+        self.samples = list(self.mates)
+        self._by_header = {column.header: column for column in self.columns}
+
+    def __contains__(self, header):
+        return header in self._by_header
+
+    def __getitem__(self, header):
+        return self._by_header[header]
+
+    @property
+    def paired(self):
+        return any(column.mate is not None for column in self.columns)
+
+    def rename_map(self):
+        """第一端（或单列计数）表头 → 样本名"""
+        return {
+            column.header: column.sample
+            for column in self.columns if column.mate in (None, '1')
+        }
+
+    def other_mates(self):
+        """第二端表头（只保留第一端时需删除的列）"""
+        return [column.header for column in self.columns if column.mate == '2']
+
+    def complete_pairs(self):
+        """双端计数列齐全的样本：{样本名: (第一端表头, 第二端表头)}"""
+        return {
+            sample: (mates['1'], mates['2'])
+            for sample, mates in self.mates.items() if '1' in mates and '2' in mates
+        }
+
+    def depths(self, reads, reads_16s):
+        """按样本名关联 reads 与 16S reads 数：{样本名: (reads, 16S reads)}，缺失为 None"""
+        return {sample: (reads.get(sample), reads_16s.get(sample)) for sample in self.samples}
+
+    def missing(self, counts):
+        """不在 counts（reads 或 16S reads 统计）中的样本名"""
+        return [sample for sample in self.samples if sample not in counts]
+
+
+def _match(database, header):
+    if not isinstance(header, str):
+        return None
+    for pattern, normalize in SAMPLE_RULES[database]:
+        match = pattern.match(header)
+        if match:
+            sample = match.group('sample')
+            mate = match.group('mate') if 'mate' in pattern.groupindex else None
+            return SampleColumn(header, normalize(sample) if normalize else sample, mate)
+    return None
+
+
+@lru_cache(maxsize=None)
+def _resolve(database, headers):
+    columns = [column for column in (_match(database, header) for header in headers) if column]
+    return SamplePlan(database, columns)
+
+
+def resolve_columns(database, headers):
+    """解析原始计数表的样本列（同一数据库、同一表头组合只解析一次）
+
+    参数：
+        database: 数据库名（SAMPLE_RULES 的键）
+        headers: 表头列表（DataFrame.columns 或预检读取的表头行）
+    返回：
+        SamplePlan（共享对象，不应修改）
+    """
+    if database not in SAMPLE_RULES:
+        raise KeyError(f"未知数据库: {database}")
+    return _resolve(database, tuple(headers))
+
+
+def parse_reads_line(line, is_16s=False):
+    """解析 reads 统计文件的一行，返回 (样本名, reads 数)，格式不符时返回 None"""
+    match = (READS_16S_PATTERN if is_16s else READS_PATTERN).match(line.strip())
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+
+def ignored_mates(plan, policy):
+    """按双端合并方式会被忽略的样本：sum / max 下双端计数列不齐全，first 下缺少第一端"""
+    return [
+        sample for sample, mates in plan.mates.items()
+        if None not in mates and ('1' not in mates if policy == 'first' else len(mates) < 2)
+    ]
+
+
+def merge_mates(df, plan, policy=None):
+    """按样本合并双端计数列
+
+    参数：
+        df: 原始计数表
+        plan: resolve_columns 得到的样本列计划
+        policy: sum（两端相加，默认）/ first（只取第一端）/ max（取较大值）；
+                None 时使用配置 MATE_MERGE_POLICY
+    返回：
+        非样本列保持不变、每个样本一列（列名为样本名，位于第一端计数列的位置）的新表
+
+    双端计数列不完整的样本（见 ignored_mates）被忽略并记录警告：sum / max 下只有一端的计数只覆盖
+    一半测序深度，而 reads 统计按两端累加，直接使用会低估 RPKM；first 下缺少第一端的样本没有可用的列。
+    单列计数（无双端序号）的样本不受影响。
+    """
+    import numpy as np
+    import pandas as pd
+
+    if policy is None:
+        from config.default_paths import MATE_MERGE_POLICY
+        policy = MATE_MERGE_POLICY
+    if policy not in MATE_POLICIES:
+        raise ValueError(f"未知的双端合并方式: {policy}，可选: {', '.join(MATE_POLICIES)}")
+
+    def numeric(headers):
+        block = df[headers]
+        if not all(pd.api.types.is_numeric_dtype(block[col]) for col in headers):
+            block = block.apply(pd.to_numeric, errors='coerce')
+        return block.fillna(0).to_numpy()
+
+    merged = {}
+    pairs = plan.complete_pairs() if policy != 'first' else {}
+    if pairs:
+        # 双端齐全的样本：两端各组成一个数值块，一次向量化运算
+        first = numeric([headers[0] for headers in pairs.values()])
+        second = numeric([headers[1] for headers in pairs.values()])
+        values = first + second if policy == 'sum' else np.maximum(first, second)
+        for j, sample in enumerate(pairs):
+            merged[sample] = values[:, j]
+
+    ignored = ignored_mates(plan, policy)
+    for sample, mates in plan.mates.items():
+        if sample in merged or sample in ignored:
+            continue
+        merged[sample] = df[mates[None] if None in mates else mates['1']]
+    if ignored:
+        required = "缺少 _1 端计数列" if policy == 'first' else "双端计数列不完整"
+        logging.warning(f"{plan.database}: {len(ignored)} 个样本{required}，已忽略"
+                        f"（MATE_MERGE_POLICY='{policy}'）: {', '.join(ignored[:10])}")
+
+    # 样本列放在第一端（或单列计数）所在的位置
+    anchors = {}
+    for sample, mates in plan.mates.items():
+        anchors[mates.get('1', mates.get(None, next(iter(mates.values()))))] = sample
+    data = {}
+    for header in df.columns:
+        if header in anchors:
+            sample = anchors[header]
+            if sample in merged:
+                data[sample] = merged[sample]
+        elif header not in plan:
+            data[header] = df[header]
+    return pd.DataFrame(data, index=df.index)
@@ -6,6 +6,10 @@ SARG 分析模块
 from .rpkm import process_sarg_data
 from .aggregators import (
     add_risk_rank,
+    build_sarg_classifications,
+    build_types_classification,
+    build_gene_classification,
+    build_rank_classification,
     generate_types_classification,
     generate_gene_classification,
     generate_rank_classification
@@ -14,6 +18,10 @@ from .aggregators import (
 __all__ = [
     'process_sarg_data',
     'add_risk_rank',
+    'build_sarg_classifications',
+    'build_types_classification',
+    'build_gene_classification',
+    'build_rank_classification',
     'generate_types_classification',
     'generate_gene_classification',
     'generate_rank_classification'
@@ -1,10 +1,25 @@
 """
 SARG 数据聚合模块
 包含风险等级添加和各类分类汇总功能
+
+基因(ARGs)与类型(Types)按层级 ARGs → Types 逐级汇总，类型汇总由基因汇总结果再聚合得到。
 """
 
 import pandas as pd
 import logging
+from modules.utils import write_sheets, atomic_output
+from modules.parallel import group_sum
+from modules.rollup import rollup
+from modules.workbook import read_sheets
+
+# 分类层级（由细到粗）
+SARG_LEVELS = ['ARGs', 'Types']
+
+# 汇总层级 -> (RPKM 输出工作表, 16S 输出工作表)
+CLASSIFICATIONS = {
+    'Types': ('ARGs_Types', 'ARGs_Types_16S'),
+    'ARGs': ('ARGs_Gene', 'ARGs_Gene_16S'),
+}
 
 def add_risk_rank(risk_file, target_file):
     """添加风险等级列"""
@@ -17,9 +32,11 @@ def add_risk_rank(risk_file, target_file):
         # 处理两个工作表
         sheets_to_process = ['RPKM', '16SRPKM']
         
-        with pd.ExcelWriter(target_file, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
+        workbook = read_sheets(target_file, sheets_to_process)
+        with atomic_output(target_file, keep_existing=True) as tmp_path, \
+                pd.ExcelWriter(tmp_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
             for sheet_name in sheets_to_process:
-                df = pd.read_excel(target_file, sheet_name=sheet_name)
+                df = workbook[sheet_name]
                 
                 # 添加Rank列
                 df['Rank'] = df['ID'].map(risk_mapping)
@@ -38,121 +55,127 @@ def add_risk_rank(risk_file, target_file):
         logging.error(f"添加风险等级失败: {str(e)}")
         raise
 
+def build_sarg_classifications(input_path, levels=None):
+    """按基因(ARGs)与类型(Types)逐级汇总（仅计算，返回 {工作表名: DataFrame}）
+
+    levels: 只输出所选分类（CLASSIFICATIONS 的键），默认全部
+    """
+    levels = [level for level in CLASSIFICATIONS if levels is None or level in levels]
+    workbook = read_sheets(input_path, ['RPKM', '16SRPKM'])
+    per_sheet = []
+    for input_sheet in ['RPKM', '16SRPKM']:
+        df = workbook[input_sheet]
+
+        # 校验必要列
+        for column in SARG_LEVELS:
+            if column not in df.columns:
+                raise ValueError(f"工作表 {input_sheet} 缺少{column}列")
+
+        # 删除非必要列
+        df = df.drop(columns=['Length', 'Rank'], errors='ignore')
+
+        # 逐级分组汇总
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        sample_cols = [col for col in numeric_cols if col not in SARG_LEVELS]
+        per_sheet.append(rollup(df, SARG_LEVELS, sample_cols))
+
+    sheets = {}
+    for level in levels:
+        for output_sheet, sums in zip(CLASSIFICATIONS[level], per_sheet):
+            grouped = sums[level].T
+            grouped.loc['Total'] = grouped.sum()
+
+            # 格式化结果
+            result = grouped.T.reset_index()
+            result = result.rename(columns={'index': level})
+            result = result.sort_values('Total', ascending=False)
+
+            # 收集结果
+            sheets[output_sheet] = result
+
+    return sheets
+
+def build_types_classification(input_path):
+    """按ARGs类型(Types)分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    logging.info("汇总ARGs类型(Types)...")
+    return build_sarg_classifications(input_path, levels=['Types'])
+
 def generate_types_classification(input_path, output_path):
     """按ARGs类型(Types)分类汇总"""
     try:
-        logging.info("汇总ARGs类型(Types)...")
-        process_config = [
-            ('RPKM', 'ARGs_Types'),
-            ('16SRPKM', 'ARGs_Types_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 删除非必要列
-                df = df.drop(columns=['Length', 'Rank'], errors='ignore')
-                
-                # 按类型分组汇总
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_cols = [col for col in numeric_cols if col != 'Types']
-                
-                grouped = df.groupby('Types')[sample_cols].sum().T
-                grouped.loc['Total'] = grouped.sum()
-                
-                # 格式化结果
-                result = grouped.T.reset_index()
-                result = result.rename(columns={'index': 'Types'})
-                result = result.sort_values('Total', ascending=False)
-                
-                # 保存结果
-                result.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_types_classification(input_path)
+        write_sheets(output_path, sheets)
+
         logging.info(f"✅ ARGs类型汇总完成! 结果保存至 {output_path}")
         return True
     except Exception as e:
         logging.error(f"类型汇总失败: {str(e)}")
         raise
 
+def build_gene_classification(input_path):
+    """按ARGs基因分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    logging.info("汇总ARGs基因(Gene)...")
+    return build_sarg_classifications(input_path, levels=['ARGs'])
+
 def generate_gene_classification(input_path, output_path):
     """按ARGs基因分类汇总"""
     try:
-        logging.info("汇总ARGs基因(Gene)...")
-        process_config = [
-            ('RPKM', 'ARGs_Gene'),
-            ('16SRPKM', 'ARGs_Gene_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 删除非必要列
-                df = df.drop(columns=['Length', 'Rank'], errors='ignore')
-                
-                # 按基因分组汇总
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_cols = [col for col in numeric_cols if col != 'ARGs']
-                
-                grouped = df.groupby('ARGs')[sample_cols].sum().T
-                grouped.loc['Total'] = grouped.sum()
-                
-                # 格式化结果
-                result = grouped.T.reset_index()
-                result = result.rename(columns={'index': 'ARGs'})
-                result = result.sort_values('Total', ascending=False)
-                
-                # 保存结果
-                result.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_gene_classification(input_path)
+        write_sheets(output_path, sheets)
+
         logging.info(f"✅ ARGs基因汇总完成! 结果保存至 {output_path}")
         return True
     except Exception as e:
         logging.error(f"基因汇总失败: {str(e)}")
         raise
 
+def build_rank_classification(input_path):
+    """按风险等级(Rank)分类汇总（仅计算，返回 {工作表名: DataFrame}）"""
+    logging.info("汇总风险等级(Rank)...")
+    workbook = read_sheets(input_path, ['RPKM', '16SRPKM'])
+    rpkm_df = workbook['RPKM']
+    s16_df = workbook['16SRPKM']
+    
+    # 验证Rank列存在
+    def validate_columns(df, sheet_name):
+        if 'Rank' not in df.columns:
+            raise ValueError(f"工作表 '{sheet_name}' 缺少Rank列")
+        return df[df['Rank'].isin(['I', 'II'])]
+    
+    # 处理单个风险等级
+    def process_rank_data(rank_df, rank_name):
+        rank_df = rank_df.drop(columns=['Length'], errors='ignore')
+        numeric_cols = rank_df.select_dtypes(include=['number']).columns.tolist()
+        sample_cols = [col for col in numeric_cols if col != 'ARGs']
+        
+        grouped = group_sum(rank_df, 'ARGs', sample_cols).T
+        grouped.loc['Total'] = grouped.sum()
+        result = grouped.T.reset_index()
+        result = result.rename(columns={'index': 'ARGs'})
+        result['Risk Rank'] = rank_name
+        return result.sort_values('Total', ascending=False)
+    
+    # 处理单个工作表
+    def process_sheet(df, sheet_name):
+        valid_df = validate_columns(df, sheet_name)
+        rank_i = process_rank_data(valid_df[valid_df['Rank'] == 'I'], 'I')
+        rank_ii = process_rank_data(valid_df[valid_df['Rank'] == 'II'], 'II')
+        return pd.concat([rank_i, rank_ii])
+    
+    # 处理两个工作表
+    rpkm_result = process_sheet(rpkm_df, 'RPKM')
+    s16_result = process_sheet(s16_df, '16SRPKM')
+
+    return {
+        'ARGs_Rank_RPKM': rpkm_result,
+        'ARGs_Rank_16SRPKM': s16_result
+    }
+
 def generate_rank_classification(input_path, output_path):
     """按风险等级(Rank)分类汇总"""
     try:
-        logging.info("汇总风险等级(Rank)...")
-        rpkm_df = pd.read_excel(input_path, sheet_name='RPKM')
-        s16_df = pd.read_excel(input_path, sheet_name='16SRPKM')
-        
-        # 验证Rank列存在
-        def validate_columns(df, sheet_name):
-            if 'Rank' not in df.columns:
-                raise ValueError(f"工作表 '{sheet_name}' 缺少Rank列")
-            return df[df['Rank'].isin(['I', 'II'])]
-        
-        # 处理单个风险等级
-        def process_rank_data(rank_df, rank_name):
-            rank_df = rank_df.drop(columns=['Length'], errors='ignore')
-            numeric_cols = rank_df.select_dtypes(include=['number']).columns.tolist()
-            sample_cols = [col for col in numeric_cols if col != 'ARGs']
-            
-            grouped = rank_df.groupby('ARGs')[sample_cols].sum().T
-            grouped.loc['Total'] = grouped.sum()
-            result = grouped.T.reset_index()
-            result = result.rename(columns={'index': 'ARGs'})
-            result['Risk Rank'] = rank_name
-            return result.sort_values('Total', ascending=False)
-        
-        # 处理单个工作表
-        def process_sheet(df, sheet_name):
-            valid_df = validate_columns(df, sheet_name)
-            rank_i = process_rank_data(valid_df[valid_df['Rank'] == 'I'], 'I')
-            rank_ii = process_rank_data(valid_df[valid_df['Rank'] == 'II'], 'II')
-            return pd.concat([rank_i, rank_ii])
-        
-        # 处理两个工作表
-        rpkm_result = process_sheet(rpkm_df, 'RPKM')
-        s16_result = process_sheet(s16_df, '16SRPKM')
-        
-        # 保存结果
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            rpkm_result.to_excel(writer, index=False, sheet_name='ARGs_Rank_RPKM')
-            s16_result.to_excel(writer, index=False, sheet_name='ARGs_Rank_16SRPKM')
+        sheets = build_rank_classification(input_path)
+        write_sheets(output_path, sheets)
         
         logging.info("✅ 风险等级汇总完成!")
         return True
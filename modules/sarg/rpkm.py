@@ -1,62 +1,43 @@
 """SARG RPKM计算模块"""
 import pandas as pd
-import re
 import logging
 # 添加以下导入
-from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm, process_columns
+from modules.utils import read_reads_file, read_16s_reads_file, calculate_rpkm, process_columns, ratio_to_16s, atomic_output
+from modules.normalize import write_normalizations
+from modules.ingest import load_table
+from modules.samples import resolve_columns, merge_mates
 
 def process_sarg_data(file_path, output_path, reads_path, reads_16s_path):
     try:
         logging.info("开始处理SARG数据...")
-        df = pd.read_excel(file_path)
+        df = load_table(file_path)
 
         # 新增列处理步骤
         df = process_columns(df)  # <-- 添加这行处理列拆分
 
-        # 列名标准化 (原有代码保持不变)
-        column_mapping = {}
-        pattern = re.compile(r'^(.+?)_[12]\.fastq\.gz-SARG\.txt$')
+        # 双端计数列按样本合并（合并方式见配置 MATE_MERGE_POLICY），列名为样本名
+        base_df = merge_mates(df, resolve_columns('SARG', df.columns))
 
-        for col in df.columns:
-            if col == 'ID':
-                continue
-            match = pattern.match(col)
-            if match and "_1.fastq.gz-SARG.txt" in col:
-                base_name = match.group(1).split('_')[0]
-                column_mapping[col] = base_name
-            else:
-                column_mapping[col] = col
-
-        renamed_df = df.rename(columns=column_mapping)
-        columns_to_keep = [col for col in renamed_df.columns
-                           if not col.endswith('_2.fastq.gz-SARG.txt')]
-        base_df = renamed_df[columns_to_keep].copy()
-
-        # 使用统一的calculate_rpkm函数
+        # 使用统一的calculate_rpkm函数（不修改输入，无需复制）
         reads_data = read_reads_file(reads_path)
         final_df = calculate_rpkm(base_df, reads_data)
 
-        # 计算16S RPKM
+        # 16S RPKM 在计算比值时逐列得出
         reads_16s_data = read_16s_reads_file(reads_16s_path)
-        final_16s_df = base_df.copy()
-        numeric_cols = final_16s_df.select_dtypes(include=['number']).columns
-
-        for col in numeric_cols:
-            if col in reads_16s_data and col in reads_data:
-                numerator = reads_16s_data[col]
-                denominator = (1492 / 1000) * (reads_data[col] / 1e6)
-                final_16s_df[col] = numerator / denominator
 
         # 保存结果
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        with atomic_output(output_path) as tmp_path, pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
             final_df.to_excel(writer, index=False, sheet_name='RPKM')
 
             # 计算比值
             numeric_cols = final_df.select_dtypes(include=['number']).columns
-            ratio_df = final_df[numeric_cols] / final_16s_df[numeric_cols]
-            ratio_df = pd.concat([final_df[final_df.columns.difference(numeric_cols)], ratio_df], axis=1)
+            ratios = ratio_to_16s(final_df, base_df, numeric_cols, reads_data, reads_16s_data)
+            ratio_df = pd.concat([final_df[final_df.columns.difference(numeric_cols)], *ratios.values()], axis=1)
             ratio_df.to_excel(writer, index=False, sheet_name='16SRPKM')
 
+            # 额外标准化（TPM/CPM 等，见配置 EXTRA_NORMALIZATIONS）
+            write_normalizations(writer, base_df, reads_data, reads_16s_data)
+
         logging.info(f"✅ RPKM计算完成! 结果保存至: {output_path}")
         return True
     except Exception as e:
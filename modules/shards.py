@@ -0,0 +1,247 @@
+"""
+样本分片模块（按样本轴切分大队列，见 pipelines/sharded.py）
+包含：
+- 按原始计数表表头的样本顺序把样本切分为连续的分片
+- 流式拆分原始计数表：逐行读取一次，每个分片只写出注释列与本分片样本的计数列（双端两列一起），
+  整张计数表不会被载入内存
+- 按分片样本截取 reads / 16S reads 统计文件
+- 分片清单（manifest.json）与分片认领（.claim）/ 完成（.done）标记：
+  多个进程或共享目录上的多台主机各自认领尚未完成的分片，互不重复
+
+各分片目录（shard-000/ ...）结构与常规数据库目录相同，可直接作为流程的输入/输出目录。
+"""
+
+import os
+import csv
+import json
+import time
+import socket
+import logging
+from pathlib import Path
+
+MANIFEST_NAME = "manifest.json"
+SHARD_PREFIX = "shard-"
+CLAIM_NAME = ".claim"
+DONE_NAME = ".done"
+
+# 原始计数表所在工作表（未列出的数据库使用第一个工作表，与各流程的读取方式一致）
+SOURCE_SHEETS = {'CARD': 'CARD_mapping'}
+
+
+def split_samples(samples, n_shards):
+    """把样本按原顺序切分为至多 n_shards 个连续分片（各分片样本数相差不超过 1）"""
+    samples = list(samples)
+    n_shards = max(1, min(int(n_shards), len(samples)))
+    size, extra = divmod(len(samples), n_shards)
+    shards = []
+    start = 0
+    for i in range(n_shards):
+        end = start + size + (1 if i < extra else 0)
+        shards.append(samples[start:end])
+        start = end
+    return shards
+
+
+def shard_dir(root, index):
+    return Path(root) / f"{SHARD_PREFIX}{index:03d}"
+
+
+def fingerprint(path):
+    stat = Path(path).stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class ShardManifest:
+    """分片清单
+
+    属性：
+        database: 数据库名
+        source: 原始计数表路径
+        fingerprint: 拆分时原始计数表的 [大小, 修改时间]
+        shards: 各分片的样本名列表
+    """
+
+    def __init__(self, database, source, fingerprint, shards):
+        self.database = database
+        self.source = Path(source)
+        self.fingerprint = list(fingerprint)
+        self.shards = [list(samples) for samples in shards]
+
+    def __len__(self):
+        return len(self.shards)
+
+    def is_current(self):
+        """原始计数表在拆分后是否未被修改"""
+        return self.source.exists() and fingerprint(self.source) == self.fingerprint
+
+    def save(self, root):
+        path = Path(root) / MANIFEST_NAME
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({
+            'database': self.database,
+            'source': str(self.source),
+            'fingerprint': self.fingerprint,
+            'shards': self.shards,
+        }, ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, root):
+        """读取分片清单（不存在时返回 None）"""
+        path = Path(root) / MANIFEST_NAME
+        if not path.exists():
+            return None
+        entry = json.loads(path.read_text(encoding='utf-8'))
+        return cls(entry['database'], entry['source'], entry['fingerprint'], entry['shards'])
+
+
+def shard_columns(database, header, shards):
+    """各分片保留的列序号（注释列 + 本分片样本的全部计数列，保持原列顺序）"""
+    from modules.samples import resolve_columns
+
+    plan = resolve_columns(database, header)
+    keep = []
+    for samples in shards:
+        samples = set(samples)
+        keep.append([
+            i for i, name in enumerate(header)
+            if name not in plan or plan[name].sample in samples
+        ])
+    return keep
+
+
+def _split_text(source, targets, columns):
+    sep = ',' if source.suffix.lower() == '.csv' else '\t'
+    handles = [open(target, 'w', encoding='utf-8', newline='') for target in targets]
+    try:
+        writers = [csv.writer(handle, delimiter=sep) for handle in handles]
+        with open(source, 'r', encoding='utf-8-sig', newline='') as f:
+            for row in csv.reader(f, delimiter=sep):
+                for writer, keep in zip(writers, columns):
+                    writer.writerow([row[i] if i < len(row) else '' for i in keep])
+    finally:
+        for handle in handles:
+            handle.close()
+
+
+def _split_workbook(source, targets, columns, sheet_name):
+    from openpyxl import Workbook, load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        if sheet_name in workbook.sheetnames:
+            sheet = workbook[sheet_name]
+        else:
+            sheet = workbook.worksheets[0]
+        outputs = []
+        for _ in targets:
+            output = Workbook(write_only=True)
+            outputs.append((output, output.create_sheet(sheet.title)))
+        for row in sheet.iter_rows(values_only=True):
+            for (_, out_sheet), keep in zip(outputs, columns):
+                out_sheet.append([row[i] if i < len(row) else None for i in keep])
+        for (output, _), target in zip(outputs, targets):
+            output.save(target)
+    finally:
+        workbook.close()
+
+
+def split_table(database, source, targets, shards):
+    """流式拆分原始计数表，每个分片写出一个与原文件格式相同的计数表
+
+    参数：
+        database: 数据库名（用于识别样本列）
+        source: 原始计数表（.xlsx / .csv / .tsv / .txt）
+        targets: 各分片的输出路径
+        shards: 各分片的样本名列表
+    """
+    from modules.preflight import read_header
+    from modules.utils import atomic_output
+    from contextlib import ExitStack
+
+    source = Path(source)
+    sheet_name = SOURCE_SHEETS.get(database, 0)
+    try:
+        header, _ = read_header(source, sheet_name)
+        columns = shard_columns(database, header, shards)
+        with ExitStack() as stack:
+            tmp_paths = [stack.enter_context(atomic_output(target)) for target in targets]
+            if source.suffix.lower() in ('.csv', '.tsv', '.txt'):
+                _split_text(source, tmp_paths, columns)
+            else:
+                _split_workbook(source, tmp_paths, columns, sheet_name)
+    except Exception as e:
+        logging.error(f"拆分原始计数表失败: {str(e)}")
+        raise
+
+
+def write_reads_subset(source, target, samples, is_16s=False):
+    """截取 reads / 16S reads 统计文件中属于给定样本的行（原样写出）"""
+    from modules.samples import parse_reads_line
+
+    samples = set(samples)
+    try:
+        with open(source, 'r') as f, open(target, 'w') as out:
+            for line in f:
+                parsed = parse_reads_line(line, is_16s=is_16s)
+                if parsed and parsed[0] in samples:
+                    out.write(line)
+    except FileNotFoundError:
+        logging.error(f"错误: 无法找到文件 {source}")
+        raise
+
+
+def _owner():
+    return {'host': socket.gethostname(), 'pid': os.getpid(), 'time': time.time()}
+
+
+def _is_dead_local_claim(claim):
+    """认领者是本机上已退出的进程"""
+    try:
+        entry = json.loads(claim.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return False
+    if entry.get('host') != socket.gethostname():
+        return False
+    try:
+        os.kill(int(entry['pid']), 0)
+    except ProcessLookupError:
+        return True
+    except (OSError, KeyError, ValueError):
+        return False
+    return False
+
+
+def claim(directory):
+    """认领一个分片（原子创建 .claim），已完成或已被其他进程认领时返回 False
+
+    本机上认领后异常退出的进程留下的认领会被收回；其他主机上的失效认领需手动删除 .claim。
+    """
+    directory = Path(directory)
+    if (directory / DONE_NAME).exists():
+        return False
+    path = directory / CLAIM_NAME
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not _is_dead_local_claim(path):
+                return False
+            path.unlink(missing_ok=True)
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(_owner(), f)
+        return True
+    return False
+
+
+def release(directory, done=False):
+    """释放认领；done 为 True 时先写入完成标记"""
+    directory = Path(directory)
+    if done:
+        (directory / DONE_NAME).write_text(json.dumps(_owner()), encoding='utf-8')
+    (directory / CLAIM_NAME).unlink(missing_ok=True)
+
+
+def is_done(directory):
+    return (Path(directory) / DONE_NAME).exists()
@@ -0,0 +1,253 @@
+"""
+组间差异丰度检验模块
+包含：
+- 样本分组表读取（两列：样本名、分组；制表符/逗号分隔的文本文件或 Excel）
+- 整块 特征×样本 矩阵按行一次秩次化（并列值取平均秩），不逐特征循环
+- 两组：Mann-Whitney U 检验（正态近似，含并列校正与连续性校正）
+- 多组：Kruskal-Wallis H 检验（卡方近似，含并列校正）
+- Benjamini-Hochberg FDR 校正（每个数据库层级内）
+- 各数据库各层级（ARGs、Types、Class、机制、Pathogen、Compound、MGE Genes 等，见 modules.store.LEVEL_SHEETS）
+  的检验结果写入结果文件旁的 <数据库>_stats.xlsx，每个层级一个工作表
+
+只依赖 numpy：p 值由正态分布与卡方分布的闭式公式得到，不需要 scipy。
+"""
+
+import math
+import logging
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# 参与检验的分组至少包含的样本数
+MIN_GROUP_SIZE = 2
+
+# 结果表的检验统计列
+RESULT_COLUMNS = ['feature', 'test', 'statistic', 'p_value', 'q_value']
+
+_erfc = np.vectorize(math.erfc, otypes=[float])
+
+
+def read_groups(groups_path):
+    """读取样本分组表，返回 {样本名: 分组}（按文件中的顺序）
+
+    文件为两列：样本名、分组；首行为 sample / group 表头时跳过。
+    """
+    groups_path = Path(groups_path)
+    try:
+        if groups_path.suffix.lower() in ('.xlsx', '.xls'):
+            df = pd.read_excel(groups_path, header=None, dtype=str)
+        else:
+            df = pd.read_csv(groups_path, sep=None, engine='python', header=None, dtype=str)
+        if df.shape[1] < 2:
+            raise ValueError(f"分组表应至少包含两列（样本名、分组）: {groups_path}")
+        df = df.iloc[:, :2].dropna()
+        df = df.apply(lambda col: col.str.strip())
+        if len(df) and df.iloc[0, 0].lower() == 'sample':
+            df = df.iloc[1:]
+        return dict(zip(df.iloc[:, 0], df.iloc[:, 1]))
+    except FileNotFoundError:
+        logging.error(f"错误: 无法找到分组文件 {groups_path}")
+        raise
+    except Exception as e:
+        logging.error(f"读取分组文件时出错: {str(e)}")
+        raise
+
+
+def rank_rows(values):
+    """按行秩次化（并列值取平均秩，秩从 1 开始）
+
+    返回：
+        (秩矩阵, 每行的并列校正量 Σ(t³ - t))
+    """
+    values = np.asarray(values, dtype='float64')
+    n_cols = values.shape[1]
+    order = np.argsort(values, axis=1, kind='mergesort')
+    ordered = np.take_along_axis(values, order, axis=1)
+    positions = np.broadcast_to(np.arange(n_cols), values.shape)
+
+    # 排序后每个并列块的起止位置
+    starts_block = np.ones(values.shape, dtype=bool)
+    starts_block[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    ends_block = np.ones(values.shape, dtype=bool)
+    ends_block[:, :-1] = starts_block[:, 1:]
+    starts = np.maximum.accumulate(np.where(starts_block, positions, 0), axis=1)
+    ends = np.minimum.accumulate(np.where(ends_block, positions, n_cols - 1)[:, ::-1], axis=1)[:, ::-1]
+
+    sizes = ends - starts + 1
+    ties = (sizes ** 2 - 1).sum(axis=1).astype('float64')  # 每个并列块 t 个位置各计 t²-1，合计 t³-t
+    ranks = np.empty(values.shape, dtype='float64')
+    np.put_along_axis(ranks, order, (starts + ends) / 2 + 1, axis=1)
+    return ranks, ties
+
+
+def chi2_sf(x, df):
+    """卡方分布的生存函数（自由度为正整数，闭式公式）"""
+    x = np.asarray(x, dtype='float64')
+    y = np.maximum(x, 0) / 2
+    if df % 2 == 0:
+        term = np.ones_like(y)
+        total = term.copy()
+        for i in range(1, df // 2):
+            term = term * y / i
+            total += term
+        result = np.exp(-y) * total
+    else:
+        term = np.sqrt(y) / (math.sqrt(math.pi) / 2)
+        total = np.zeros_like(y)
+        for i in range(1, (df + 1) // 2):
+            total += term
+            term = term * y / (i + 0.5)
+        result = _erfc(np.sqrt(y)) + np.exp(-y) * total
+    return np.where(np.isnan(x), np.nan, np.clip(result, 0, 1))
+
+
+def mann_whitney(ranks, ties, in_first):
+    """Mann-Whitney U 检验（双侧，正态近似，含并列校正与连续性校正）
+
+    参数：
+        ranks / ties: rank_rows 的结果
+        in_first: 布尔向量，样本是否属于第一组
+    返回：
+        (第一组的 U 统计量, p 值)
+    """
+    n = ranks.shape[1]
+    n1 = int(in_first.sum())
+    n2 = n - n1
+    u1 = ranks[:, in_first].sum(axis=1) - n1 * (n1 + 1) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+        z = (np.abs(u1 - n1 * n2 / 2) - 0.5) / sigma
+    p = np.minimum(_erfc(np.maximum(z, 0) / math.sqrt(2)), 1.0)
+    # 全部并列（方差为 0）时无法检验
+    p = np.where(sigma > 0, p, np.nan)
+    return u1, p
+
+
+def kruskal_wallis(ranks, ties, labels):
+    """Kruskal-Wallis H 检验（卡方近似，含并列校正）
+
+    参数：
+        ranks / ties: rank_rows 的结果
+        labels: 各样本所属分组的整数编号（0..k-1）
+    返回：
+        (H 统计量, p 值)
+    """
+    n = ranks.shape[1]
+    k = int(labels.max()) + 1
+    total = np.zeros(ranks.shape[0])
+    for g in range(k):
+        members = labels == g
+        total += ranks[:, members].sum(axis=1) ** 2 / members.sum()
+    h = 12 / (n * (n + 1)) * total - 3 * (n + 1)
+    correction = 1 - ties / (n ** 3 - n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = np.where(correction > 0, h / correction, np.nan)
+    return h, chi2_sf(h, k - 1)
+
+
+def bh_fdr(p_values):
+    """Benjamini-Hochberg FDR 校正（缺失的 p 值不参与，结果仍为缺失）"""
+    p_values = np.asarray(p_values, dtype='float64')
+    q_values = np.full(p_values.shape, np.nan)
+    valid = ~np.isnan(p_values)
+    m = int(valid.sum())
+    if m:
+        p = p_values[valid]
+        order = np.argsort(p, kind='mergesort')
+        scaled = p[order] * m / np.arange(1, m + 1)
+        scaled = np.minimum.accumulate(scaled[::-1])[::-1]
+        q = np.empty(m)
+        q[order] = np.minimum(scaled, 1.0)
+        q_values[valid] = q
+    return q_values
+
+
+def test_groups(matrix, groups):
+    """对 特征×样本 矩阵的每个特征做组间检验
+
+    两组使用 Mann-Whitney U，多组使用 Kruskal-Wallis；少于 MIN_GROUP_SIZE 个样本的分组不参与。
+    参数：
+        matrix: DataFrame（行为特征，列为样本）
+        groups: {样本名: 分组}
+    返回：
+        检验结果表（按 p 值排序，含各组均值）；可检验的分组少于两个时返回 None
+    """
+    samples = [sample for sample in matrix.columns if sample in groups]
+    names = list(dict.fromkeys(groups[sample] for sample in samples))
+    sizes = {name: sum(groups[sample] == name for sample in samples) for name in names}
+    small = [name for name in names if sizes[name] < MIN_GROUP_SIZE]
+    if small:
+        logging.warning(f"分组样本数少于 {MIN_GROUP_SIZE}，不参与检验: {', '.join(small)}")
+    names = [name for name in names if name not in small]
+    if len(names) < 2:
+        return None
+
+    samples = [sample for sample in samples if groups[sample] in names]
+    labels = np.array([names.index(groups[sample]) for sample in samples])
+    values = matrix[samples].to_numpy(dtype='float64')
+    ranks, ties = rank_rows(values)
+
+    if len(names) == 2:
+        test = 'Mann-Whitney U'
+        statistic, p_values = mann_whitney(ranks, ties, labels == 0)
+    else:
+        test = 'Kruskal-Wallis H'
+        statistic, p_values = kruskal_wallis(ranks, ties, labels)
+
+    result = pd.DataFrame({
+        'feature': matrix.index,
+        'test': test,
+        'statistic': statistic,
+        'p_value': p_values,
+        'q_value': bh_fdr(p_values),
+    })
+    for g, name in enumerate(names):
+        result[f"mean_{name}"] = values[:, labels == g].mean(axis=1)
+    return result.sort_values('p_value', kind='mergesort', na_position='last').reset_index(drop=True)
+
+
+def run_stats(outputs, groups_path, value=None):
+    """对各数据库结果工作簿的全部层级做组间检验，结果写入结果文件旁的 <数据库>_stats.xlsx
+
+    参数：
+        outputs: {数据库名: 结果工作簿路径}
+        groups_path: 样本分组表
+        value: 'rpkm' 或 'rpkm_16s'（默认使用配置 STATS_VALUE）
+    返回：
+        {数据库名: 检验结果文件路径}
+    """
+    from modules.store import workbook_matrices
+    from modules.utils import write_sheets
+    from modules.progress import track
+
+    if value is None:
+        from config.default_paths import STATS_VALUE
+        value = STATS_VALUE
+    try:
+        groups = read_groups(groups_path)
+        written = {}
+        with track('analysis', "组间差异检验", total=len(outputs), unit='数据库') as progress:
+            for database, workbook_path in outputs.items():
+                progress.advance()
+                if not Path(workbook_path).exists():
+                    logging.warning(f"跳过 {database}: 结果文件不存在 {workbook_path}")
+                    continue
+                sheets = {}
+                for level, matrix in workbook_matrices(workbook_path, database, value).items():
+                    result = test_groups(matrix, groups)
+                    if result is None:
+                        logging.warning(f"跳过 {database}/{level}: 可检验的分组少于两个")
+                        continue
+                    sheets[level] = result
+                    significant = int((result['q_value'] < 0.05).sum())
+                    logging.info(f"{database}/{level}: {len(result)} 个特征，FDR < 0.05: {significant} 个")
+                if not sheets:
+                    continue
+                stats_path = Path(workbook_path).with_name(f"{database}_stats.xlsx")
+                write_sheets(stats_path, sheets, mode='w')
+                written[database] = stats_path
+                logging.info(f"✅ {database} 组间检验结果保存至: {stats_path}")
+        return written
+    except Exception as e:
+        logging.error(f"组间差异检验失败: {str(e)}")
+        raise
@@ -0,0 +1,246 @@
+"""
+长格式(tidy)结果存储模块
+包含：
+- 各数据库汇总表转换为长格式 (database, level, feature, sample, rpkm, rpkm_16s)
+- 写入单个SQLite文件，并在 sample / feature 上建立索引
+- 按样本、按特征的跨数据库查询
+- 各层级汇总表转换为 特征×样本 数值矩阵（供组间检验、共现网络等跨数据库分析使用）
+"""
+
+import sqlite3
+import logging
+from pathlib import Path
+import pandas as pd
+from modules.workbook import read_sheets
+
+# 各数据库汇总表配置: 层级 -> (RPKM工作表, 16S工作表)
+LEVEL_SHEETS = {
+    'CARD': {
+        'ARGs': ('ARGs_Classification', 'ARGs_Classification_16S'),
+        'GeneFamily': ('AMR_GeneFamily', 'AMR_GeneFamily_16S'),
+        'Class': ('ARGs_Class', 'ARGs_Class_16S'),
+        'Types': ('ARGs_Class_Types', 'ARGs_Class_Types_16S'),
+        'Mechanisms': ('ARGs_Mechanisms', 'ARGs_Mechanisms_16S'),
+    },
+    'SARG': {
+        'ARGs': ('ARGs_Gene', 'ARGs_Gene_16S'),
+        'Types': ('ARGs_Types', 'ARGs_Types_16S'),
+    },
+    'Victors': {
+        'Pathogen': ('ARGs_Pathogens', 'ARGs_Pathogens_16S'),
+        'Genus': ('ARGs_Genus', 'ARGs_Genus_16S'),
+    },
+    'BacMet': {
+        'Compound': ('Compound_RPKM', 'Compound_16SRPKM'),
+        'Gene_name': ('Gene_RPKM', 'Gene_16SRPKM'),
+        'Location': ('Location_RPKM', 'Location_16SRPKM'),
+        'Organism': ('Organism_RPKM', 'Organism_16SRPKM'),
+    },
+    'MGE': {
+        'Genes': ('Gene_RPKM', 'Gene_16SRPKM'),
+    },
+}
+
+# BacMet 汇总表为 样本×特征 布局，其余数据库为 特征×样本
+SAMPLE_ROW_DATABASES = {'BacMet'}
+
+# 汇总表中的非样本统计列
+SUMMARY_COLUMNS = {'total', 'Total', 'Sample_Presence', 'Presence_Percentage', 'Risk Rank'}
+
+LONG_COLUMNS = ['database', 'level', 'feature', 'sample', 'rpkm', 'rpkm_16s']
+
+# 结果工作簿中的标准化矩阵工作表
+MATRIX_SHEETS = ['RPKM', '16SRPKM']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS abundance (
+    cohort TEXT NOT NULL,
+    database TEXT NOT NULL,
+    level TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    rpkm REAL,
+    rpkm_16s REAL
+);
+CREATE INDEX IF NOT EXISTS idx_abundance_sample ON abundance(sample);
+CREATE INDEX IF NOT EXISTS idx_abundance_feature ON abundance(feature);
+CREATE INDEX IF NOT EXISTS idx_abundance_cohort_db ON abundance(cohort, database);
+"""
+
+
+def sheet_to_matrix(df, sample_rows):
+    """将单个汇总表转换为 特征×样本 表（去除统计列，行列名均为字符串）"""
+    key = df.columns[0]
+    df = df.drop(columns=[col for col in df.columns[1:] if col in SUMMARY_COLUMNS])
+    df = df.set_index(key)
+
+    if sample_rows:
+        # BacMet: 行为样本，列为特征
+        df = df.T
+
+    df.index = df.index.astype(str)
+    df.columns = df.columns.astype(str)
+    return df
+
+
+def sheet_to_long(df, sample_rows):
+    """将单个汇总表转换为 (feature, sample, value) 长表"""
+    df = sheet_to_matrix(df, sample_rows)
+    long_df = df.rename_axis(index='feature', columns='sample').stack().rename('value')
+    return long_df.reset_index()
+
+
+def workbook_samples(sheets, database):
+    """从第一个汇总表中取出样本名（sheets 为 {工作表名: DataFrame}）"""
+    rpkm_sheet = next(iter(LEVEL_SHEETS[database].values()))[0]
+    df = sheets[rpkm_sheet]
+    if database in SAMPLE_ROW_DATABASES:
+        return [str(s) for s in df.iloc[:, 0]]
+    return [str(col) for col in df.columns[1:] if col not in SUMMARY_COLUMNS]
+
+
+def workbook_to_long(workbook_path, database):
+    """读取一个数据库的结果工作簿，返回长格式 DataFrame"""
+    if database not in LEVEL_SHEETS:
+        raise ValueError(f"未知数据库: {database}")
+
+    levels = LEVEL_SHEETS[database]
+    sheet_names = [sheet for pair in levels.values() for sheet in pair]
+    # 一次打开工作簿读取全部所需工作表
+    sheets = read_sheets(workbook_path, sheet_names)
+    sample_rows = database in SAMPLE_ROW_DATABASES
+
+    frames = []
+    for level, (rpkm_sheet, s16_sheet) in levels.items():
+        rpkm_long = sheet_to_long(sheets[rpkm_sheet], sample_rows).rename(columns={'value': 'rpkm'})
+        s16_long = sheet_to_long(sheets[s16_sheet], sample_rows).rename(columns={'value': 'rpkm_16s'})
+        merged = pd.merge(rpkm_long, s16_long, on=['feature', 'sample'], how='outer')
+        merged.insert(0, 'level', level)
+        merged.insert(0, 'database', database)
+        frames.append(merged)
+
+    long_df = pd.concat(frames, ignore_index=True)[LONG_COLUMNS]
+    long_df[['rpkm', 'rpkm_16s']] = long_df[['rpkm', 'rpkm_16s']].apply(pd.to_numeric, errors='coerce')
+    return long_df
+
+
+def workbook_matrices(workbook_path, database, value='rpkm', levels=None):
+    """读取一个数据库结果工作簿中各层级的 特征×样本 数值矩阵
+
+    参数：
+        value: 'rpkm'（RPKM 汇总表）或 'rpkm_16s'（16S 标准化汇总表）
+        levels: 只读取这些层级（默认全部，见 LEVEL_SHEETS）
+    返回：
+        {层级: DataFrame（行为特征，列为样本，缺失值记为 0）}
+    """
+    if database not in LEVEL_SHEETS:
+        raise ValueError(f"未知数据库: {database}")
+    if value not in ('rpkm', 'rpkm_16s'):
+        raise ValueError(f"未知数值类型: {value}，可选: rpkm, rpkm_16s")
+
+    position = 0 if value == 'rpkm' else 1
+    wanted = {
+        level: pair[position] for level, pair in LEVEL_SHEETS[database].items()
+        if levels is None or level in levels
+    }
+    sheets = read_sheets(workbook_path, list(wanted.values()))
+    sample_rows = database in SAMPLE_ROW_DATABASES
+    return {
+        level: sheet_to_matrix(sheets[sheet], sample_rows).apply(pd.to_numeric, errors='coerce').fillna(0)
+        for level, sheet in wanted.items()
+    }
+
+
+def write_long_store(long_df, store_path, cohort, batch_size=50000):
+    """写入SQLite长格式库（同一 cohort+database 的旧记录会被替换）"""
+    store_path = Path(store_path)
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # 两列均为0的记录不写入，降低库体积
+    values = long_df[['rpkm', 'rpkm_16s']]
+    long_df = long_df[(values.fillna(0) != 0).any(axis=1)]
+
+    conn = sqlite3.connect(str(store_path))
+    try:
+        conn.executescript(_SCHEMA)
+        with conn:
+            for database in long_df['database'].unique():
+                conn.execute(
+                    "DELETE FROM abundance WHERE cohort = ? AND database = ?",
+                    (cohort, database)
+                )
+
+            rows = long_df.astype(object).where(long_df.notna(), None)
+            rows.insert(0, 'cohort', cohort)
+            records = rows.itertuples(index=False, name=None)
+            sql = "INSERT INTO abundance VALUES (?, ?, ?, ?, ?, ?, ?)"
+            batch = []
+            for record in records:
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    conn.executemany(sql, batch)
+                    batch = []
+            if batch:
+                conn.executemany(sql, batch)
+    finally:
+        conn.close()
+
+    logging.info(f"长格式结果库已更新: {store_path} (cohort={cohort}, 记录数={len(long_df)})")
+    return len(long_df)
+
+
+def export_long_store(outputs, store_path, cohort):
+    """将各数据库结果工作簿汇总写入长格式库
+
+    参数：
+        outputs: {数据库名: 结果工作簿路径}
+        store_path: SQLite 文件路径
+        cohort: 队列名称（用于区分不同项目）
+    """
+    try:
+        frames = []
+        for database, workbook_path in outputs.items():
+            if not Path(workbook_path).exists():
+                logging.warning(f"跳过 {database}: 结果文件不存在 {workbook_path}")
+                continue
+            frames.append(workbook_to_long(workbook_path, database))
+
+        if not frames:
+            logging.warning("没有可写入长格式库的结果")
+            return 0
+
+        return write_long_store(pd.concat(frames, ignore_index=True), store_path, cohort)
+    except Exception as e:
+        logging.error(f"长格式结果库写入失败: {str(e)}")
+        raise
+
+
+def query_sample(store_path, sample, cohort=None):
+    """查询单个样本在所有数据库中的全部特征"""
+    sql = "SELECT * FROM abundance WHERE sample = ?"
+    params = [sample]
+    if cohort is not None:
+        sql += " AND cohort = ?"
+        params.append(cohort)
+    conn = sqlite3.connect(str(store_path))
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def query_feature(store_path, feature, database=None, level=None):
+    """查询单个特征（如某个ARG）在所有队列、样本中的丰度"""
+    sql = "SELECT * FROM abundance WHERE feature = ?"
+    params = [feature]
+    if database is not None:
+        sql += " AND database = ?"
+        params.append(database)
+    if level is not None:
+        sql += " AND level = ?"
+        params.append(level)
+    conn = sqlite3.connect(str(store_path))
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
@@ -1,14 +1,31 @@
 # modules/utils.py
-import re
+import os
+import shutil
 from collections import defaultdict
-import logging
-import pandas as pd
+from contextlib import contextmanager
 import logging
 from pathlib import Path
-from logging.handlers import TimedRotatingFileHandler, RotatingFileHandler
+from logging.handlers import TimedRotatingFileHandler, RotatingFileHandler, QueueHandler, QueueListener
+
+# 日志队列与后台监听线程（setup_logging 创建）
+_log_queue = None
+_log_listener = None
+
 
-def setup_logging(project_root):
-    """配置统一日志格式"""
+def setup_logging(project_root, console_level=None):
+    """配置统一日志格式（在入口处调用）
+
+    日志记录经队列（QueueHandler）交给后台监听线程（QueueListener）写入日志文件与控制台：
+    各线程以及进程池子进程（见 worker_logging）记录日志时不等待文件 I/O，滚动日志文件只由主进程写入；
+    重复调用时替换之前的处理器与监听线程，不会叠加处理器或重复输出。
+    参数：
+        console_level: 控制台输出级别（默认使用配置 LOG_CONSOLE_LEVEL）
+    """
+    import atexit
+    import multiprocessing
+    from config.default_paths import LOG_CONSOLE_LEVEL
+
+    global _log_queue, _log_listener
     log_dir = Path(project_root) / "logs"
     log_dir.mkdir(exist_ok=True)
 
@@ -34,36 +51,75 @@ def setup_logging(project_root):
 
     # 控制台输出（处理中文编码）
     console_handler = logging.StreamHandler()
-    console_handler.setFormatter(logging.Formatter(log_format, date_format))
-
-    # 统一配置
-    logging.basicConfig(
-        level=logging.INFO,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            main_handler,
-            error_handler,
-            console_handler
-        ]
+    console_handler.setLevel(console_level or LOG_CONSOLE_LEVEL)
+
+    formatter = logging.Formatter(log_format, date_format)
+    for handler in (main_handler, error_handler, console_handler):
+        handler.setFormatter(formatter)
+
+    # 停止之前的监听线程（写完队列中剩余的记录），根日志器只保留一个队列处理器
+    shutdown_logging()
+    if _log_queue is None:
+        _log_queue = multiprocessing.Queue(-1)
+        atexit.register(shutdown_logging)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(QueueHandler(_log_queue))
+    root.setLevel(logging.INFO)
+
+    _log_listener = QueueListener(
+        _log_queue, main_handler, error_handler, console_handler, respect_handler_level=True
     )
+    _log_listener.start()
 
     # 禁用第三方库的日志
     logging.getLogger("matplotlib").setLevel(logging.WARNING)
     logging.getLogger("openpyxl").setLevel(logging.WARNING)
 
+
+def shutdown_logging():
+    """停止日志监听线程：写完队列中剩余的记录后关闭日志文件"""
+    global _log_listener
+    listener, _log_listener = _log_listener, None
+    if listener is None:
+        return
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+
+def log_queue():
+    """当前的日志队列（未调用 setup_logging 时为 None）"""
+    return _log_queue
+
+
+def worker_logging(queue):
+    """进程池子进程的初始化函数：日志记录放入主进程的日志队列，由主进程统一写出
+
+    用法：
+        ProcessPoolExecutor(initializer=worker_logging, initargs=(log_queue(),))
+    """
+    if queue is None:
+        return
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(queue))
+    root.setLevel(logging.INFO)
+
 def read_reads_file(reads_path):
     """通用 reads 文件读取函数"""
-    reads_dict = defaultdict(int)
-    pattern = re.compile(r'^([A-Za-z0-9-]+)_\d+(?:\.\S+)?:\s+(\d+)\s+reads$')
+    from modules.samples import parse_reads_line
 
+    reads_dict = defaultdict(int)
     try:
         with open(reads_path, 'r') as f:
             for line in f:
-                match = pattern.match(line.strip())
-                if match:
-                    sample_base = match.group(1)
-                    reads = int(match.group(2))
+                parsed = parse_reads_line(line)
+                if parsed:
+                    sample_base, reads = parsed
                     reads_dict[sample_base] += reads
         return reads_dict
     except FileNotFoundError:
@@ -76,16 +132,15 @@ def read_reads_file(reads_path):
 
 def read_16s_reads_file(reads_path):
     """通用 16S reads 文件读取函数"""
-    reads_dict = defaultdict(int)
-    pattern = re.compile(r'^([A-Za-z0-9-]+)_\d+(?:\.\S+)?\.16s:\s+(\d+)\s+reads$')
+    from modules.samples import parse_reads_line
 
+    reads_dict = defaultdict(int)
     try:
         with open(reads_path, 'r') as f:
             for line in f:
-                match = pattern.match(line.strip())
-                if match:
-                    sample_base = match.group(1)
-                    reads = int(match.group(2))
+                parsed = parse_reads_line(line, is_16s=True)
+                if parsed:
+                    sample_base, reads = parsed
                     reads_dict[sample_base] += reads
         return reads_dict
     except FileNotFoundError:
@@ -96,35 +151,150 @@ def read_16s_reads_file(reads_path):
         raise
 
 
-def calculate_rpkm(df, reads_dict, length_column=None):
-    # 添加更多可能的长度列名匹配
-    possible_length_columns = [
-        'Length (AA)',
-        'gene length',
-        'Length',
-    ]
-
-    # 自动检测存在的长度列
-    if length_column is None:
-        for col in possible_length_columns:
-            if col in df.columns:
-                length_column = col
-                break
-        else:  # 如果没有找到任何匹配项
-            raise KeyError("未找到长度列，请确认数据包含以下任一列名：" + ", ".join(possible_length_columns))
-    """通用 RPKM 计算函数"""
-    df = df.copy()
+# 可能的长度列名（按顺序检测）
+LENGTH_COLUMNS = ('Length (AA)', 'gene length', 'Length')
+
+
+def find_length_column(df):
+    """自动检测存在的长度列"""
+    for col in LENGTH_COLUMNS:
+        if col in df.columns:
+            return col
+    raise KeyError("未找到长度列，请确认数据包含以下任一列名：" + ", ".join(LENGTH_COLUMNS))
+
+
+def calculate_rpkm(df, reads_dict, length_column=None, lengths=None):
+    # 自动检测存在的长度列（给定 lengths 长度向量时不使用长度列）
+    if length_column is None and lengths is None:
+        length_column = find_length_column(df)
+    """通用 RPKM 计算函数（逐列计算，不修改也不整表复制输入；样本列可分块并行）"""
+    import pandas as pd
+    from modules.parallel import map_column_blocks
+    from modules.progress import track
+
     non_numeric_cols = df.select_dtypes(exclude=['number']).columns.tolist()
-    numeric_cols = [col for col in df.columns if col not in non_numeric_cols]
+    numeric_cols = set(col for col in df.columns if col not in non_numeric_cols)
 
-    # 确保数值列为数值类型
-    df[numeric_cols] = df[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
+    def to_number(values):
+        # 确保数值列为数值类型
+        return pd.to_numeric(values, errors='coerce').fillna(0)
 
-    for col in numeric_cols:
-        if col in reads_dict:
-            reads = reads_dict[col]
-            df[col] = df[col] / ((df[length_column] / 1000) * (reads / 1e6))
-    return df
+    length_kb = None
+    if lengths is not None:
+        # 与行对齐的长度向量（如 modules.lengths 的查找结果）
+        length_kb = pd.Series(lengths, index=df.index, dtype='float64') / 1000
+    elif any(col in reads_dict for col in numeric_cols):
+        lengths = df[length_column]
+        length_kb = (to_number(lengths) if length_column in numeric_cols else lengths) / 1000
+
+    def rpkm_block(block):
+        result = []
+        for col in block:
+            values = df[col]
+            if col in numeric_cols:
+                values = to_number(values)
+                if col in reads_dict:
+                    values = values / (length_kb * (reads_dict[col] / 1e6))
+            result.append(values)
+            progress.advance()
+        return result
+
+    with track('rpkm', f"RPKM 计算（{len(df)} 行）", total=len(df.columns), unit='列') as progress:
+        result = map_column_blocks(rpkm_block, df.columns)
+    return pd.concat(result, axis=1, keys=list(df.columns)) if result else df.iloc[:, :0]
+
+
+def ratio_to_16s(final_df, base_df, columns, reads_data, reads_16s_data):
+    """计算 RPKM 与 16S 标准化值的比值，返回 {列名: Series}
+
+    同时存在于两个 reads 文件中的样本列，其 16S 值为常数
+    16s_reads / ((1492/1000) * (reads/1e6))；其余数值列与原始值相除。
+    逐列计算，无需构造完整的 16S 中间表。
+    """
+    from modules.parallel import map_column_blocks
+    from modules.progress import track
+    from modules.normalize import LENGTH_16S
+
+    def ratio_block(block):
+        ratios = []
+        for col in block:
+            if col in reads_16s_data and col in reads_data:
+                # 计算公式：16s_reads_number / ((1492/1000) * (reads_data/1e6))
+                denominator = reads_16s_data[col] / ((LENGTH_16S / 1000) * (reads_data[col] / 1e6))
+            else:
+                denominator = base_df[col]
+            ratios.append((col, final_df[col] / denominator))
+            progress.advance()
+        return ratios
+
+    columns = list(columns)
+    with track('rpkm', "16S 标准化比值", total=len(columns), unit='列') as progress:
+        return dict(map_column_blocks(ratio_block, columns))
+
+
+@contextmanager
+def atomic_output(output_path, keep_existing=False):
+    """原子写入结果文件：先写同目录下的临时文件，成功后再替换目标文件
+
+    写入中断或出错时目标文件保持原样（作为上一个阶段的检查点），临时文件被删除。
+    参数：
+        output_path: 目标文件
+        keep_existing: 追加写入时为 True，临时文件以目标文件的副本开始
+    用法：
+        with atomic_output(path) as tmp_path:
+            df.to_excel(tmp_path, index=False)
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.stem + '.tmp' + output_path.suffix)
+    try:
+        if keep_existing and output_path.exists():
+            shutil.copy2(output_path, tmp_path)
+        yield tmp_path
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    from modules.workbook import invalidate
+    invalidate(output_path)
+
+
+def write_sheets(output_path, sheets, mode='a'):
+    """将 {工作表名: DataFrame} 写入Excel（追加模式下同名工作表会被替换；原子写入）"""
+    import pandas as pd
+    from modules.progress import track
+
+    options = {'if_sheet_exists': 'replace'} if mode == 'a' else {}
+    with track('export', f"写出 {Path(output_path).name}", total=len(sheets), unit='工作表') as progress:
+        with atomic_output(output_path, keep_existing=(mode == 'a')) as tmp_path, \
+                pd.ExcelWriter(tmp_path, engine='openpyxl', mode=mode, **options) as writer:
+            for sheet_name, df in sheets.items():
+                df.to_excel(writer, index=False, sheet_name=sheet_name)
+                progress.advance()
+
+
+EXPORT_FORMATS = {'xlsx': None, 'csv': ',', 'tsv': '\t'}
+
+
+def export_workbook(workbook_path, fmt):
+    """将结果工作簿的各工作表另存为 CSV/TSV（xlsx 时不做处理）
+
+    输出目录为工作簿同级的 <文件名>_<格式>/，每个工作表一个文件。
+    """
+    from modules.workbook import read_sheets
+
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}，可选: {', '.join(EXPORT_FORMATS)}")
+    if fmt == 'xlsx':
+        return Path(workbook_path)
+
+    workbook_path = Path(workbook_path)
+    out_dir = workbook_path.parent / f"{workbook_path.stem}_{fmt}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for sheet_name, df in read_sheets(workbook_path).items():
+        df.to_csv(out_dir / f"{sheet_name}.{fmt}", sep=EXPORT_FORMATS[fmt], index=False)
+    logging.info(f"结果已另存为 {fmt}: {out_dir}")
+    return out_dir
 
 
 def process_columns(df):
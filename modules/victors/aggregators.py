@@ -1,87 +1,119 @@
 """
 Victors 数据聚合模块
 包含病原体和病原体属分类汇总功能
+
+病原体属由 病原体→属 的对应关系得到；按层级 Pathogen → Genus 逐级汇总，
+属的汇总由病原体汇总结果再次聚合，而不是重新扫描整个基因表。
 """
 
+import numpy as np
 import pandas as pd
 import logging
+from modules.utils import write_sheets
+from modules.rollup import rollup
+from modules.workbook import read_sheets
+
+# 分类层级（由细到粗）
+VICTORS_LEVELS = ['Pathogen', 'Genus']
+
+# 输入工作表 -> (病原体汇总工作表, 病原体属汇总工作表)
+PROCESS_CONFIG = [
+    ('RPKM', 'ARGs_Pathogens', 'ARGs_Genus'),
+    ('16SRPKM', 'ARGs_Pathogens_16S', 'ARGs_Genus_16S')
+]
+
+
+def genus_of(pathogens):
+    """病原体名 -> 病原体属（取第一个词，无法解析时为 Unknown）
+
+    只需对去重后的病原体名调用，再按编码取值即可得到每行的属。
+    """
+    genera = pd.Series(pathogens, dtype=object).str.split().str[0]
+    return genera.fillna('Unknown').to_numpy(dtype=object)
+
+
+def assign_genus(pathogen):
+    """对 Pathogen 列编码一次，按 病原体→属 对应关系得到每行的属（缺失病原体为 Unknown）"""
+    codes, pathogens = pd.factorize(pathogen)
+    # 编码 -1（缺失值）取到末尾追加的 Unknown
+    lookup = np.append(genus_of(pathogens), 'Unknown')
+    return lookup[codes]
+
+
+def _with_total(grouped):
+    totals = grouped.sum(axis=1).rename('Total')
+    result = pd.concat([grouped, totals], axis=1)
+    return result.sort_values('Total', ascending=False).reset_index()
+
+
+def rollup_victors(input_path):
+    """读取各输入工作表并逐级汇总（每个工作表只读取、分组一次）
+
+    返回：
+        {输入工作表名: {'Pathogen': DataFrame, 'Genus': DataFrame}}，
+        供 build_pathogen_classification / build_genus_classification 共享
+    """
+    sums_by_sheet = {}
+    workbook = read_sheets(input_path, [input_sheet for input_sheet, _, _ in PROCESS_CONFIG])
+    for input_sheet, _, _ in PROCESS_CONFIG:
+        # 读取数据
+        df = workbook[input_sheet]
+
+        # 校验必要列
+        for column in VICTORS_LEVELS:
+            if column not in df.columns:
+                raise ValueError(f"工作表 {input_sheet} 缺少{column}列")
+
+        # 删除非必要列
+        df = df.drop(columns=['Length', 'ID'], errors='ignore')
+
+        # 获取样本列
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        sample_columns = [col for col in numeric_cols if col not in VICTORS_LEVELS]
+
+        # 逐级汇总（缺失病原体的行不计入病原体汇总，但计入 Unknown 属）
+        sums_by_sheet[input_sheet] = rollup(df, VICTORS_LEVELS, sample_columns)
+
+    return sums_by_sheet
+
+
+def build_pathogen_classification(sums_by_sheet):
+    """按病原体(Pathogen)分类汇总（由 rollup_victors 的结果计算，返回 {工作表名: DataFrame}）"""
+    return {
+        pathogen_sheet: _with_total(sums_by_sheet[input_sheet]['Pathogen'])
+        for input_sheet, pathogen_sheet, _ in PROCESS_CONFIG
+    }
+
+
+def build_genus_classification(sums_by_sheet):
+    """按病原体属(Genus)分类汇总（由 rollup_victors 的结果计算，返回 {工作表名: DataFrame}）"""
+    return {
+        genus_sheet: _with_total(sums_by_sheet[input_sheet]['Genus'])
+        for input_sheet, _, genus_sheet in PROCESS_CONFIG
+    }
+
 
 def generate_pathogen_classification(input_path, output_path):
     """按病原体(Pathogen)分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'ARGs_Pathogens'),
-            ('16SRPKM', 'ARGs_Pathogens_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                # 读取数据
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 校验必要列
-                if 'Pathogen' not in df.columns:
-                    raise ValueError(f"工作表 {input_sheet} 缺少Pathogen列")
-                
-                # 删除非必要列
-                df = df.drop(columns=['Length', 'ID'], errors='ignore')
-                
-                # 获取样本列
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'Pathogen']
-                
-                # 按病原体分组
-                grouped = df.groupby('Pathogen')[sample_columns].sum()
-                totals = grouped.sum(axis=1).rename('Total')
-                result = pd.concat([grouped, totals], axis=1)
-                result = result.sort_values('Total', ascending=False).reset_index()
-                
-                # 保存结果
-                result.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_pathogen_classification(rollup_victors(input_path))
+        write_sheets(output_path, sheets)
+
         logging.info(f"✅ 病原体分类汇总完成! 结果保存至 {output_path}")
         return True
-    
     except Exception as e:
         logging.error(f"病原体分类汇总失败: {str(e)}")
         raise
 
+
 def generate_genus_classification(input_path, output_path):
     """按病原体属(Genus)分类汇总"""
     try:
-        process_config = [
-            ('RPKM', 'ARGs_Genus'),
-            ('16SRPKM', 'ARGs_Genus_16S')
-        ]
-        
-        with pd.ExcelWriter(output_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            for input_sheet, output_sheet in process_config:
-                # 读取数据
-                df = pd.read_excel(input_path, sheet_name=input_sheet)
-                
-                # 校验必要列
-                if 'Genus' not in df.columns:
-                    raise ValueError(f"工作表 {input_sheet} 缺少Genus列")
-                
-                # 删除非必要列
-                df = df.drop(columns=['Length', 'ID'], errors='ignore')
-                
-                # 获取样本列
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                sample_columns = [col for col in numeric_cols if col != 'Genus']
-                
-                # 按病原体属分组
-                grouped = df.groupby('Genus')[sample_columns].sum()
-                totals = grouped.sum(axis=1).rename('Total')
-                result = pd.concat([grouped, totals], axis=1)
-                result = result.sort_values('Total', ascending=False).reset_index()
-                
-                # 保存结果
-                result.to_excel(writer, index=False, sheet_name=output_sheet)
-        
+        sheets = build_genus_classification(rollup_victors(input_path))
+        write_sheets(output_path, sheets)
+
         logging.info(f"✅ 病原体属分类汇总完成! 结果保存至 {output_path}")
         return True
-    
     except Exception as e:
         logging.error(f"病原体属分类汇总失败: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -3,17 +3,21 @@ Victors RPKM计算模块
 """
 
 import pandas as pd
-import re
 from collections import defaultdict
-from modules.utils import setup_logging, calculate_rpkm
+from modules.utils import calculate_rpkm
 import logging
-from modules.utils import read_reads_file, read_16s_reads_file
+from modules.utils import read_reads_file, read_16s_reads_file, atomic_output
+from modules.ingest import load_table
+from modules.samples import resolve_columns, merge_mates
+from modules.parallel import map_column_blocks
+from modules.victors.aggregators import assign_genus
+from modules.normalize import LENGTH_16S, write_normalizations
 
 def process_victors_data(input_path, output_path, reads_path, reads_16s_path):
     """处理Victors数据并计算RPKM/16S RPKM"""
     try:
         # 读取原始数据
-        df = pd.read_excel(input_path)
+        df = load_table(input_path)
         df = df.rename(columns={'Length (AA)': 'Length'})
         
         # 识别并重命名病原体列
@@ -24,59 +28,46 @@ def process_victors_data(input_path, output_path, reads_path, reads_16s_path):
         if pathogen_col:
             df = df.rename(columns={pathogen_col: 'Pathogen'})
         
-        # 添加病原体属列
-        df['Genus'] = df['Pathogen'].str.split().str[0].fillna('Unknown')
+        # 添加病原体属列（按去重后的病原体名解析，不逐行拆分字符串）
+        df['Genus'] = assign_genus(df['Pathogen'])
         
-        # 标准化列名
-        column_mapping = {}
-        pattern = re.compile(r'^(.+?)_[12]\.fastq\.gz-victors\.txt$')
-        for col in df.columns:
-            if col == 'ID':
-                continue
-            match = pattern.match(col)
-            if match and "_1.fastq.gz-victors.txt" in col:
-                base_name = match.group(1).split('_')[0]
-                column_mapping[col] = base_name
-            else:
-                column_mapping[col] = col
+        # 双端计数列按样本合并（合并方式见配置 MATE_MERGE_POLICY），列名为样本名
+        base_df = merge_mates(df, resolve_columns('Victors', df.columns))
         
-        # 重命名列并移除冗余列
-        renamed_df = df.rename(columns=column_mapping)
-        columns_to_keep = [
-            col for col in renamed_df.columns 
-            if not col.endswith('_2.fastq.gz-victors.txt')
-        ]
-        base_df = renamed_df[columns_to_keep].copy()
-        
-        # 计算常规RPKM
+        # 计算常规RPKM（calculate_rpkm 不修改输入，无需复制）
         reads_data = read_reads_file(reads_path)
         final_df = calculate_rpkm(base_df, reads_data)
         
-        # 计算16S RPKM
         reads_16s_data = read_16s_reads_file(reads_16s_path)
-        final_16s_df = base_df.copy()
-        numeric_cols = final_16s_df.select_dtypes(include=['number']).columns
-        
-        for col in numeric_cols:
-            if col in reads_16s_data and col in reads_data:
-                # 计算公式：原始数据 * 16s_reads / 分母
-                sample_counts = base_df[col]
-                denominator = (1492 / 1000) * (reads_data[col] / 1e6)
-                final_16s_df[col] = (sample_counts * reads_16s_data[col]) / denominator
         
         # 保存结果
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        with atomic_output(output_path) as tmp_path, pd.ExcelWriter(tmp_path, engine='openpyxl') as writer:
             final_df.to_excel(writer, index=False, sheet_name='RPKM')
             
-            # 计算比值
+            # 计算比值（16S RPKM 逐列计算）
             numeric_cols = final_df.select_dtypes(include=['number']).columns
-            ratio_df = final_df[numeric_cols].div(final_16s_df[numeric_cols]).fillna(0)
+            def ratio_block(block):
+                ratios = []
+                for col in block:
+                    if col in reads_16s_data and col in reads_data:
+                        # 计算公式：原始数据 * 16s_reads / 分母
+                        denominator = (LENGTH_16S / 1000) * (reads_data[col] / 1e6)
+                        value_16s = (base_df[col] * reads_16s_data[col]) / denominator
+                    else:
+                        value_16s = base_df[col]
+                    ratios.append(final_df[col].div(value_16s).fillna(0))
+                return ratios
+
+            ratios = map_column_blocks(ratio_block, numeric_cols)
             ratio_df = pd.concat(
                 [final_df[final_df.columns.difference(numeric_cols)], 
-                ratio_df
+                *ratios
             ], axis=1)
             
             ratio_df.to_excel(writer, index=False, sheet_name='16SRPKM')
+
+            # 额外标准化（TPM/CPM 等，见配置 EXTRA_NORMALIZATIONS）
+            write_normalizations(writer, base_df, reads_data, reads_16s_data)
         
         logging.info(f"✅ RPKM计算完成! 结果保存至: {output_path}")
         return True
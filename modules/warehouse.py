@@ -0,0 +1,219 @@
+"""
+SQLite 结果仓库模块
+包含：
+- 每次运行的登记（run_id、cohort、输入文件哈希）
+- 标准化矩阵(RPKM/16SRPKM)与分类汇总结果的追加写入（executemany 批量插入）
+- 按特征、按样本的历史(纵向)查询
+"""
+
+import hashlib
+import sqlite3
+import logging
+import uuid
+from datetime import datetime
+from pathlib import Path
+import pandas as pd
+from modules.workbook import read_sheets
+from modules.store import LEVEL_SHEETS, MATRIX_SHEETS, SAMPLE_ROW_DATABASES, sheet_to_long, workbook_samples
+
+# 各数据库标准化矩阵的特征列
+MATRIX_KEYS = {
+    'CARD': 'Accession',
+    'SARG': 'ID',
+    'Victors': 'ID',
+    'BacMet': 'ID',
+    'MGE': 'Accession',
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    cohort TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    input_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS run_inputs (
+    run_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    sha256 TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    database TEXT NOT NULL,
+    sheet TEXT NOT NULL,
+    feature TEXT NOT NULL,
+    sample TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_cohort ON runs(cohort, created_at);
+CREATE INDEX IF NOT EXISTS idx_run_inputs_run ON run_inputs(run_id);
+CREATE INDEX IF NOT EXISTS idx_results_feature ON results(database, sheet, feature);
+CREATE INDEX IF NOT EXISTS idx_results_sample ON results(sample);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results(run_id);
+"""
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """分块计算文件 SHA256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _connect(warehouse_path):
+    conn = sqlite3.connect(str(warehouse_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def workbook_records(workbook_path, database):
+    """读取结果工作簿，返回 (sheet, feature, sample, value) 长表"""
+    level_sheets = [sheet for pair in LEVEL_SHEETS[database].values() for sheet in pair]
+    sheets = read_sheets(workbook_path, MATRIX_SHEETS + level_sheets)
+    samples = workbook_samples(sheets, database)
+    key = MATRIX_KEYS[database]
+
+    frames = []
+    # 标准化矩阵：特征列 + 样本列（去掉 Total 汇总行）
+    for sheet in MATRIX_SHEETS:
+        df = sheets[sheet]
+        df.columns = df.columns.astype(str)
+        sample_cols = [col for col in df.columns if col in samples]
+        df = df[[key] + sample_cols]
+        df = df[df[key].astype(str) != 'Total']
+        long_df = sheet_to_long(df, sample_rows=False)
+        long_df.insert(0, 'sheet', sheet)
+        frames.append(long_df)
+
+    # 分类汇总结果
+    sample_rows = database in SAMPLE_ROW_DATABASES
+    for sheet in level_sheets:
+        long_df = sheet_to_long(sheets[sheet], sample_rows)
+        long_df.insert(0, 'sheet', sheet)
+        frames.append(long_df)
+
+    records = pd.concat(frames, ignore_index=True)
+    records['value'] = pd.to_numeric(records['value'], errors='coerce')
+    return records
+
+
+def register_run(conn, cohort, inputs):
+    """登记一次运行及其输入文件哈希，返回 run_id"""
+    input_rows = []
+    for role, path in sorted(inputs.items()):
+        path = Path(path)
+        if path.exists():
+            input_rows.append((role, str(path), path.stat().st_size, file_sha256(path)))
+        else:
+            input_rows.append((role, str(path), None, None))
+
+    combined = hashlib.sha256(
+        "|".join(f"{role}:{sha}" for role, _, _, sha in input_rows).encode('utf-8')
+    ).hexdigest()
+    created_at = datetime.now().isoformat(timespec='seconds')
+    run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+    conn.execute(
+        "INSERT INTO runs VALUES (?, ?, ?, ?)",
+        (run_id, cohort, created_at, combined)
+    )
+    conn.executemany(
+        "INSERT INTO run_inputs VALUES (?, ?, ?, ?, ?)",
+        [(run_id, *row) for row in input_rows]
+    )
+    return run_id
+
+
+def append_run(warehouse_path, cohort, inputs, outputs, batch_size=50000):
+    """将一次运行的全部结果追加写入仓库
+
+    参数：
+        warehouse_path: SQLite 仓库文件路径
+        cohort: 队列名称
+        inputs: {角色: 输入文件路径}，用于计算输入哈希
+        outputs: {数据库名: 结果工作簿路径}
+    返回：
+        run_id
+    """
+    try:
+        warehouse_path = Path(warehouse_path)
+        warehouse_path.parent.mkdir(parents=True, exist_ok=True)
+
+        conn = _connect(warehouse_path)
+        try:
+            with conn:
+                run_id = register_run(conn, cohort, inputs)
+                sql = "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?)"
+                total = 0
+
+                for database, workbook_path in outputs.items():
+                    if not Path(workbook_path).exists():
+                        logging.warning(f"跳过 {database}: 结果文件不存在 {workbook_path}")
+                        continue
+
+                    records = workbook_records(workbook_path, database)
+                    # 零值不入库
+                    records = records[records['value'].fillna(0) != 0]
+                    values = records['value'].astype(object).where(records['value'].notna(), None)
+
+                    rows = zip(
+                        records['sheet'], records['feature'].astype(str),
+                        records['sample'].astype(str), values
+                    )
+                    batch = []
+                    for sheet, feature, sample, value in rows:
+                        batch.append((run_id, database, sheet, feature, sample, value))
+                        if len(batch) >= batch_size:
+                            conn.executemany(sql, batch)
+                            batch = []
+                    if batch:
+                        conn.executemany(sql, batch)
+                    total += len(records)
+        finally:
+            conn.close()
+
+        logging.info(f"结果仓库已追加运行 {run_id} (cohort={cohort}, 记录数={total}): {warehouse_path}")
+        return run_id
+    except Exception as e:
+        logging.error(f"写入结果仓库失败: {str(e)}")
+        raise
+
+
+def list_runs(warehouse_path, cohort=None):
+    """列出仓库中的运行记录"""
+    sql = "SELECT * FROM runs"
+    params = []
+    if cohort is not None:
+        sql += " WHERE cohort = ?"
+        params.append(cohort)
+    sql += " ORDER BY created_at"
+    conn = sqlite3.connect(str(warehouse_path))
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
+
+
+def query_history(warehouse_path, database, sheet, feature, cohort=None):
+    """查询某个特征在历次运行中的取值（纵向比较）"""
+    sql = (
+        "SELECT r.cohort, r.created_at, v.run_id, v.sample, v.value "
+        "FROM results v JOIN runs r ON r.run_id = v.run_id "
+        "WHERE v.database = ? AND v.sheet = ? AND v.feature = ?"
+    )
+    params = [database, sheet, feature]
+    if cohort is not None:
+        sql += " AND r.cohort = ?"
+        params.append(cohort)
+    sql += " ORDER BY r.created_at, v.sample"
+    conn = sqlite3.connect(str(warehouse_path))
+    try:
+        return pd.read_sql_query(sql, conn, params=params)
+    finally:
+        conn.close()
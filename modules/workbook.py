@@ -0,0 +1,138 @@
+"""
+Excel 工作簿读取模块
+包含：
+- 每个工作簿只打开一次，一次解析所需的全部工作表（openpyxl 只读、仅取值模式）
+- 解析结果在本次运行内共享：按文件路径、大小与修改时间缓存，文件被改写后自动失效；
+  缓存总大小不超过配置 WORKBOOK_CACHE_MB，超出时按最近最少使用的顺序整本释放
+- 大工作簿的多个工作表可在进程池中并行解析
+
+各模块此前对同一工作簿的每个工作表分别调用 pd.read_excel，每次都要重新解压与解析整个文件。
+返回的 DataFrame 均为缓存的副本，调用方可直接修改；启用 Arrow 后端（modules.frames）时，
+文本列的副本共享底层 Arrow 数组，不再逐元素复制。
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import pandas as pd
+from modules.frames import to_backend
+
+# {工作簿路径: 缓存项}，按最近使用的顺序排列（最近使用的在末尾）
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_path_locks = {}
+
+
+def _fingerprint(path):
+    stat = path.stat()
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+def _path_lock(key):
+    with _cache_lock:
+        return _path_locks.setdefault(key, threading.Lock())
+
+
+def cache_limit():
+    """工作簿缓存的大小上限（字节）"""
+    from config.default_paths import WORKBOOK_CACHE_MB
+    return max(0, int(WORKBOOK_CACHE_MB * 1024 * 1024))
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _store(key, entry):
+    """登记缓存项，并按最近最少使用的顺序释放其他工作簿直至不超过上限（须持有 _cache_lock）
+
+    单个工作簿超出上限时不缓存。
+    """
+    limit = cache_limit()
+    _cache[key] = entry
+    _cache.move_to_end(key)
+    total = sum(item['bytes'] for item in _cache.values())
+    while _cache and total > limit:
+        evicted, item = _cache.popitem(last=False)
+        total -= item['bytes']
+        logging.debug(f"释放工作簿缓存: {evicted}")
+
+
+def _read_sheet(path, sheet_name):
+    # 进程池中执行：每个进程独立打开工作簿解析一个工作表
+    return pd.read_excel(path, sheet_name=sheet_name, engine='openpyxl')
+
+
+def _parse(path, sheet_names, processes):
+    """解析工作表，返回 (全部工作表名, {工作表名: DataFrame})"""
+    from config.default_paths import EXCEL_READ_PROCESSES, EXCEL_PARALLEL_MIN_MB
+
+    processes = processes or EXCEL_READ_PROCESSES
+    with pd.ExcelFile(path, engine='openpyxl') as xls:
+        all_names = list(xls.sheet_names)
+        wanted = all_names if sheet_names is None else sheet_names
+        large = path.stat().st_size >= EXCEL_PARALLEL_MIN_MB * 1024 * 1024
+        if processes <= 1 or len(wanted) <= 1 or not large:
+            return all_names, {name: to_backend(xls.parse(name)) for name in wanted}
+
+    from modules.utils import log_queue, worker_logging
+
+    logging.info(f"并行解析工作簿 {path.name} 的 {len(wanted)} 个工作表（{processes} 个进程）")
+    with ProcessPoolExecutor(max_workers=min(processes, len(wanted)),
+                             initializer=worker_logging, initargs=(log_queue(),)) as executor:
+        frames = list(executor.map(_read_sheet, [path] * len(wanted), wanted))
+    return all_names, {name: to_backend(frame) for name, frame in zip(wanted, frames)}
+
+
+def read_sheets(path, sheet_names=None, processes=None):
+    """读取工作簿中的多个工作表
+
+    参数：
+        path: 工作簿路径
+        sheet_names: 工作表名（或序号）列表，None 表示全部工作表
+        processes: 并行解析的进程数，默认使用配置 EXCEL_READ_PROCESSES
+                   （仅当工作簿不小于 EXCEL_PARALLEL_MIN_MB 时启用）
+    返回：
+        {工作表名: DataFrame}，按请求顺序排列，均为副本
+    """
+    path = Path(path)
+    key = str(path.resolve())
+    with _path_lock(key):
+        fingerprint = _fingerprint(path)
+        with _cache_lock:
+            entry = _cache.get(key)
+        if entry is None or entry['fingerprint'] != fingerprint:
+            entry = {'fingerprint': fingerprint, 'names': None, 'sheets': {}, 'bytes': 0}
+
+        if sheet_names is None and entry['names'] is not None:
+            sheet_names = entry['names']
+        missing = None if sheet_names is None else [
+            name for name in sheet_names if name not in entry['sheets']
+        ]
+        if missing is None or missing:
+            all_names, parsed = _parse(path, missing, processes)
+            entry['names'] = all_names
+            entry['sheets'].update(parsed)
+            entry['bytes'] += sum(_frame_bytes(df) for df in parsed.values())
+            if sheet_names is None:
+                sheet_names = all_names
+        with _cache_lock:
+            _store(key, entry)
+
+    return {name: entry['sheets'][name].copy() for name in sheet_names}
+
+
+def read_sheet(path, sheet_name=0):
+    """读取工作簿中的单个工作表（经缓存，返回副本）"""
+    return read_sheets(path, [sheet_name])[sheet_name]
+
+
+def invalidate(path=None):
+    """使某个工作簿（None 表示全部）的缓存失效"""
+    with _cache_lock:
+        if path is None:
+            _cache.clear()
+        else:
+            _cache.pop(str(Path(path).resolve()), None)
@@ -1,14 +1,24 @@
 """
 分析流程执行脚本
+
+各流程在首次访问时才导入（避免启动时加载 pandas/openpyxl）
 """
 
-# 导入所有流程
-from .assign import organize_files
-from .card_pipeline import run_card_pipeline
-from .sarg_pipeline import run_sarg_pipeline
-from .victors_pipeline import run_victors_pipeline
-from .bacmet_pipeline import run_bacmet_pipeline
-from .mge_pipeline import run_mge_pipeline
+import importlib
+
+# 公共接口 -> 所在子模块
+_ATTRIBUTES = {
+    'organize_files': 'assign',
+    'run_card_pipeline': 'card_pipeline',
+    'run_sarg_pipeline': 'sarg_pipeline',
+    'run_victors_pipeline': 'victors_pipeline',
+    'run_bacmet_pipeline': 'bacmet_pipeline',
+    'run_mge_pipeline': 'mge_pipeline',
+    'add_samples': 'incremental',
+    'run_sharded': 'sharded',
+    'Stage': 'runner',
+    'run_stages': 'runner',
+}
 
 # 定义公共接口
 __all__ = [
@@ -17,5 +27,20 @@ __all__ = [
     'run_sarg_pipeline',
     'run_victors_pipeline',
     'run_bacmet_pipeline',
-    'run_mge_pipeline'
-]
\ No newline at end of file
+    'run_mge_pipeline',
+    'add_samples',
+    'run_sharded',
+    'Stage',
+    'run_stages'
+]
+
+
+def __getattr__(name):
+    if name in _ATTRIBUTES:
+        module = importlib.import_module(f".{_ATTRIBUTES[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,94 +1,139 @@
 """
 BacMet 全流程分析脚本
+执行顺序：
+1. 数据预处理（注释映射）
+2. RPKM计算（含16S RPKM）
+3. 化合物、基因、位置、生物体分类汇总（并行计算）
+4. 汇总结果写出
 """
 
 import logging
 from pathlib import Path
-from config.default_paths import BACMET_DIR, BACMET_FILES, READS_FILE, READS_16S_FILE
+from config.default_paths import BACMET_FILES, READS_FILE, READS_16S_FILE
 from modules.bacmet import preprocess, rpkm, aggregators
-from modules.utils import setup_logging
-import pandas as pd
+from modules.utils import write_sheets
+from modules.workbook import read_sheets
+from modules.preflight import check_inputs
+from pipelines.runner import Stage, run_stages, CACHE_FILE_NAME
+
+# (阶段名, 汇总函数, 输出工作表前缀)
+CLASSIFICATIONS = [
+    ('compound', aggregators.generate_compound_classification, 'Compound'),
+    ('gene', aggregators.generate_gene_classification, 'Gene'),
+    ('location', aggregators.generate_location_classification, 'Location'),
+    ('organism', aggregators.generate_organism_classification, 'Organism'),
+]
+
+
+def build_bacmet_stages(files, reads_path, reads_16s_path):
+    """声明BacMet流程的各阶段"""
+    output = files["output"]
+    mapped = Path(output).parent / "BacMet_mapped.xlsx"
+
+    def run_preprocess(results):
+        logging.info("步骤1: 执行BacMet数据预处理...")
+        return preprocess.preprocess_bacmet(
+            input_path=files["input"],
+            bacmet_mapping_file=files["mapping"],
+            output_path=mapped
+        )
 
+    def run_rpkm(results):
+        logging.info("步骤2: 执行RPKM标准化计算...")
+        return rpkm.process_sarg_data(
+            file_path=mapped,
+            output_path=output,
+            reads_path=reads_path,
+            reads_16s_path=reads_16s_path,
+            mapping_file=files["mapping"]
+        )
 
-def run_bacmet_pipeline():
-    """执行BacMet全流程分析"""
+    def run_load(results):
+        # 一次解析处理后的数据，供各分类汇总共享
+        return read_sheets(output, ['RPKM', '16SRPKM'])
+
+    def make_classify(func, prefix):
+        def run_classify(results):
+            logging.info(f"- {prefix} 分类汇总")
+            # 汇总函数可能就地修改列（如化合物），各阶段使用独立副本
+            return {
+                f"{prefix}_{sheet}": func(df.copy())
+                for sheet, df in results['load'].items()
+            }
+        return run_classify
+
+    def run_export(results):
+        sheets = {}
+        for name, _, _ in CLASSIFICATIONS:
+            sheets.update(results[name])
+        write_sheets(output, sheets)
+        logging.info(f"分类汇总已写入: {output}")
+        return True
+
+    stages = [
+        Stage('preprocess', run_preprocess, kind='preprocess',
+              inputs=[files["input"], files["mapping"]], outputs=[mapped]),
+        Stage('rpkm', run_rpkm, deps=['preprocess'], kind='rpkm',
+              inputs=[files["mapping"], reads_path, reads_16s_path], outputs=[output]),
+        Stage('load', run_load, deps=['rpkm'], kind='aggregate'),
+    ]
+    for name, func, prefix in CLASSIFICATIONS:
+        stages.append(Stage(name, make_classify(func, prefix), deps=['load'], kind='aggregate'))
+    stages.append(Stage('export', run_export, deps=[name for name, _, _ in CLASSIFICATIONS],
+                        kind='export', outputs=[output]))
+    return stages
+
+
+def run_bacmet_pipeline(files=None, reads_path=None, reads_16s_path=None,
+                        use_cache=False, dry_run=False, max_workers=None, steps=None,
+                        preflight=True):
+    """执行BacMet全流程分析
+
+    参数（均可省略，默认使用 config/default_paths.py 中的配置）：
+        files: 与 BACMET_FILES 结构相同的路径字典
+        reads_path / reads_16s_path: reads 与 16S reads 统计文件
+        use_cache: 跳过输入未变化且已完成的阶段
+        dry_run: 仅输出执行计划
+        max_workers: 并行阶段的线程数
+        steps: 只执行所选步骤（preprocess / rpkm / aggregate），默认全部
+        preflight: 执行前只读取表头预检输入（由主入口统一预检时可关闭）
+    """
+    files = files or BACMET_FILES
+    reads_path = reads_path or READS_FILE
+    reads_16s_path = reads_16s_path or READS_16S_FILE
+    work_dir = Path(files["output"]).parent
+    logger = logging.getLogger("BACMET_Pipeline")
     try:
-        logger = logging.getLogger("BACMET_Pipeline")
-
         logger.info("=" * 50)
         logger.info("开始 BacMet 分析流程")
-        logger.info(f"工作目录: {BACMET_DIR}")
-        input_path = str(BACMET_FILES["input"])
-        df = pd.read_excel(input_path)
-        logging.info(f"读取文件: {input_path}")
-        logging.debug(f"数据形状: {df.shape}")
-        logging.info("=" * 50)
-
-        # 删除以下日志配置代码：
-        # setup_logging()
-        # logging.basicConfig(...)
-
-        # 1. 数据预处理
-        logging.info("步骤1: 执行BacMet数据预处理...")
-        preprocess.preprocess_bacmet(
-            input_path=BACMET_FILES["input"],
-            bacmet_mapping_file=BACMET_FILES["mapping"],
-            output_path = BACMET_DIR / "BacMet_mapped.xlsx"
-        )
+        logger.info(f"工作目录: {work_dir}")
+        logger.info(f"输入文件: {files['input']}")
+        if preflight:
+            # 只读取表头检查输入，有误时立即失败
+            check_inputs("BacMet", files, reads_path, reads_16s_path, steps)
+        logger.info("=" * 50)
 
-        # 2. RPKM计算
-        logging.info("步骤2: 执行RPKM标准化计算...")
-        rpkm.process_sarg_data(
-            file_path=BACMET_FILES["output"].with_name("BacMet_mapped.xlsx"),
-            output_path=BACMET_FILES["output"],
-            reads_path=READS_FILE,
-            reads_16s_path=READS_16S_FILE
+        run_stages(
+            build_bacmet_stages(files, reads_path, reads_16s_path),
+            name="BACMET",
+            cache_path=work_dir / CACHE_FILE_NAME,
+            use_cache=use_cache,
+            dry_run=dry_run,
+            max_workers=max_workers,
+            steps=steps
         )
+        if dry_run:
+            return True
 
-        # 3. 分类汇总
-        logging.info("步骤3: 执行分类汇总操作...")
-
-        # 读取处理后的数据
-        df_rpkm = pd.read_excel(BACMET_FILES["output"], sheet_name='RPKM')
-        df_16s = pd.read_excel(BACMET_FILES["output"], sheet_name='16SRPKM')
-
-        with pd.ExcelWriter(BACMET_FILES["output"], engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            # 化合物分类
-            logging.info("- 化合物分类汇总")
-            compound_rpkm = aggregators.generate_compound_classification(df_rpkm)
-            compound_16s = aggregators.generate_compound_classification(df_16s)
-            compound_rpkm.to_excel(writer, index=False, sheet_name='Compound_RPKM')
-            compound_16s.to_excel(writer, index=False, sheet_name='Compound_16SRPKM')
-
-            # 基因分类
-            logging.info("- 基因分类汇总")
-            gene_rpkm = aggregators.generate_gene_classification(df_rpkm)
-            gene_16s = aggregators.generate_gene_classification(df_16s)
-            gene_rpkm.to_excel(writer, index=False, sheet_name='Gene_RPKM')
-            gene_16s.to_excel(writer, index=False, sheet_name='Gene_16SRPKM')
-
-            # 位置分类
-            logging.info("- 位置分类汇总")
-            location_rpkm = aggregators.generate_location_classification(df_rpkm)
-            location_16s = aggregators.generate_location_classification(df_16s)
-            location_rpkm.to_excel(writer, index=False, sheet_name='Location_RPKM')
-            location_16s.to_excel(writer, index=False, sheet_name='Location_16SRPKM')
-
-            # 生物体分类
-            logging.info("- 生物体分类汇总")
-            organism_rpkm = aggregators.generate_organism_classification(df_rpkm)
-            organism_16s = aggregators.generate_organism_classification(df_16s)
-            organism_rpkm.to_excel(writer, index=False, sheet_name='Organism_RPKM')
-            organism_16s.to_excel(writer, index=False, sheet_name='Organism_16SRPKM')
-
-
-        logging.info("\n" + "=" * 50)
-        logging.info(f"✅ BacMet分析流程完成! 结果保存在: {BACMET_FILES['output']}")
-        logging.info("=" * 50)
-
-    except Exception as e:  # 添加异常处理
+        logger.info("\n" + "=" * 50)
+        logger.info(f"✅ BacMet分析流程完成! 结果保存在: {files['output']}")
+        logger.info("=" * 50)
+        return True
+
+    except Exception as e:
         logger.error(f"❌ 流程执行失败: {str(e)}", exc_info=True)
         return False
 
+
 if __name__ == "__main__":
-    run_bacmet_pipeline()
\ No newline at end of file
+    run_bacmet_pipeline()
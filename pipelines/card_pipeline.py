@@ -4,137 +4,114 @@ CARD 全流程一键执行脚本
 执行顺序：
 1. 原始数据预处理（转置与合并）
 2. RPKM计算（含16S RPKM）
-3. 多种分类汇总（基因家族、类别、类型、机制、ARGs）
+3. 多种分类汇总（ARGs → 基因家族 → 类别 → 机制 逐级汇总，类型由类别展开）
+4. 汇总结果写出
 """
 
 import logging
 from pathlib import Path
-import pandas as pd
 from modules.card import (
     preprocess,
     rpkm,
     aggregators
 )
-from config.default_paths import CARD_DIR, CARD_FILES, READS_FILE, READS_16S_FILE
+from modules.utils import write_sheets
+from config.default_paths import CARD_FILES, READS_FILE, READS_16S_FILE
+from modules.preflight import check_inputs
+from pipelines.runner import Stage, run_stages, CACHE_FILE_NAME
 
 
-def run_card_pipeline():
-    """执行CARD全流程分析"""
-    try:
-        # 使用主流程的日志配置（删除原日志配置代码）
-        logger = logging.getLogger("CARD_Pipeline")
-
-        logger.info("=" * 60)
-        logger.info("开始 CARD 抗性基因分析流程")
-        logger.info(f"工作目录: {CARD_DIR}")
-        logger.info("=" * 60)
-
-        # 删除以下日志文件配置代码：
-        # log_file = CARD_DIR / "card_pipeline.log"
-        # file_handler = logging.FileHandler(log_file)
-        # stream_handler = logging.StreamHandler()
-        # logger.addHandler(file_handler)
-        # logger.addHandler(stream_handler)
-
-        # 确保目录存在
-        CARD_DIR.mkdir(parents=True, exist_ok=True)
-
-        # 配置日志（只在函数内部）
-        logger = logging.getLogger("CARD_Pipeline")
-        logger.setLevel(logging.INFO)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-        # 文件处理器
-        log_file = CARD_DIR / "card_pipeline.log"
-        file_handler = logging.FileHandler(log_file)
-        file_handler.setFormatter(formatter)
-
-        # 控制台处理器
-        stream_handler = logging.StreamHandler()
-        stream_handler.setFormatter(formatter)
-
-        # 清除可能存在的旧处理器
-        if logger.hasHandlers():
-            logger.handlers.clear()
-
-        logger.addHandler(file_handler)
-        logger.addHandler(stream_handler)
-
-        logger.info("=" * 60)
-        logger.info("开始 CARD 抗性基因分析流程")
-        logger.info(f"工作目录: {CARD_DIR}")
-        logger.info("=" * 60)
-
-        # 1. 数据预处理
-        logger.info("\n" + "=" * 60)
-        logger.info("步骤1: 数据预处理")
-        logger.info("=" * 60)
+def build_card_stages(files, reads_path, reads_16s_path):
+    """声明CARD流程的各阶段"""
+    output = files["output"]
+    mapped = Path(output).parent / "CARD_mapped.xlsx"
 
-        logger.info("① 转置原始CARD映射数据...")
+    def run_preprocess(results):
+        logging.info("① 转置原始CARD映射数据...")
         preprocess.process_and_transpose_card_mapping(
-            file_path=CARD_FILES["input"],
-            output_path=CARD_FILES["output"],
+            file_path=files["input"],
+            output_path=mapped,
             sheet_name='CARD_mapping'
         )
-
-        logger.info("② 合并AMR元数据信息...")
+        logging.info("② 合并AMR元数据信息...")
         preprocess.merge_amr_info(
-            card_path=CARD_FILES["output"],
-            amr_meta_path=CARD_FILES["mapping"],
+            card_path=mapped,
+            amr_meta_path=files["mapping"],
             sheet_name='Merged'
         )
+        return True
 
-        # 2. RPKM计算
-        logger.info("\n" + "=" * 60)
-        logger.info("步骤2: RPKM计算")
-        logger.info("=" * 60)
-
-        logger.info("③ 计算RPKM与16S RPKM...")
-        rpkm.process_sarg_data(
-            file_path=CARD_FILES["output"],
-            output_path=CARD_FILES["output"],
-            reads_path=READS_FILE,
-            reads_16s_path=READS_16S_FILE
-        )
-
-        # 3. 分类汇总
-        logger.info("\n" + "=" * 60)
-        logger.info("步骤3: 分类汇总")
-        logger.info("=" * 60)
-
-        logger.info("④ AMR基因家族分类汇总...")
-        aggregators.generate_gene_family_classification(
-            CARD_FILES["output"],
-            CARD_FILES["output"]
-        )
-
-        logger.info("⑤ 抗性类别分类汇总...")
-        aggregators.generate_class_classification(
-            CARD_FILES["output"],
-            CARD_FILES["output"]
+    def run_rpkm(results):
+        logging.info("③ 计算RPKM与16S RPKM...")
+        return rpkm.process_sarg_data(
+            file_path=mapped,
+            output_path=output,
+            reads_path=reads_path,
+            reads_16s_path=reads_16s_path
         )
 
-        logger.info("⑥ Class-Types分类汇总...")
-        aggregators.generate_class_types_classification(
-            CARD_FILES["output"],
-            CARD_FILES["output"],
-            CARD_FILES["types_class"]
-        )
+    def run_export(results):
+        write_sheets(output, results['classify'])
+        logging.info(f"分类汇总已写入: {output}")
+        return True
 
-        logger.info("⑦ 抗性机制分类汇总...")
-        aggregators.generate_mechanism_classification(
-            CARD_FILES["output"],
-            CARD_FILES["output"]
-        )
+    return [
+        Stage('preprocess', run_preprocess, kind='preprocess',
+              inputs=[files["input"], files["mapping"]], outputs=[mapped]),
+        Stage('rpkm', run_rpkm, deps=['preprocess'], kind='rpkm',
+              inputs=[reads_path, reads_16s_path], outputs=[output]),
+        Stage('classify',
+              lambda r: aggregators.build_card_classifications(output, files["types_class"]),
+              deps=['rpkm'], kind='aggregate', inputs=[files["types_class"]]),
+        Stage('export', run_export, deps=['classify'], kind='export', outputs=[output]),
+    ]
+
+
+def run_card_pipeline(files=None, reads_path=None, reads_16s_path=None,
+                      use_cache=False, dry_run=False, max_workers=None, steps=None,
+                      preflight=True):
+    """执行CARD全流程分析
+
+    参数（均可省略，默认使用 config/default_paths.py 中的配置）：
+        files: 与 CARD_FILES 结构相同的路径字典
+        reads_path / reads_16s_path: reads 与 16S reads 统计文件
+        use_cache: 跳过输入未变化且已完成的阶段
+        dry_run: 仅输出执行计划
+        max_workers: 并行阶段的线程数
+        steps: 只执行所选步骤（preprocess / rpkm / aggregate），默认全部
+        preflight: 执行前只读取表头预检输入（由主入口统一预检时可关闭）
+    """
+    files = files or CARD_FILES
+    reads_path = reads_path or READS_FILE
+    reads_16s_path = reads_16s_path or READS_16S_FILE
+    work_dir = Path(files["output"]).parent
+    logger = logging.getLogger("CARD_Pipeline")
+    try:
+        logger.info("=" * 60)
+        logger.info("开始 CARD 抗性基因分析流程")
+        logger.info(f"工作目录: {work_dir}")
+        if preflight:
+            # 只读取表头检查输入，有误时立即失败
+            check_inputs("CARD", files, reads_path, reads_16s_path, steps)
+        logger.info("=" * 60)
 
-        logger.info("⑧ ARGs分类汇总(含高频ARGs筛选)...")
-        aggregators.generate_arg_classification(
-            CARD_FILES["output"],
-            CARD_FILES["output"]
+        # 确保目录存在
+        work_dir.mkdir(parents=True, exist_ok=True)
+
+        run_stages(
+            build_card_stages(files, reads_path, reads_16s_path),
+            name="CARD",
+            cache_path=work_dir / CACHE_FILE_NAME,
+            use_cache=use_cache,
+            dry_run=dry_run,
+            max_workers=max_workers,
+            steps=steps
         )
+        if dry_run:
+            return True
 
         logger.info("\n" + "=" * 60)
-        logger.info(f"[完成] CARD分析流程成功完成! 结果文件: {CARD_FILES['output']}")
+        logger.info(f"[完成] CARD分析流程成功完成! 结果文件: {files['output']}")
         logger.info("=" * 60)
         return True
 
@@ -144,4 +121,4 @@ def run_card_pipeline():
 
 
 if __name__ == "__main__":
-    run_card_pipeline()
\ No newline at end of file
+    run_card_pipeline()
@@ -0,0 +1,78 @@
+"""
+增量添加样本脚本
+执行顺序：
+1. 仅对新批次原始数据运行对应数据库流程（输出至 incremental/ 暂存目录）
+2. 将新批次的标准化矩阵与分类汇总合并至已有结果文件
+"""
+
+import logging
+from datetime import datetime
+from pathlib import Path
+from config.default_paths import (
+    CARD_FILES, SARG_FILES, VICTORS_FILES, BACMET_FILES, MGE_FILES
+)
+from modules.incremental import merge_sample_batch
+from .card_pipeline import run_card_pipeline
+from .sarg_pipeline import run_sarg_pipeline
+from .victors_pipeline import run_victors_pipeline
+from .bacmet_pipeline import run_bacmet_pipeline
+from .mge_pipeline import run_mge_pipeline
+
+PIPELINES = {
+    'CARD': (run_card_pipeline, CARD_FILES),
+    'SARG': (run_sarg_pipeline, SARG_FILES),
+    'Victors': (run_victors_pipeline, VICTORS_FILES),
+    'BacMet': (run_bacmet_pipeline, BACMET_FILES),
+    'MGE': (run_mge_pipeline, MGE_FILES),
+}
+
+
+def add_samples(database, batch_input, reads_path=None, reads_16s_path=None, files=None):
+    """向已有结果中追加新批次样本
+
+    参数：
+        database: 数据库名（CARD / SARG / Victors / BacMet / MGE）
+        batch_input: 仅包含新样本的原始数据文件（格式与常规输入相同）
+        reads_path / reads_16s_path: reads 统计文件（可包含全部样本）
+        files: 数据库路径字典（默认使用配置）
+    """
+    logger = logging.getLogger("Incremental")
+    if database not in PIPELINES:
+        raise ValueError(f"未知数据库: {database}，可选: {', '.join(PIPELINES)}")
+
+    run_pipeline, default_files = PIPELINES[database]
+    files = files or default_files
+    output_path = Path(files["output"])
+    if not output_path.exists():
+        raise FileNotFoundError(f"已有结果文件不存在，请先完整运行流程: {output_path}")
+
+    # 新批次单独运行，结果写入暂存目录
+    staging_dir = output_path.parent / "incremental" / datetime.now().strftime('%Y%m%d-%H%M%S')
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    batch_files = dict(files)
+    batch_files["input"] = Path(batch_input)
+    batch_files["output"] = staging_dir / output_path.name
+
+    logger.info("=" * 60)
+    logger.info(f"增量添加样本: {database}")
+    logger.info(f"新批次输入: {batch_input}")
+    logger.info(f"暂存目录: {staging_dir}")
+    logger.info("=" * 60)
+
+    if run_pipeline(files=batch_files, reads_path=reads_path, reads_16s_path=reads_16s_path) is False:
+        raise RuntimeError(f"{database} 新批次流程执行失败")
+
+    merge_sample_batch(database, output_path, batch_files["output"])
+    logger.info(f"✅ {database} 增量添加完成! 结果保存在: {output_path}")
+    return True
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("用法: python -m pipelines.incremental <数据库> <新批次原始文件>"
+              "（推荐使用 python main.py add-samples，可指定 --root 并写入日志）")
+        sys.exit(1)
+
+    add_samples(sys.argv[1], sys.argv[2])
@@ -3,69 +3,96 @@ MGE 全流程一键执行脚本
 执行顺序：
 1. 原始数据处理与RPKM计算
 2. 按基因(Genes)分类汇总
+3. 汇总结果写出
 """
 
+import logging
 from pathlib import Path
 
-import pandas as pd
-
-from config.default_paths import MGE_DIR, MGE_FILES, READS_FILE, READS_16S_FILE
+from config.default_paths import MGE_FILES, READS_FILE, READS_16S_FILE
 from modules.mge import rpkm, aggregators
-from modules.utils import setup_logging
-import logging
+from modules.utils import write_sheets
+from modules.preflight import check_inputs
+from pipelines.runner import Stage, run_stages, CACHE_FILE_NAME
 
 
-def run_mge_pipeline():
-    """执行MGE全流程"""
-    try:
-        logger = logging.getLogger("MGE_Pipeline")
+def build_mge_stages(files, reads_path, reads_16s_path):
+    """声明MGE流程的各阶段"""
+    output = files["output"]
 
-        logger.info("=" * 50)
-        logger.info("开始 MGE 全流程处理")
-        logger.info(f"工作目录: {MGE_DIR}")
-        input_path = str(MGE_FILES["input"])
-        df = pd.read_excel(input_path)
-        logger.info(f"读取文件: {input_path}")
-        logger.debug(f"数据形状: {df.shape}")
-        logging.info("=" * 50)
-
-        # 1. 数据处理与RPKM计算
-        logger.info("检查必需文件是否存在...")
-        required_files = [
-            MGE_FILES["input"],
-            MGE_FILES["search"],
-            READS_FILE,
-            READS_16S_FILE
-        ]
-        for f in required_files:
-            if not f.exists():
-                logger.error(f"❌ 文件不存在: {f}")
-                return False
-
-        logger.info("已找到所有必需文件")
-
-        # 增强数据处理流程
-        logger.info("步骤1: 处理原始MGE数据并计算RPKM...")
+    def run_rpkm(results):
+        logging.info("步骤1: 处理原始MGE数据并计算RPKM...")
         rpkm.process_mge_data(
-            input_file=MGE_FILES["input"],
-            output_file=MGE_FILES["output"],
-            search_file=MGE_FILES["search"],
-            reads_path=READS_FILE,
-            reads_16s_path=READS_16S_FILE
+            input_file=files["input"],
+            output_file=output,
+            search_file=files["search"],
+            reads_path=reads_path,
+            reads_16s_path=reads_16s_path
         )
+        return True
+
+    def run_export(results):
+        write_sheets(output, results['gene'])
+        logging.info(f"分类汇总已写入: {output}")
+        return True
+
+    return [
+        Stage('rpkm', run_rpkm, kind='rpkm',
+              inputs=[files["input"], files["search"], reads_path, reads_16s_path],
+              outputs=[output]),
+        Stage('gene', lambda r: aggregators.build_gene_classification(output),
+              deps=['rpkm'], kind='aggregate'),
+        Stage('export', run_export, deps=['gene'], kind='export', outputs=[output]),
+    ]
+
+
+def run_mge_pipeline(files=None, reads_path=None, reads_16s_path=None,
+                     use_cache=False, dry_run=False, max_workers=None, steps=None,
+                     preflight=True):
+    """执行MGE全流程
+
+    参数（均可省略，默认使用 config/default_paths.py 中的配置）：
+        files: 与 MGE_FILES 结构相同的路径字典
+        reads_path / reads_16s_path: reads 与 16S reads 统计文件
+        use_cache: 跳过输入未变化且已完成的阶段
+        dry_run: 仅输出执行计划
+        max_workers: 并行阶段的线程数
+        steps: 只执行所选步骤（preprocess / rpkm / aggregate），默认全部
+        preflight: 执行前只读取表头预检输入（由主入口统一预检时可关闭）
+    """
+    files = files or MGE_FILES
+    reads_path = reads_path or READS_FILE
+    reads_16s_path = reads_16s_path or READS_16S_FILE
+    work_dir = Path(files["output"]).parent
+    logger = logging.getLogger("MGE_Pipeline")
+    try:
+        logger.info("=" * 50)
+        logger.info("开始 MGE 全流程处理")
+        logger.info(f"工作目录: {work_dir}")
+        logger.info(f"输入文件: {files['input']}")
+        if preflight:
+            # 只读取表头检查输入，有误时立即失败
+            check_inputs("MGE", files, reads_path, reads_16s_path, steps)
+        logger.info("=" * 50)
 
-        # 2. 基因分类汇总
-        logger.info("步骤2: 按基因(Genes)分类汇总...")
-        aggregators.generate_gene_classification(
-            input_path=MGE_FILES["output"],
-            output_path=MGE_FILES["output"]
+        run_stages(
+            build_mge_stages(files, reads_path, reads_16s_path),
+            name="MGE",
+            cache_path=work_dir / CACHE_FILE_NAME,
+            use_cache=use_cache,
+            dry_run=dry_run,
+            max_workers=max_workers,
+            steps=steps
         )
+        if dry_run:
+            return True
 
-        logger.info("\n" + "=" * 50)  # 修改为logger
-        logger.info(f"✅ MGE全流程完成! 结果保存在: {MGE_FILES['output']}")  # 修改为logger
-        logger.info("=" * 50)  # 修改为logger
+        logger.info("\n" + "=" * 50)
+        logger.info(f"✅ MGE全流程完成! 结果保存在: {files['output']}")
+        logger.info("=" * 50)
+        return True
 
-    except Exception as e:  # 添加异常处理
+    except Exception as e:
         logger.error(f"❌ 流程执行失败: {str(e)}", exc_info=True)
         return False
 
@@ -76,4 +103,4 @@ def calculate_rpkm(df, reads_data, length_col):
 
 
 if __name__ == "__main__":
-    run_mge_pipeline()
\ No newline at end of file
+    run_mge_pipeline()
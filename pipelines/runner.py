@@ -0,0 +1,318 @@
+"""
+流程阶段调度器
+包含：
+- 声明式阶段定义（依赖、输入文件、输出文件）
+- 按依赖拓扑分层，并发执行互不依赖的阶段（线程池）
+- 基于输入文件指纹的阶段缓存（阶段输出文件原子写入，作为检查点，可从第一个未完成的阶段继续）
+- 阶段失败重试
+- dry-run 执行计划
+- 阶段与流程进度事件（modules.progress）
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from modules.progress import Progress, stage_context
+
+# 阶段定义变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+CACHE_FILE_NAME = ".stage_cache.json"
+
+STAGE_KINDS = ('preprocess', 'rpkm', 'aggregate', 'export')
+
+# 命令行可选择的步骤；汇总结果只保存在内存中，写出(export)归入 aggregate 步骤
+STAGE_STEPS = ('preprocess', 'rpkm', 'aggregate')
+
+
+def step_range(start=None, end=None):
+    """将 --from/--to 转换为步骤集合（均为 None 时返回 None，表示全部）"""
+    if start is None and end is None:
+        return None
+    first = STAGE_STEPS.index(start) if start else 0
+    last = STAGE_STEPS.index(end) if end else len(STAGE_STEPS) - 1
+    if first > last:
+        raise ValueError(f"起始步骤 {start} 位于结束步骤 {end} 之后")
+    return set(STAGE_STEPS[first:last + 1])
+
+
+class Stage:
+    """流程阶段
+
+    参数：
+        name: 阶段名（同一流程内唯一）
+        func: 执行函数，接收 {已完成阶段名: 返回值} 字典
+        deps: 依赖的阶段名
+        inputs: 外部输入文件（参与缓存指纹计算）
+        outputs: 输出文件；有输出文件的阶段通过文件向下游传递结果，可被缓存跳过，
+                 无输出文件的阶段只在内存中返回结果，在下游需要时执行
+        kind: 阶段类型 preprocess / rpkm / aggregate / export
+        retries: 失败后的重试次数
+    """
+
+    def __init__(self, name, func, deps=(), inputs=(), outputs=(), kind=None, retries=0):
+        if kind is not None and kind not in STAGE_KINDS:
+            raise ValueError(f"未知阶段类型: {kind}")
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.inputs = tuple(Path(p) for p in inputs)
+        self.outputs = tuple(Path(p) for p in outputs)
+        self.kind = kind
+        self.retries = retries
+
+    @property
+    def step(self):
+        return 'aggregate' if self.kind == 'export' else self.kind
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, deps={list(self.deps)})"
+
+
+def plan_layers(stages):
+    """按依赖关系拓扑分层，同一层内的阶段互不依赖"""
+    by_name = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"阶段名重复: {stage.name}")
+        by_name[stage.name] = stage
+
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"阶段 {stage.name} 依赖未定义的阶段: {dep}")
+
+    done = set()
+    layers = []
+    remaining = [stage.name for stage in stages]
+    while remaining:
+        layer = [name for name in remaining if all(dep in done for dep in by_name[name].deps)]
+        if not layer:
+            raise ValueError(f"阶段依赖存在循环: {remaining}")
+        layers.append(layer)
+        done.update(layer)
+        remaining = [name for name in remaining if name not in done]
+    return layers
+
+
+def _fingerprint(path):
+    path = Path(path)
+    if not path.exists():
+        return f"{path}:missing"
+    stat = path.stat()
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def compute_keys(stages, layers):
+    """计算各阶段的缓存键（自身输入指纹 + 上游阶段键）"""
+    by_name = {stage.name: stage for stage in stages}
+    keys = {}
+    for layer in layers:
+        for name in layer:
+            stage = by_name[name]
+            payload = json.dumps([
+                CACHE_VERSION,
+                name,
+                sorted(_fingerprint(p) for p in stage.inputs),
+                [keys[dep] for dep in stage.deps],
+            ])
+            keys[name] = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return keys
+
+
+def load_cache(cache_path):
+    if cache_path is None or not Path(cache_path).exists():
+        return {}
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        logging.warning(f"阶段缓存文件损坏，忽略: {cache_path}")
+        return {}
+
+
+def save_cache(cache_path, manifest):
+    """原子写入缓存清单（先写临时文件再替换）"""
+    if cache_path is None:
+        return
+    cache_path = Path(cache_path)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, cache_path)
+
+
+def select_stages(stages, layers, keys, manifest, use_cache, steps=None):
+    """确定需要执行的阶段
+
+    有输出文件的阶段：缓存未命中，或任一上游阶段需要重跑时执行；
+    仅内存结果的阶段：当任一下游阶段需要执行时执行；
+    指定 steps 时，只执行所选步骤内的阶段。
+    """
+    by_name = {stage.name: stage for stage in stages}
+    order = [name for layer in layers for name in layer]
+
+    fresh = set()
+    if use_cache:
+        for name in order:
+            stage = by_name[name]
+            if stage.outputs and manifest.get(name) == keys[name] \
+                    and all(p.exists() for p in stage.outputs):
+                fresh.add(name)
+
+        dirty = set()
+        for name in order:
+            stage = by_name[name]
+            if stage.outputs and name not in fresh:
+                dirty.add(name)
+            elif any(dep in dirty for dep in stage.deps):
+                dirty.add(name)
+        to_run = set(dirty)
+    else:
+        to_run = set(order)
+
+    if steps is not None:
+        to_run = {name for name in to_run if by_name[name].step in steps}
+
+    dependents = {name: [s.name for s in stages if name in s.deps] for name in order}
+    for name in reversed(order):
+        if not by_name[name].outputs and any(d in to_run for d in dependents[name]):
+            to_run.add(name)
+
+    return to_run, fresh
+
+
+def format_plan(stages, layers, to_run, fresh, steps=None):
+    """生成可读的执行计划"""
+    by_name = {stage.name: stage for stage in stages}
+    lines = []
+    for i, layer in enumerate(layers, 1):
+        parallel = "（并行）" if len(layer) > 1 else ""
+        lines.append(f"[第{i}层]{parallel}")
+        for name in layer:
+            stage = by_name[name]
+            if name in to_run:
+                state = "执行"
+            elif name in fresh:
+                state = "缓存命中，跳过"
+            elif steps is not None and stage.step not in steps:
+                state = "未选择"
+            else:
+                state = "无需执行"
+            inputs = ", ".join(p.name for p in stage.inputs) or "-"
+            outputs = ", ".join(p.name for p in stage.outputs) or "内存"
+            lines.append(f"  - {name} [{stage.kind or '-'}] 输入: {inputs} -> 输出: {outputs} ({state})")
+    return lines
+
+
+def _run_with_retries(stage, results, logger, pipeline=None):
+    attempt = 0
+    while True:
+        try:
+            start = time.perf_counter()
+            # 阶段内触发的进度事件带上流程与阶段名
+            with stage_context(pipeline, stage.name):
+                value = stage.func(results)
+            logger.info(f"阶段完成: {stage.name} ({time.perf_counter() - start:.1f}s)")
+            return value
+        except Exception as e:
+            if attempt >= stage.retries:
+                raise
+            attempt += 1
+            logger.warning(f"阶段 {stage.name} 失败，第 {attempt}/{stage.retries} 次重试: {str(e)}")
+            time.sleep(min(2 ** attempt, 30))
+
+
+def run_stages(stages, name, cache_path=None, use_cache=False, dry_run=False, max_workers=None,
+               steps=None):
+    """按依赖关系执行阶段
+
+    参数：
+        stages: Stage 列表
+        name: 流程名（用于日志）
+        cache_path: 阶段缓存清单路径（记录已完成阶段的缓存键）
+        use_cache: 是否跳过缓存命中的阶段
+        dry_run: 仅输出执行计划，不执行
+        max_workers: 并发线程数（默认 min(4, CPU数)）
+        steps: 只执行所选步骤（见 STAGE_STEPS / step_range），上游步骤使用已有结果文件
+    返回：
+        {阶段名: 返回值}；dry_run 时返回执行计划文本行
+    """
+    logger = logging.getLogger(f"{name}_Pipeline")
+    by_name = {stage.name: stage for stage in stages}
+    layers = plan_layers(stages)
+    keys = compute_keys(stages, layers)
+    manifest = load_cache(cache_path)
+    to_run, fresh = select_stages(stages, layers, keys, manifest, use_cache, steps)
+
+    # 未执行的上游阶段需要已有结果文件
+    missing = sorted({
+        str(path)
+        for n in to_run for dep in by_name[n].deps if dep not in to_run
+        for path in by_name[dep].outputs if not path.exists()
+    })
+
+    plan = format_plan(stages, layers, to_run, fresh, steps)
+    if dry_run:
+        logger.info(f"{name} 执行计划:")
+        for line in plan:
+            logger.info(line)
+        if missing:
+            logger.warning(f"缺少上游结果文件: {', '.join(missing)}")
+        return plan
+
+    if missing:
+        raise FileNotFoundError(f"缺少上游结果文件，请先执行对应步骤: {', '.join(missing)}")
+
+    max_workers = max_workers or min(4, os.cpu_count() or 1)
+    results = {}
+    pending = [n for layer in layers for n in layer if n in to_run]
+    skipped = [n for layer in layers for n in layer if n not in to_run]
+    finished = set(skipped)
+    for n in skipped:
+        results[n] = None
+        if n in fresh:
+            logger.info(f"阶段缓存命中，跳过: {n}")
+    if fresh and pending:
+        logger.info(f"从阶段 {pending[0]} 继续（已完成: {', '.join(n for n in skipped if n in fresh)}）")
+
+    # 流程整体进度：按已完成阶段数估计剩余时间（每个阶段完成都发出事件）
+    progress = Progress('stage', f"{name} 流程", total=len(pending), unit='阶段', interval=0)
+    progress.pipeline = name
+    progress.start()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while pending or running:
+            ready = [n for n in pending if all(dep in finished for dep in by_name[n].deps)]
+            for n in ready:
+                pending.remove(n)
+                # 开始执行前清除旧记录，避免中断后被误判为已完成
+                if manifest.pop(n, None) is not None:
+                    save_cache(cache_path, manifest)
+                logger.info(f"阶段开始: {n}")
+                running[executor.submit(_run_with_retries, by_name[n], results, logger, name)] = n
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                n = running.pop(future)
+                try:
+                    results[n] = future.result()
+                except Exception as e:
+                    logger.error(f"阶段失败: {n}: {str(e)}")
+                    for other in running:
+                        other.cancel()
+                    progress.finish('failed')
+                    raise
+                finished.add(n)
+                progress.advance()
+                if by_name[n].outputs:
+                    manifest[n] = keys[n]
+                    save_cache(cache_path, manifest)
+
+    progress.finish()
+    return results
@@ -1,75 +1,120 @@
 """
 SARG 全流程一键执行脚本
+执行顺序：
+1. RPKM计算（含16S RPKM）
+2. 添加风险等级
+3. 分类汇总（基因 → 类型 逐级汇总，风险等级并行计算）
+4. 汇总结果写出
 """
 
+import logging
 from pathlib import Path
 
-import pandas as pd
-from config.default_paths import SARG_DIR, SARG_FILES, READS_FILE, READS_16S_FILE
+from config.default_paths import SARG_FILES, READS_FILE, READS_16S_FILE
 from modules.sarg import (
     process_sarg_data,
     add_risk_rank,
-    generate_types_classification,
-    generate_gene_classification,
-    generate_rank_classification
+    build_sarg_classifications,
+    build_rank_classification
 )
-from modules.utils import setup_logging
-import logging
+from modules.utils import write_sheets
+from modules.preflight import check_inputs
+from pipelines.runner import Stage, run_stages, CACHE_FILE_NAME
+
+
+def build_sarg_stages(files, reads_path, reads_16s_path):
+    """声明SARG流程的各阶段"""
+    output = files["output"]
+
+    def run_rpkm(results):
+        logging.info("① 计算 RPKM 与 16S RPKM ...")
+        return process_sarg_data(
+            file_path=files["input"],
+            output_path=output,
+            reads_path=reads_path,
+            reads_16s_path=reads_16s_path
+        )
+
+    def run_risk_rank(results):
+        logging.info("② 添加 ARGs 风险等级(Rank)...")
+        return add_risk_rank(
+            risk_file=files["risk"],
+            target_file=output
+        )
 
+    def run_export(results):
+        sheets = {}
+        for name in ['classify', 'rank']:
+            sheets.update(results[name])
+        write_sheets(output, sheets)
+        logging.info(f"分类汇总已写入: {output}")
+        return True
 
-def run_sarg_pipeline():
-    """执行SARG全流程"""
+    return [
+        Stage('rpkm', run_rpkm, kind='rpkm',
+              inputs=[files["input"], reads_path, reads_16s_path], outputs=[output]),
+        Stage('risk_rank', run_risk_rank, deps=['rpkm'], kind='rpkm',
+              inputs=[files["risk"]], outputs=[output]),
+        Stage('classify', lambda r: build_sarg_classifications(output),
+              deps=['risk_rank'], kind='aggregate'),
+        Stage('rank', lambda r: build_rank_classification(output),
+              deps=['risk_rank'], kind='aggregate'),
+        Stage('export', run_export, deps=['classify', 'rank'], kind='export',
+              outputs=[output]),
+    ]
+
+
+def run_sarg_pipeline(files=None, reads_path=None, reads_16s_path=None,
+                      use_cache=False, dry_run=False, max_workers=None, steps=None,
+                      preflight=True):
+    """执行SARG全流程
+
+    参数（均可省略，默认使用 config/default_paths.py 中的配置）：
+        files: 与 SARG_FILES 结构相同的路径字典
+        reads_path / reads_16s_path: reads 与 16S reads 统计文件
+        use_cache: 跳过输入未变化且已完成的阶段
+        dry_run: 仅输出执行计划
+        max_workers: 并行阶段的线程数
+        steps: 只执行所选步骤（preprocess / rpkm / aggregate），默认全部
+        preflight: 执行前只读取表头预检输入（由主入口统一预检时可关闭）
+    """
+    files = files or SARG_FILES
+    reads_path = reads_path or READS_FILE
+    reads_16s_path = reads_16s_path or READS_16S_FILE
+    work_dir = Path(files["output"]).parent
     # 使用主流程的日志配置
     logger = logging.getLogger("SARG_Pipeline")
+    try:
+        logger.info("=" * 60)
+        logger.info("开始 SARG 全流程处理")
+        logger.info(f"工作目录: {work_dir}")
+        logger.info(f"输入文件: {files['input']}")
+        if preflight:
+            # 只读取表头检查输入，有误时立即失败
+            check_inputs("SARG", files, reads_path, reads_16s_path, steps)
+        logger.info("=" * 60)
+
+        run_stages(
+            build_sarg_stages(files, reads_path, reads_16s_path),
+            name="SARG",
+            cache_path=work_dir / CACHE_FILE_NAME,
+            use_cache=use_cache,
+            dry_run=dry_run,
+            max_workers=max_workers,
+            steps=steps
+        )
+        if dry_run:
+            return True
+
+        logger.info("\n" + "=" * 60)
+        logger.info(f"✅ SARG全流程完成! 结果保存在: {files['output']}")
+        logger.info("=" * 60)
+        return True
 
-    logger.info("=" * 60)
-    logger.info("开始 SARG 全流程处理")
-    logger.info(f"工作目录: {SARG_DIR}")
-    input_path = str(SARG_FILES["input"])  # 添加这行定义input_path
-    df = pd.read_excel(input_path)  # 添加这行读取数据并定义df
-    logging.info(f"读取文件: {input_path}")
-    logging.debug(f"数据形状: {df.shape}")
-    logging.info("=" * 60)
-
-    # 1. RPKM计算
-    logging.info("① 计算 RPKM 与 16S RPKM ...")
-    process_sarg_data(
-        file_path=SARG_FILES["input"],
-        output_path=SARG_FILES["output"],
-        reads_path=READS_FILE,
-        reads_16s_path=READS_16S_FILE
-    )
-
-    # 2. 添加风险等级
-    logging.info("② 添加 ARGs 风险等级(Rank)...")
-    add_risk_rank(
-        risk_file=SARG_FILES["risk"],
-        target_file=SARG_FILES["output"]
-    )
-
-    # 3. 分类汇总
-    logging.info("③ 汇总 ARGs 类型(Types)...")
-    generate_types_classification(
-        SARG_FILES["output"],
-        SARG_FILES["output"]
-    )
-
-    logging.info("④ 汇总 ARGs 基因(Gene)...")
-    generate_gene_classification(
-        SARG_FILES["output"],
-        SARG_FILES["output"]
-    )
-
-    logging.info("⑤ 汇总 风险等级(Rank)...")
-    generate_rank_classification(
-        SARG_FILES["output"],
-        SARG_FILES["output"]
-    )
-
-    logging.info("\n" + "=" * 60)
-    logging.info(f"✅ SARG全流程完成! 结果保存在: {SARG_FILES['output']}")
-    logging.info("=" * 60)
+    except Exception as e:
+        logger.error(f"❌ 流程执行失败: {str(e)}", exc_info=True)
+        return False
 
 
 if __name__ == "__main__":
-    run_sarg_pipeline()
\ No newline at end of file
+    run_sarg_pipeline()
@@ -0,0 +1,185 @@
+"""
+样本分片（map-reduce）执行脚本
+执行顺序：
+1. split: 按样本轴把原始计数表流式拆分为若干分片，每个分片带有本分片样本的 reads / 16S reads 统计
+2. work: 各分片独立运行常规流程（摄取、RPKM、分类汇总），输出至各自的分片目录；
+   可在本机多个进程中运行，也可在共享同一目录的多台主机上分别运行（各自认领尚未完成的分片）
+3. reduce: 拼接各分片的标准化矩阵与分类汇总表（分组求和对样本可加），写出常规结果文件
+
+分片目录默认位于结果文件旁的 shards/，可用配置 SHARD_DIR 指向多台主机共享的位置。
+"""
+
+import logging
+from pathlib import Path
+from modules import shards
+from .incremental import PIPELINES
+
+# 分片目录中的 reads 统计文件名
+READS_NAME = "reads_number.txt"
+READS_16S_NAME = "16S_reads_number.txt"
+
+
+def shard_root(database, files):
+    """数据库的分片目录（配置 SHARD_DIR 未设置时位于结果文件旁的 shards/）"""
+    from config.default_paths import SHARD_DIR
+    if SHARD_DIR:
+        return Path(SHARD_DIR) / database
+    return Path(files["output"]).parent / "shards"
+
+
+def _pipeline(database, files):
+    if database not in PIPELINES:
+        raise ValueError(f"未知数据库: {database}，可选: {', '.join(PIPELINES)}")
+    run_pipeline, default_files = PIPELINES[database]
+    return run_pipeline, files or default_files
+
+
+def _shard_files(files, directory):
+    """分片的路径字典：输入与输出位于分片目录，映射文件等与常规流程相同"""
+    shard_files = dict(files)
+    shard_files["input"] = directory / Path(files["input"]).name
+    shard_files["output"] = directory / Path(files["output"]).name
+    return shard_files
+
+
+def split_database(database, files=None, reads_path=None, reads_16s_path=None, n_shards=None):
+    """拆分一个数据库的原始计数表（清单已存在、分片数相同且原始文件未变化时直接复用）
+
+    返回：
+        ShardManifest
+    """
+    from config.default_paths import READS_FILE, READS_16S_FILE, SHARD_COUNT
+    from modules.preflight import read_header
+    from modules.samples import resolve_columns
+
+    logger = logging.getLogger("Sharded")
+    _, files = _pipeline(database, files)
+    reads_path = reads_path or READS_FILE
+    reads_16s_path = reads_16s_path or READS_16S_FILE
+    n_shards = n_shards or SHARD_COUNT
+    root = shard_root(database, files)
+    source = Path(files["input"])
+    try:
+        header, _ = read_header(source, shards.SOURCE_SHEETS.get(database, 0))
+        samples = resolve_columns(database, header).samples
+        if not samples:
+            raise ValueError(f"原始计数表中没有识别出样本列: {source}")
+        groups = shards.split_samples(samples, n_shards)
+
+        manifest = shards.ShardManifest.load(root)
+        if manifest is not None and manifest.is_current() and manifest.shards == groups:
+            logger.info(f"{database}: 复用已有分片清单（{len(manifest)} 个分片）: {root}")
+            return manifest
+
+        logger.info(f"{database}: {len(samples)} 个样本拆分为 {len(groups)} 个分片: {root}")
+        directories = [shards.shard_dir(root, index) for index in range(len(groups))]
+        for directory in directories:
+            directory.mkdir(parents=True, exist_ok=True)
+            # 重新拆分后之前的完成标记失效
+            shards.release(directory)
+            (directory / shards.DONE_NAME).unlink(missing_ok=True)
+        shards.split_table(database, source, [directory / source.name for directory in directories], groups)
+        for directory, group in zip(directories, groups):
+            shards.write_reads_subset(reads_path, directory / READS_NAME, group)
+            shards.write_reads_subset(reads_16s_path, directory / READS_16S_NAME, group, is_16s=True)
+
+        manifest = shards.ShardManifest(database, source, shards.fingerprint(source), groups)
+        manifest.save(root)
+        return manifest
+    except Exception as e:
+        logger.error(f"{database} 分片拆分失败: {str(e)}")
+        raise
+
+
+def _load_manifest(database, files):
+    root = shard_root(database, files)
+    manifest = shards.ShardManifest.load(root)
+    if manifest is None:
+        raise FileNotFoundError(f"{database} 尚未拆分分片，请先运行 split: {root}")
+    if not manifest.is_current():
+        logging.warning(f"{database}: 原始计数表在拆分后已变化，分片结果可能已过期（重新运行 split 以更新）")
+    return root, manifest
+
+
+def run_shard(database, index, files=None, use_cache=True):
+    """运行一个分片的常规流程（不检查认领，可用于重跑指定分片）"""
+    run_pipeline, files = _pipeline(database, files)
+    root, _ = _load_manifest(database, files)
+    directory = shards.shard_dir(root, index)
+    logging.getLogger("Sharded").info(f"{database} 分片 {index}: {directory}")
+    return run_pipeline(
+        files=_shard_files(files, directory),
+        reads_path=directory / READS_NAME,
+        reads_16s_path=directory / READS_16S_NAME,
+        use_cache=use_cache,
+    ) is not False
+
+
+def _work_shard(database, index, files):
+    """认领并运行一个分片：返回 True/False（成功/失败），已完成或被其他进程认领时返回 None"""
+    root = shard_root(database, files)
+    directory = shards.shard_dir(root, index)
+    if not shards.claim(directory):
+        return None
+    ok = False
+    try:
+        ok = run_shard(database, index, files)
+    except Exception as e:
+        logging.error(f"{database} 分片 {index} 执行失败: {str(e)}")
+    finally:
+        shards.release(directory, done=ok)
+    return ok
+
+
+def work(database, files=None, workers=1):
+    """认领并运行尚未完成的分片（本机 workers 个进程并行；多台主机可同时运行）
+
+    返回：
+        (本次完成的分片序号, 失败的分片序号)
+    """
+    _, files = _pipeline(database, files)
+    _, manifest = _load_manifest(database, files)
+    pending = list(range(len(manifest)))
+    if workers > 1 and len(pending) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        from modules.utils import worker_logging, log_queue
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending)), initializer=worker_logging,
+                                 initargs=(log_queue(),)) as pool:
+            results = list(pool.map(_work_shard, [database] * len(pending), pending, [files] * len(pending)))
+    else:
+        results = [_work_shard(database, index, files) for index in pending]
+    done = [index for index, ok in zip(pending, results) if ok]
+    failed = [index for index, ok in zip(pending, results) if ok is False]
+    return done, failed
+
+
+def reduce_shards(database, files=None):
+    """归并全部已完成分片的结果，写出常规结果文件"""
+    from modules.incremental import reduce_workbooks
+
+    _, files = _pipeline(database, files)
+    root, manifest = _load_manifest(database, files)
+    directories = [shards.shard_dir(root, index) for index in range(len(manifest))]
+    missing = [index for index, directory in enumerate(directories) if not shards.is_done(directory)]
+    if missing:
+        raise RuntimeError(f"{database} 以下分片尚未完成，无法归并: {', '.join(map(str, missing))}")
+    output_name = Path(files["output"]).name
+    return reduce_workbooks(database, [directory / output_name for directory in directories], files["output"])
+
+
+def run_sharded(database, n_shards=None, workers=1, files=None, reads_path=None, reads_16s_path=None):
+    """在本机按分片执行一个数据库的完整流程：拆分 → 各分片并行计算 → 归并"""
+    logger = logging.getLogger("Sharded")
+    _, files = _pipeline(database, files)
+    logger.info("=" * 60)
+    logger.info(f"样本分片执行: {database}")
+    logger.info("=" * 60)
+
+    split_database(database, files, reads_path, reads_16s_path, n_shards)
+    _, failed = work(database, files, workers)
+    if failed:
+        raise RuntimeError(f"{database} 以下分片执行失败: {', '.join(map(str, failed))}")
+    output = reduce_shards(database, files)
+    logger.info(f"✅ {database} 分片执行完成! 结果保存在: {output}")
+    return True
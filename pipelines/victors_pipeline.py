@@ -2,68 +2,103 @@
 Victors 全流程一键执行脚本
 执行顺序：
 1. 原始数据处理与RPKM计算
-2. 按病原体(Pathogen)分类汇总
-3. 按病原体属(Genus)分类汇总
+2. 读取RPKM结果并逐级汇总一次（病原体属由病原体汇总再聚合得到）
+3. 由汇总结果生成病原体(Pathogen)与病原体属(Genus)分类表（并行计算）
+4. 汇总结果写出
 """
 
+import logging
 from pathlib import Path
 
-import pandas as pd
-
-from config.default_paths import VICTORS_DIR, VICTORS_FILES, READS_FILE, READS_16S_FILE
+from config.default_paths import VICTORS_FILES, READS_FILE, READS_16S_FILE
 from modules.victors import rpkm, aggregators
-from modules.utils import setup_logging
-import logging
-
-
-def run_victors_pipeline():
-    """执行Victors全流程分析"""
-    try:
-        logger = logging.getLogger("VICTORS_Pipeline")
+from modules.utils import write_sheets
+from modules.preflight import check_inputs
+from pipelines.runner import Stage, run_stages, CACHE_FILE_NAME
 
-        logger.info("=" * 60)
-        logger.info("开始 Victors 全流程处理")
-        logger.info(f"工作目录: {VICTORS_DIR}")
-        input_path = str(VICTORS_FILES["input"])
-        df = pd.read_excel(input_path)
-        logging.info(f"读取文件: {input_path}")
-        logging.debug(f"数据形状: {df.shape}")
-        logging.info("=" * 60)
 
-        # 删除以下日志配置代码：
-        # setup_logging()
-        # logging.basicConfig(...)
+def build_victors_stages(files, reads_path, reads_16s_path):
+    """声明Victors流程的各阶段"""
+    output = files["output"]
 
-        # 1. 处理原始数据并计算RPKM
+    def run_rpkm(results):
         logging.info("步骤1: 处理原始数据并计算RPKM...")
-        rpkm.process_victors_data(
-            input_path=VICTORS_FILES["input"],
-            output_path=VICTORS_FILES["output"],
-            reads_path=READS_FILE,
-            reads_16s_path=READS_16S_FILE
+        return rpkm.process_victors_data(
+            input_path=files["input"],
+            output_path=output,
+            reads_path=reads_path,
+            reads_16s_path=reads_16s_path
         )
 
-        # 2. 按病原体分类汇总
-        logging.info("步骤2: 按病原体(Pathogen)分类汇总...")
-        aggregators.generate_pathogen_classification(
-            input_path=VICTORS_FILES["output"],
-            output_path=VICTORS_FILES["output"]
-        )
+    def run_export(results):
+        write_sheets(output, {**results['pathogen'], **results['genus']})
+        logging.info(f"分类汇总已写入: {output}")
+        return True
+
+    return [
+        Stage('rpkm', run_rpkm, kind='rpkm',
+              inputs=[files["input"], reads_path, reads_16s_path], outputs=[output]),
+        Stage('rollup', lambda r: aggregators.rollup_victors(output),
+              deps=['rpkm'], kind='aggregate'),
+        Stage('pathogen', lambda r: aggregators.build_pathogen_classification(r['rollup']),
+              deps=['rollup'], kind='aggregate'),
+        Stage('genus', lambda r: aggregators.build_genus_classification(r['rollup']),
+              deps=['rollup'], kind='aggregate'),
+        Stage('export', run_export, deps=['pathogen', 'genus'], kind='export',
+              outputs=[output]),
+    ]
 
-        # 3. 按病原体属分类汇总
-        logging.info("步骤3: 按病原体属(Genus)分类汇总...")
-        aggregators.generate_genus_classification(
-            input_path=VICTORS_FILES["output"],
-            output_path=VICTORS_FILES["output"]
+
+def run_victors_pipeline(files=None, reads_path=None, reads_16s_path=None,
+                         use_cache=False, dry_run=False, max_workers=None, steps=None,
+                         preflight=True):
+    """执行Victors全流程分析
+
+    参数（均可省略，默认使用 config/default_paths.py 中的配置）：
+        files: 与 VICTORS_FILES 结构相同的路径字典
+        reads_path / reads_16s_path: reads 与 16S reads 统计文件
+        use_cache: 跳过输入未变化且已完成的阶段
+        dry_run: 仅输出执行计划
+        max_workers: 并行阶段的线程数
+        steps: 只执行所选步骤（preprocess / rpkm / aggregate），默认全部
+        preflight: 执行前只读取表头预检输入（由主入口统一预检时可关闭）
+    """
+    files = files or VICTORS_FILES
+    reads_path = reads_path or READS_FILE
+    reads_16s_path = reads_16s_path or READS_16S_FILE
+    work_dir = Path(files["output"]).parent
+    logger = logging.getLogger("VICTORS_Pipeline")
+    try:
+        logger.info("=" * 60)
+        logger.info("开始 Victors 全流程处理")
+        logger.info(f"工作目录: {work_dir}")
+        logger.info(f"输入文件: {files['input']}")
+        if preflight:
+            # 只读取表头检查输入，有误时立即失败
+            check_inputs("Victors", files, reads_path, reads_16s_path, steps)
+        logger.info("=" * 60)
+
+        run_stages(
+            build_victors_stages(files, reads_path, reads_16s_path),
+            name="VICTORS",
+            cache_path=work_dir / CACHE_FILE_NAME,
+            use_cache=use_cache,
+            dry_run=dry_run,
+            max_workers=max_workers,
+            steps=steps
         )
+        if dry_run:
+            return True
 
-        logging.info("\n" + "=" * 60)
-        logging.info(f"✅ Victors全流程完成! 结果保存在: {VICTORS_FILES['output']}")
-        logging.info("=" * 60)
+        logger.info("\n" + "=" * 60)
+        logger.info(f"✅ Victors全流程完成! 结果保存在: {files['output']}")
+        logger.info("=" * 60)
+        return True
 
-    except Exception as e:  # 添加异常处理
+    except Exception as e:
         logger.error(f"❌ 流程执行失败: {str(e)}", exc_info=True)
         return False
 
+
 if __name__ == "__main__":
-    run_victors_pipeline()
\ No newline at end of file
+    run_victors_pipeline()
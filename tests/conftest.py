@@ -0,0 +1,32 @@
+"""测试公共设置：从项目根目录导入 main / modules / pipelines，提供测试队列的运行结果"""
+
+import sys
+import shutil
+from pathlib import Path
+import pytest
+
+TESTS_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(TESTS_DIR.parent))
+
+COHORT_DIR = TESTS_DIR / "data" / "cohort"
+GOLDEN_DIR = TESTS_DIR / "data" / "golden"
+
+
+@pytest.fixture(scope='session')
+def run_cohort(tmp_path_factory):
+    """按给定配置运行测试队列的全部流程，返回项目目录（同一配置只运行一次）"""
+    from modules import regression
+
+    roots = {}
+
+    def run(overrides=None, runs=1):
+        overrides = dict(overrides or {})
+        key = (tuple(sorted(overrides.items())), runs)
+        if key not in roots:
+            root = tmp_path_factory.mktemp('cohort')
+            shutil.copytree(COHORT_DIR, root, dirs_exist_ok=True)
+            regression.run_cohort(root, overrides, runs)
+            roots[key] = root
+        return roots[key]
+
+    return run
@@ -0,0 +1,129 @@
+"""
+生成回归测试的输入队列与参考结果（golden）
+参考结果由改动前的版本运行得到，而不是当前版本，用于发现当前版本自身引入的结果变化。
+
+用法（在项目根目录执行）：
+  git worktree add ../ara-baseline <改动前的提交>
+  python tests/make_golden.py ../ara-baseline
+
+生成内容：
+  tests/data/cohort/            模拟队列（6 个样本，随机种子 0；CARD 的 Sample6 缺少 _2 端，SARG 的 Sample5 缺少 _1 端）
+  tests/data/golden/sum/        旧版在“双端预先相加”的队列上的结果：SARG/Victors/BacMet 的 _1 端列改为两端之和、删除 _2 端列
+                                （旧版这三个数据库只取 _1 端），对应 MATE_MERGE_POLICY = 'sum'
+  tests/data/golden/first/      旧版在原始队列上的 SARG/Victors/BacMet 结果，对应 MATE_MERGE_POLICY = 'first'
+                                （旧版 CARD 两端相加，不随 first 改变）
+"""
+
+import re
+import sys
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+import pandas as pd
+
+TESTS_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = TESTS_DIR.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+DATA_DIR = TESTS_DIR / "data"
+COHORT_DIR = DATA_DIR / "cohort"
+GOLDEN_DIR = DATA_DIR / "golden"
+
+N_SAMPLES = 6
+SEED = 0
+
+# 双端计数列不完整的样本：{原始文件: 删除的列}
+INCOMPLETE_MATES = {
+    'x_CARD.csv': ['Sample6_2.fastq.gz-CARD.txt'],
+    'x_SARG.csv': ['Sample5_1.fastq.gz-SARG.txt'],
+}
+
+# 各参考结果包含的数据库（旧版 CARD 两端相加，与 first 不对应；MGE 为单列计数，与合并方式无关）
+GOLDEN_DATABASES = {
+    'sum': ('CARD', 'SARG', 'Victors', 'BacMet', 'MGE'),
+    'first': ('SARG', 'Victors', 'BacMet'),
+}
+
+# 旧版只取 _1 端的数据库
+FIRST_MATE_FILES = ('x_SARG.csv', 'x_victors.csv', 'x_BacMet.csv')
+MATE_PATTERN = re.compile(r'^(?P<sample>.+?)_(?P<mate>[12])(?P<suffix>\.fastq\.gz-.+)$')
+
+
+def make_cohort(target):
+    """生成测试队列（含双端计数列不完整的样本）"""
+    from modules.regression import generate_cohort
+
+    shutil.rmtree(target, ignore_errors=True)
+    generate_cohort(target, N_SAMPLES, SEED)
+    for name, columns in INCOMPLETE_MATES.items():
+        path = target / name
+        pd.read_csv(path).drop(columns=columns).to_csv(path, index=False)
+    return target
+
+
+def sum_mates(source, target):
+    """复制队列，SARG/Victors/BacMet 的双端计数列预先相加写入 _1 端列（双端不完整的样本删除）"""
+    shutil.copytree(source, target)
+    for name in FIRST_MATE_FILES:
+        path = target / name
+        df = pd.read_csv(path)
+        mates = {}
+        for col in df.columns:
+            match = MATE_PATTERN.match(col)
+            if match:
+                mates.setdefault((match.group('sample'), match.group('suffix')), {})[match.group('mate')] = col
+        for (sample, suffix), found in mates.items():
+            if '1' in found and '2' in found:
+                df[found['1']] = df[found['1']] + df[found['2']]
+            df = df.drop(columns=[col for mate, col in found.items() if mate == '2' or len(found) < 2])
+        df.to_csv(path, index=False)
+    return target
+
+
+def run_baseline(baseline, root):
+    """在 root 上运行旧版流程（复制旧版代码并把 PROJECT_ROOT 指向 root）"""
+    code = root.parent / f"{root.name}_code"
+    shutil.copytree(baseline, code, ignore=shutil.ignore_patterns('.git', '__pycache__'))
+    config = code / "config" / "default_paths.py"
+    text = config.read_text(encoding='utf-8')
+    text = re.sub(r'^PROJECT_ROOT = .*$', f'PROJECT_ROOT = Path(r"{root}")', text, count=1, flags=re.M)
+    config.write_text(text, encoding='utf-8')
+    result = subprocess.run([sys.executable, "main.py"], cwd=code, capture_output=True, text=True)
+    if result.returncode != 0:
+        logging.error(result.stderr[-2000:])
+        raise RuntimeError(f"旧版流程执行失败: {root}")
+
+
+def save_outputs(root, target, databases):
+    from modules.regression import output_files
+
+    shutil.rmtree(target, ignore_errors=True)
+    for name, relative in output_files(root).items():
+        if name not in databases:
+            continue
+        (target / relative).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(root / relative, target / relative)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="由改动前的版本生成回归测试的参考结果")
+    parser.add_argument('baseline', type=Path, help="改动前版本的代码目录（如 git worktree 检出的目录）")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    make_cohort(COHORT_DIR)
+    with tempfile.TemporaryDirectory(prefix='ara_golden_') as workdir:
+        workdir = Path(workdir)
+        for policy, prepare in (('sum', sum_mates), ('first', shutil.copytree)):
+            root = workdir / policy
+            prepare(COHORT_DIR, root)
+            run_baseline(args.baseline.resolve(), root)
+            save_outputs(root, GOLDEN_DIR / policy, GOLDEN_DATABASES[policy])
+            logging.info(f"参考结果已保存至: {GOLDEN_DIR / policy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Arrow 字符串列后端（DATAFRAME_BACKEND = 'pyarrow'，未安装 pyarrow 时跳过）"""
+
+import importlib
+import pandas as pd
+import pytest
+from modules.regression import patched_settings
+
+ARROW = {'DATAFRAME_BACKEND': 'pyarrow'}
+
+
+@pytest.mark.parametrize('module_name,relative', [
+    ('modules.card.rpkm', '01 CARD/CARD_mapped.xlsx'),
+    ('modules.bacmet.rpkm', '04 BacMet/BacMet_mapped.xlsx'),
+])
+def test_rpkm_input_uses_arrow_strings(run_cohort, tmp_path, monkeypatch, module_name, relative):
+    """CARD Merged 工作表与 BacMet 预处理结果经 modules.workbook 读取，文本列转换为 Arrow 字符串"""
+    pytest.importorskip('pyarrow')
+    from config.default_paths import get_paths
+    from modules.frames import string_dtype
+
+    from modules import workbook
+
+    module = importlib.import_module(module_name)
+    root = run_cohort(ARROW)
+    paths = get_paths(root)
+
+    captured = []
+    converted = []
+    calculate_rpkm = module.calculate_rpkm
+    to_backend = workbook.to_backend
+
+    def spy(df, *args, **kwargs):
+        captured.append(df)
+        return calculate_rpkm(df, *args, **kwargs)
+
+    def backend_spy(df):
+        converted.append(list(df.columns))
+        return to_backend(df)
+
+    monkeypatch.setattr(module, 'calculate_rpkm', spy)
+    monkeypatch.setattr(workbook, 'to_backend', backend_spy)
+    workbook.invalidate()
+    with patched_settings(ARROW):
+        module.process_sarg_data(root / relative, tmp_path / 'out.xlsx', paths['READS_FILE'], paths['READS_16S_FILE'])
+        dtype = string_dtype()
+
+    df, = captured
+    # 输入工作表经共享工作簿读取（而不是直接调用 pd.read_excel），文本列按后端转换
+    assert converted
+    arrow_columns = [col for col in df.columns if df[col].dtype == dtype]
+    object_text = [
+        col for col in df.columns
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) == 'string'
+    ]
+    assert arrow_columns
+    assert not object_text
+
+
+def test_to_backend_keeps_numeric_and_mixed_columns():
+    pytest.importorskip('pyarrow')
+    from modules.frames import to_backend, string_dtype
+
+    df = pd.DataFrame({'ID': ['a', None, 'c'], 'Mixed': ['x', 1, 'Total'], 'Sample1': [1, 2, 3]})
+    with patched_settings(ARROW):
+        converted = to_backend(df)
+        assert converted['ID'].dtype == string_dtype()
+    assert converted['Mixed'].dtype == object
+    assert converted['Sample1'].dtype == 'int64'
+    pd.testing.assert_frame_equal(converted.astype(object), df.astype(object))
@@ -0,0 +1,97 @@
+"""与改动前版本的结果比较（参考结果由 tests/make_golden.py 用改动前的代码生成）
+
+逐数据库比较结果工作簿的工作表与行列结构、数值（浮点误差内）、Total/total 行列与排序。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from conftest import GOLDEN_DIR
+from modules.regression import compare_outputs, output_files, check_kernels, VARIANTS
+
+# 参考结果 -> (MATE_MERGE_POLICY, 包含的数据库)；旧版 CARD 两端相加，first 下只比较 SARG/Victors/BacMet
+GOLDEN = {
+    'sum': ('sum', ('CARD', 'SARG', 'Victors', 'BacMet', 'MGE')),
+    'first': ('first', ('SARG', 'Victors', 'BacMet')),
+}
+
+CATEGORIES = {
+    'structure': ('sheets', 'columns', 'rows'),
+    'values': ('values',),
+    'totals': ('totals',),
+    'order': ('order',),
+}
+
+# 有意的结果变化：(参考结果, 数据库) -> {类别: 原因}
+INTENDED_CHANGES = {
+    ('sum', 'MGE'): dict.fromkeys(
+        ('values', 'totals', 'order'),
+        "user-040: 旧版 MGE 样本列经转置变为 object 类型，RPKM/16SRPKM 工作表保存的是未标准化的计数"
+        "（换算关系见 test_mge_rpkm_normalizes_baseline_counts）"
+    ),
+}
+
+
+def _differences(golden, actual_root, database, categories):
+    return [
+        f"{sheet} [{category}] {detail}"
+        for _, sheet, category, detail in compare_outputs(GOLDEN_DIR / golden, actual_root, databases=[database])
+        if category in categories
+    ]
+
+
+def _baseline_cases():
+    for golden, (_, databases) in GOLDEN.items():
+        for database in databases:
+            for category in CATEGORIES:
+                reason = INTENDED_CHANGES.get((golden, database), {}).get(category)
+                marks = [pytest.mark.xfail(reason=reason, strict=True)] if reason else []
+                yield pytest.param(golden, database, category, marks=marks, id=f"{golden}-{database}-{category}")
+
+
+@pytest.mark.parametrize('golden,database,category', list(_baseline_cases()))
+def test_matches_baseline(run_cohort, golden, database, category):
+    policy, _ = GOLDEN[golden]
+    root = run_cohort({'MATE_MERGE_POLICY': policy})
+    differences = _differences(golden, root, database, CATEGORIES[category])
+    assert not differences, "\n".join(differences)
+
+
+def test_mge_rpkm_normalizes_baseline_counts(run_cohort):
+    """MGE 逐基因的 RPKM / 16SRPKM 乘以 基因长度(kb) × reads(百万) 后与旧版保存的未标准化值一致"""
+    from config.default_paths import get_paths
+    from modules.lengths import mge_length_index
+    from modules.utils import read_reads_file
+
+    root = run_cohort({'MATE_MERGE_POLICY': 'sum'})
+    paths = get_paths(root)
+    relative = output_files(root)['MGE']
+    reads = read_reads_file(paths['READS_FILE'])
+    for sheet in ('RPKM', '16SRPKM'):
+        expected = pd.read_excel(GOLDEN_DIR / 'sum' / relative, sheet_name=sheet)
+        actual = pd.read_excel(root / relative, sheet_name=sheet)
+        pd.testing.assert_frame_equal(expected[['Number', 'Genes', 'Accession']], actual[['Number', 'Genes', 'Accession']])
+        length_kb = mge_length_index(paths['MGE_FILES']['search']).lookup(actual['Accession']).lengths / 1000
+        samples = [col for col in expected.columns if col not in ('Number', 'Genes', 'Accession')]
+        for sample in samples:
+            np.testing.assert_allclose(actual[sample] * length_kb * (reads[sample] / 1e6), expected[sample],
+                                       rtol=1e-9, err_msg=f"{sheet} / {sample}")
+
+
+@pytest.mark.parametrize('variant', list(VARIANTS))
+def test_accelerated_variant_matches_reference(run_cohort, variant):
+    """加速配置与参考配置（单线程、无摄取缓存、串行解析）的结果一致；参考配置与旧版的比较见上"""
+    overrides, runs = VARIANTS[variant]
+    if overrides.get('DATAFRAME_BACKEND') == 'pyarrow':
+        pytest.importorskip('pyarrow')
+    reference = run_cohort({'MATE_MERGE_POLICY': 'sum'})
+    root = run_cohort(overrides, runs)
+    differences = [
+        f"{name} / {sheet} [{category}] {detail}"
+        for name, sheet, category, detail in compare_outputs(reference, root)
+    ]
+    assert not differences, "\n".join(differences)
+
+
+def test_kernels_match_naive_implementations():
+    assert check_kernels() == []
@@ -0,0 +1,59 @@
+"""共享工作簿读取：缓存失效与大小上限"""
+
+from pathlib import Path
+import pandas as pd
+import pytest
+from modules import workbook
+from modules.regression import patched_settings
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"book{i}.xlsx"
+        with pd.ExcelWriter(path, engine='openpyxl') as writer:
+            for sheet in ('RPKM', '16SRPKM'):
+                pd.DataFrame({'ID': [f"g{j}" for j in range(200)], 'Sample1': range(200)}).to_excel(
+                    writer, sheet_name=sheet, index=False)
+        paths.append(path)
+    workbook.invalidate()
+    yield paths
+    workbook.invalidate()
+
+
+def _cached():
+    return [Path(key).name for key in workbook._cache]
+
+
+def test_cache_shared_and_invalidated_on_write(workbooks):
+    first = workbook.read_sheet(workbooks[0], 'RPKM')
+    first.loc[0, 'Sample1'] = -1
+    assert workbook.read_sheet(workbooks[0], 'RPKM').loc[0, 'Sample1'] == 0
+
+    pd.DataFrame({'ID': ['x'], 'Sample1': [7]}).to_excel(workbooks[0], sheet_name='RPKM', index=False)
+    assert workbook.read_sheet(workbooks[0], 'RPKM')['Sample1'].tolist() == [7]
+
+
+def test_cache_evicts_least_recently_used(workbooks):
+    with patched_settings({'WORKBOOK_CACHE_MB': 1}):
+        sizes = []
+        for path in workbooks:
+            workbook.read_sheets(path)
+            sizes.append(workbook._cache[str(path.resolve())]['bytes'])
+        assert _cached() == ['book0.xlsx', 'book1.xlsx', 'book2.xlsx']
+
+        # 上限只够两本：最近最少使用的 book1 被释放
+        limit = (sizes[0] + sizes[2] + sizes[1] // 2) / 1024 ** 2
+        with patched_settings({'WORKBOOK_CACHE_MB': limit}):
+            workbook.read_sheets(workbooks[0])
+            workbook.read_sheets(workbooks[2])
+        assert _cached() == ['book0.xlsx', 'book2.xlsx']
+        assert sum(workbook._cache[key]['bytes'] for key in workbook._cache) <= limit * 1024 ** 2
+
+
+def test_cache_disabled(workbooks):
+    with patched_settings({'WORKBOOK_CACHE_MB': 0}):
+        sheets = workbook.read_sheets(workbooks[0])
+    assert list(sheets) == ['RPKM', '16SRPKM']
+    assert not workbook._cache